@@ -0,0 +1,231 @@
+"""Compiled answer keys for tests
+
+A test's questions are read once into an immutable AnswerKey (normalized
+correct answers, a points vector and the questions as sent to clients) and
+cached per process. The cache is keyed on Test.key_version, which every edit of
+the questions bumps, so a stale key is never used even when several workers
+each hold their own cache.
+
+Questions live in test_questions. Tests created before that table existed are
+copied out of the legacy Test.questions JSON by update_db_schema_test_questions.py;
+reading a key never writes.
+
+Each question also accumulates item-analysis sums as results arrive, from which
+difficulty (share answering correctly) and discrimination (point-biserial
+correlation of the item with the result percentage) are derived.
+"""
+import json
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app.models.assignment import Test, TestQuestion, TestResult
+
+
+def normalize_answer(answer) -> str:
+    """Answers match case-insensitively and ignoring surrounding whitespace"""
+    if answer is None:
+        return ""
+    return str(answer).strip().casefold()
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    test_id: int
+    version: int
+    question_ids: Tuple[int, ...]
+    answers: Tuple[str, ...]
+    points: Tuple[float, ...]
+    total_points: float
+    passing_score: float
+    # The questions as sent to clients, with and without correct answers
+    instructor_questions: Tuple[dict, ...]
+    student_questions: Tuple[dict, ...]
+    
+    def mark(self, answers: Dict[str, str]) -> Tuple[bool, ...]:
+        """Which questions a submission's {question_index: answer} got right"""
+        return tuple(
+            bool(answers.get(str(i))) and normalize_answer(answers.get(str(i))) == correct
+            for i, correct in enumerate(self.answers)
+        )
+    
+    def score(self, correct: Tuple[bool, ...]) -> Tuple[float, float, bool]:
+        """(score, percentage, passed) for a marked submission"""
+        score = sum(points for points, right in zip(self.points, correct) if right)
+        percentage = (score / self.total_points * 100) if self.total_points > 0 else 0
+        return score, percentage, percentage >= self.passing_score
+    
+    def grade(self, answers: Dict[str, str]) -> Tuple[float, float, bool]:
+        return self.score(self.mark(answers))
+
+
+_keys: Dict[int, AnswerKey] = {}
+_lock = threading.Lock()
+
+
+def _question_dict(question: TestQuestion, include_answer: bool) -> dict:
+    data = {
+        "id": question.id,
+        "question": question.question,
+        "type": question.type,
+        "options": json.loads(question.options) if question.options else [],
+        "points": question.points
+    }
+    if include_answer:
+        data["correct_answer"] = question.correct_answer
+    return data
+
+
+def replace_questions(db: Session, test: Test, questions: List[dict]):
+    """Store a test's questions as test_questions rows, dropping any previous ones"""
+    db.query(TestQuestion).filter(TestQuestion.test_id == test.id).delete(synchronize_session=False)
+    db.add_all([
+        TestQuestion(
+            test_id=test.id,
+            position=position,
+            question=q.get("question", ""),
+            type=q.get("type") or "mcq",
+            options=json.dumps(q.get("options") or []),
+            correct_answer=str(q.get("correct_answer", "")),
+            points=float(q.get("points", 0))
+        )
+        for position, q in enumerate(questions)
+    ])
+    db.flush()
+
+
+def _questions(db: Session, test_id: int) -> List[TestQuestion]:
+    return db.query(TestQuestion).filter(TestQuestion.test_id == test_id).order_by(TestQuestion.position).all()
+
+
+def load_questions(db: Session, test: Test) -> List[TestQuestion]:
+    """A test's question rows"""
+    return _questions(db, test.id)
+
+
+def _build_key(test: Test, questions: List[TestQuestion]) -> AnswerKey:
+    return AnswerKey(
+        test_id=test.id,
+        version=test.key_version or 1,
+        question_ids=tuple(q.id for q in questions),
+        answers=tuple(normalize_answer(q.correct_answer) for q in questions),
+        points=tuple(q.points or 0.0 for q in questions),
+        total_points=test.total_points or 0.0,
+        passing_score=test.passing_score or 0.0,
+        instructor_questions=tuple(_question_dict(q, True) for q in questions),
+        student_questions=tuple(_question_dict(q, False) for q in questions)
+    )
+
+
+def compile_key(db: Session, test: Test) -> AnswerKey:
+    return _build_key(test, load_questions(db, test))
+
+
+def get_key(db: Session, test_id: int, version: Optional[int]) -> AnswerKey:
+    """Cached key for this version of the test, compiling it on a miss"""
+    key = _keys.get(test_id)
+    if key is not None and key.version == (version or 1):
+        return key
+    
+    test = db.query(Test).filter(Test.id == test_id).first()
+    key = compile_key(db, test)
+    with _lock:
+        current = _keys.get(test_id)
+        if current is None or current.version <= key.version:
+            _keys[test_id] = key
+    return key
+
+
+def invalidate(test_id: int):
+    with _lock:
+        _keys.pop(test_id, None)
+
+
+def record_item_results(db: Session, key: AnswerKey, marks: Iterable[Tuple[Tuple[bool, ...], float]]):
+    """Add (correct-per-question, percentage) results to the item-analysis sums
+    
+    One executemany UPDATE covers every question of the test.
+    """
+    totals = {
+        question_id: {"question_id": question_id, "attempts": 0, "correct": 0, "sum": 0.0, "sq": 0.0, "correct_sum": 0.0}
+        for question_id in key.question_ids
+    }
+    for correct, percentage in marks:
+        for question_id, right in zip(key.question_ids, correct):
+            item = totals[question_id]
+            item["attempts"] += 1
+            item["sum"] += percentage
+            item["sq"] += percentage * percentage
+            if right:
+                item["correct"] += 1
+                item["correct_sum"] += percentage
+    
+    params = [item for item in totals.values() if item["attempts"]]
+    if params:
+        table = TestQuestion.__table__
+        db.connection().execute(
+            update(table).where(table.c.id == bindparam("question_id")).values(
+                attempt_count=table.c.attempt_count + bindparam("attempts"),
+                correct_count=table.c.correct_count + bindparam("correct"),
+                score_sum=table.c.score_sum + bindparam("sum"),
+                score_sq_sum=table.c.score_sq_sum + bindparam("sq"),
+                correct_score_sum=table.c.correct_score_sum + bindparam("correct_sum")
+            ),
+            params
+        )
+
+
+def reset_item_results(db: Session, key: AnswerKey):
+    if key.question_ids:
+        db.query(TestQuestion).filter(TestQuestion.id.in_(key.question_ids)).update({
+            TestQuestion.attempt_count: 0,
+            TestQuestion.correct_count: 0,
+            TestQuestion.score_sum: 0.0,
+            TestQuestion.score_sq_sum: 0.0,
+            TestQuestion.correct_score_sum: 0.0
+        }, synchronize_session=False)
+
+
+def item_analysis(question: TestQuestion) -> Tuple[Optional[float], Optional[float]]:
+    """(difficulty, discrimination) from a question's accumulated sums"""
+    n, correct = question.attempt_count, question.correct_count
+    if not n:
+        return None, None
+    difficulty = correct / n
+    if correct in (0, n):
+        return difficulty, None
+    mean = question.score_sum / n
+    variance = question.score_sq_sum / n - mean * mean
+    if variance <= 1e-9:
+        return difficulty, None
+    mean_correct = question.correct_score_sum / correct
+    mean_wrong = (question.score_sum - question.correct_score_sum) / (n - correct)
+    discrimination = (mean_correct - mean_wrong) / math.sqrt(variance) * math.sqrt(difficulty * (1 - difficulty))
+    return difficulty, discrimination
+
+
+def regrade(db: Session, key: AnswerKey, result_rows: Iterable, write_scores: bool = True) -> List[dict]:
+    """Re-score (id, answers, score, percentage, passed) rows against key
+    
+    All rows are scored in one pass and, with write_scores, the ones whose result
+    changed are written back with a single executemany UPDATE. The item-analysis
+    sums are rebuilt from the same pass either way. Returns the changed rows.
+    """
+    changed = []
+    marks = []
+    for row in result_rows:
+        answers = json.loads(row.answers) if row.answers else {}
+        correct = key.mark(answers)
+        score, percentage, passed = key.score(correct)
+        marks.append((correct, percentage if write_scores else row.percentage))
+        if score != row.score or percentage != row.percentage or passed != row.passed:
+            changed.append({"id": row.id, "score": score, "percentage": percentage, "passed": passed})
+    if changed and write_scores:
+        db.execute(update(TestResult), changed)
+    reset_item_results(db, key)
+    record_item_results(db, key, marks)
+    return changed
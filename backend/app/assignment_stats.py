@@ -0,0 +1,140 @@
+"""Materialized per-assignment statistics
+
+Submission and grading paths adjust an assignment_stats row and a 1%-wide grade
+histogram in the same transaction as the change itself, so opening an assignment
+or its analytics never scans the submissions table. Mean is exact; the median
+is read off the histogram, to within 1% of the assignment's points.
+
+An assignment with no stats row yet (created before the table existed) is
+rebuilt from its submissions the first time it is touched.
+"""
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.orm import Session
+
+from app.database import upsert
+from app.models.assignment import Assignment, Submission, AssignmentStats, AssignmentGradeBucket
+
+HISTOGRAM_PERCENTS = 101  # buckets 0..100; grades above full marks land in 100
+
+
+def grade_percent(grade: float, points: Optional[float]) -> int:
+    if not points or points <= 0:
+        return 0
+    return max(0, min(int(grade / points * 100), 100))
+
+
+def rebuild(db: Session, assignment_id: int) -> AssignmentStats:
+    """Recompute an assignment's stats row and histogram from its submissions"""
+    db.flush()
+    submission_count, late_count, graded_count, grade_sum = db.query(
+        func.count(Submission.id),
+        func.count(Submission.id).filter(Submission.is_late.is_(True)),
+        func.count(Submission.grade),
+        func.coalesce(func.sum(Submission.grade), 0.0)
+    ).filter(Submission.assignment_id == assignment_id).one()
+    points = db.query(Assignment.points).filter(Assignment.id == assignment_id).scalar()
+    
+    buckets = Counter(
+        grade_percent(grade, points) for grade, in db.query(Submission.grade).filter(
+            Submission.assignment_id == assignment_id,
+            Submission.grade.isnot(None)
+        )
+    )
+    db.execute(delete(AssignmentGradeBucket).where(AssignmentGradeBucket.assignment_id == assignment_id))
+    if buckets:
+        db.execute(insert(AssignmentGradeBucket), [
+            {"assignment_id": assignment_id, "percent": percent, "count": count}
+            for percent, count in buckets.items()
+        ])
+    
+    values = {
+        "submission_count": submission_count,
+        "late_count": late_count,
+        "graded_count": graded_count,
+        "grade_sum": grade_sum
+    }
+    db.execute(
+        upsert(AssignmentStats)
+        .values(assignment_id=assignment_id, **values)
+        .on_conflict_do_update(index_elements=[AssignmentStats.assignment_id], set_=values)
+    )
+    return db.get(AssignmentStats, assignment_id, populate_existing=True)
+
+
+def _bump(db: Session, assignment_id: int, **deltas) -> bool:
+    """Add deltas to the stats row; rebuilds (and returns False) when there is no row yet"""
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return True
+    result = db.execute(
+        update(AssignmentStats)
+        .where(AssignmentStats.assignment_id == assignment_id)
+        .values({column: getattr(AssignmentStats, column) + delta for column, delta in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        rebuild(db, assignment_id)
+        return False
+    return True
+
+
+def record_submissions(db: Session, assignment_id: int, added: int = 0, late_delta: int = 0):
+    """Account for new submissions and for resubmissions whose lateness changed
+    
+    Call after the submission rows are written (or added to the session).
+    """
+    _bump(db, assignment_id, submission_count=added, late_count=late_delta)
+
+
+def record_grades(db: Session, assignment_id: int, points: Optional[float], changes: Iterable[Tuple[Optional[float], float]]):
+    """Account for (old_grade, new_grade) changes; old_grade is None for a first grade
+    
+    Call after the grades are written (or set on the session's objects).
+    """
+    changes = list(changes)
+    newly_graded = sum(1 for old, _ in changes if old is None)
+    grade_delta = sum(new - (old or 0.0) for old, new in changes)
+    
+    buckets = Counter()
+    for old, new in changes:
+        if old is not None:
+            buckets[grade_percent(old, points)] -= 1
+        buckets[grade_percent(new, points)] += 1
+    
+    if not _bump(db, assignment_id, graded_count=newly_graded, grade_sum=grade_delta):
+        return  # rebuilt from the submissions, which already include these grades
+    
+    params = [
+        {"assignment_id": assignment_id, "percent": percent, "count": delta}
+        for percent, delta in buckets.items() if delta
+    ]
+    if params:
+        stmt = upsert(AssignmentGradeBucket)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[AssignmentGradeBucket.assignment_id, AssignmentGradeBucket.percent],
+                set_={"count": AssignmentGradeBucket.count + stmt.excluded["count"]}
+            ),
+            params
+        )
+
+
+def get_stats(db: Session, assignment_id: int) -> AssignmentStats:
+    stats = db.get(AssignmentStats, assignment_id)
+    if stats is None:
+        stats = rebuild(db, assignment_id)
+        db.commit()
+    return stats
+
+
+def grade_histogram(db: Session, assignment_id: int):
+    """[count per whole percent 0..100] of graded submissions"""
+    counts = [0] * HISTOGRAM_PERCENTS
+    for percent, count in db.query(AssignmentGradeBucket.percent, AssignmentGradeBucket.count).filter(
+        AssignmentGradeBucket.assignment_id == assignment_id
+    ):
+        counts[percent] = count
+    return counts
@@ -0,0 +1,197 @@
+"""iCalendar feeds
+
+A user's feed holds the global events and, for every classroom they are enrolled
+in, that classroom's events, assignment due dates and published tests. Each of
+those parts is rendered once per calendar version and shared by every member of
+the classroom; a feed is just its parts joined together.
+
+Calendar apps poll a feed every few minutes. A poll reads the versions of the
+user's parts in one indexed query. If they match what the cached feed was built
+from, its ETag and Last-Modified are already known, so a conditional request is
+answered with 304 without rendering anything. Any change to an event, assignment
+or test bumps its classroom's version (see CalendarVersion), and only that part
+is rendered again on the next poll.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app import recurrence
+from app.models.assignment import Assignment, Test
+from app.models.classroom import ClassroomEnrollment
+from app.models.course import Course
+from app.models.event import CalendarVersion, Event
+
+GLOBAL_SCOPE = 0
+EPOCH = datetime(1970, 1, 1)
+HEADER = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "PRODID:-//RVSync//Calendar Feed//EN\r\n"
+    "CALSCALE:GREGORIAN\r\n"
+    "METHOD:PUBLISH\r\n"
+    "X-WR-CALNAME:RVSync\r\n"
+)
+FOOTER = "END:VCALENDAR\r\n"
+
+
+@dataclass(frozen=True)
+class Feed:
+    versions: Tuple[Tuple[int, int], ...]  # (scope_id, version) of each part
+    etag: str
+    last_modified: datetime
+
+
+_parts: Dict[int, Tuple[int, str]] = {}  # scope_id -> (version, rendered components)
+_feeds: Dict[int, Feed] = {}  # user_id -> last feed built
+
+
+def _escape(text) -> str:
+    return (
+        str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Split lines longer than 75 octets, continuing each with a leading space"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    chunks, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1  # never split a UTF-8 sequence
+        chunks.append(data[start:end].decode())
+        start, limit = end, 74
+    return "\r\n ".join(chunks)
+
+
+def _utc(value: datetime) -> str:
+    return f"{value:%Y%m%dT%H%M%S}Z"
+
+
+def _component(kind: str, properties) -> str:
+    lines = [f"BEGIN:{kind}"]
+    lines += [_fold(f"{name}:{value}") for name, value in properties if value]
+    lines.append(f"END:{kind}")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _event(event: Event) -> str:
+    if event.is_all_day:
+        last_day = max(event.end_time.date(), event.start_time.date())
+        times = [
+            ("DTSTART;VALUE=DATE", f"{event.start_time:%Y%m%d}"),
+            ("DTEND;VALUE=DATE", f"{last_day + timedelta(days=1):%Y%m%d}")
+        ]
+    else:
+        times = [("DTSTART", _utc(event.start_time)), ("DTEND", _utc(event.end_time))]
+    rule = None
+    if event.recurrence_rule:
+        rule = recurrence.format_rule(recurrence.parse_rule(event.recurrence_rule), event.is_all_day)
+    return _component("VEVENT", [
+        ("UID", f"event-{event.id}@rvsync"),
+        ("DTSTAMP", _utc(event.updated_at or event.created_at or EPOCH)),
+        *times,
+        ("RRULE", rule),
+        ("SUMMARY", _escape(event.title)),
+        ("DESCRIPTION", _escape(event.description or "")),
+        ("LOCATION", _escape(event.location or "")),
+        ("CATEGORIES", _escape((event.event_type or "other").upper()))
+    ])
+
+
+def _assignment(row) -> str:
+    return _component("VEVENT", [
+        ("UID", f"assignment-{row.id}@rvsync"),
+        ("DTSTAMP", _utc(row.updated_at or row.created_at or EPOCH)),
+        ("DTSTART", _utc(row.due_date)),
+        ("SUMMARY", _escape(f"{row.code}: {row.title} due")),
+        ("DESCRIPTION", _escape(row.description or "")),
+        ("CATEGORIES", "ASSIGNMENT")
+    ])
+
+
+def _test(row) -> str:
+    # Tests have no scheduled time, so they are listed as to-dos
+    return _component("VTODO", [
+        ("UID", f"test-{row.id}@rvsync"),
+        ("DTSTAMP", _utc(row.created_at or EPOCH)),
+        ("SUMMARY", _escape(f"{row.code}: {row.title}")),
+        ("DESCRIPTION", _escape(f"{row.time_limit} minute test" if row.time_limit else "Untimed test")),
+        ("CATEGORIES", "TEST")
+    ])
+
+
+def _render_part(db: Session, scope_id: int) -> str:
+    if scope_id == GLOBAL_SCOPE:
+        events = db.query(Event).filter(Event.classroom_id.is_(None)).order_by(Event.id)
+        return "".join(_event(event) for event in events)
+    
+    components = [
+        _event(event)
+        for event in db.query(Event).filter(Event.classroom_id == scope_id).order_by(Event.id)
+    ]
+    components += [
+        _assignment(row) for row in db.query(
+            Assignment.id, Assignment.title, Assignment.description, Assignment.due_date,
+            Assignment.created_at, Assignment.updated_at, Course.code
+        ).join(Course, Course.id == Assignment.course_id).filter(
+            Course.classroom_id == scope_id
+        ).order_by(Assignment.id)
+    ]
+    components += [
+        _test(row) for row in db.query(
+            Test.id, Test.title, Test.time_limit, Test.created_at, Course.code
+        ).join(Course, Course.id == Test.course_id).filter(
+            Course.classroom_id == scope_id,
+            Test.is_published.is_(True)
+        ).order_by(Test.id)
+    ]
+    return "".join(components)
+
+
+def _part(db: Session, scope_id: int, version: int) -> str:
+    cached = _parts.get(scope_id)
+    if cached is not None and cached[0] >= version:
+        return cached[1]
+    text = _render_part(db, scope_id)
+    _parts[scope_id] = (version, text)
+    return text
+
+
+def render(db: Session, versions: Tuple[Tuple[int, int], ...]) -> bytes:
+    return (HEADER + "".join(_part(db, scope_id, version) for scope_id, version in versions) + FOOTER).encode()
+
+
+def get_feed(db: Session, user_id: int) -> Feed:
+    """The user's current feed metadata, rebuilt only when one of its parts changed"""
+    rows = db.query(CalendarVersion.scope_id, CalendarVersion.version, CalendarVersion.updated_at).filter(
+        or_(
+            CalendarVersion.scope_id == GLOBAL_SCOPE,
+            CalendarVersion.scope_id.in_(
+                select(ClassroomEnrollment.classroom_id).where(ClassroomEnrollment.user_id == user_id)
+            )
+        )
+    ).order_by(CalendarVersion.scope_id).all()
+    versions = tuple((row.scope_id, row.version) for row in rows)
+    
+    previous = _feeds.get(user_id)
+    if previous is not None and previous.versions == versions:
+        return previous
+    
+    etag = '"' + hashlib.sha256(render(db, versions)).hexdigest()[:32] + '"'
+    last_modified = max((row.updated_at for row in rows), default=EPOCH)
+    if previous is not None and previous.etag != etag:
+        # Leaving a classroom changes the feed without bumping any version
+        last_modified = max(last_modified, datetime.utcnow())
+    # HTTP dates have whole seconds
+    feed = Feed(versions, etag, last_modified.replace(microsecond=0))
+    _feeds[user_id] = feed
+    return feed
@@ -0,0 +1,143 @@
+"""Response compression
+
+Compresses JSON responses of at least COMPRESSION_MIN_SIZE bytes for clients
+that accept it: brotli when the brotli package is installed and the client asks
+for br, gzip otherwise. Smaller bodies go out as they are, since the headers and
+CPU time would cost more than the bytes saved.
+
+Only responses sent in one piece are compressed. Streamed bodies (NDJSON
+exports, file downloads, CSV gradebooks) pass through untouched, as do responses
+that already carry a Content-Encoding. A compressed response's strong ETag
+becomes weak, since the bytes on the wire are no longer the ones it was computed
+from; If-None-Match comparisons ignore the W/ prefix, so revalidation still
+works. A 304 is never compressed, so its ETag is made weak when the client's
+If-None-Match shows that is the form it was sent.
+"""
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def _accepted(header: str) -> dict:
+    """Accept-Encoding as {coding: q}"""
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            codings[coding.lower()] = q
+    return codings
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    codings = _accepted(header)
+    for coding in ("br", "gzip") if brotli is not None else ("gzip",):
+        if codings.get(coding, codings.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def _revalidated(start: dict, if_none_match: bytes) -> dict:
+    """A 304's start message, with the ETag weakened if the client holds it weak"""
+    headers = start.get("headers", [])
+    etag = dict(headers).get(b"etag")
+    if etag is None or etag.startswith(b"W/"):
+        return start
+    if b"W/" + etag not in [tag.strip() for tag in if_none_match.split(b",")]:
+        return start
+    return {**start, "headers": [(name, b"W/" + value if name == b"etag" else value) for name, value in headers]}
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+    
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope["headers"])
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start = None
+        passthrough = False
+        
+        async def pass_through(message):
+            nonlocal start, passthrough
+            passthrough = True
+            if start is not None:
+                await send(start)
+                start = None
+            await send(message)
+        
+        async def compressing_send(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    passthrough = True
+                    await send(_revalidated(message, request_headers.get(b"if-none-match", b"")))
+                else:
+                    start = message
+                return
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] != "http.response.body":
+                # e.g. http.response.pathsend from FileResponse; the start must go out first
+                await pass_through(message)
+                return
+            
+            headers = dict(start.get("headers", []))
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or b"content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or len(body) < self.minimum_size
+            ):
+                await pass_through(message)
+                return
+            
+            compressed = self._compress(body, encoding)
+            raw_headers = [
+                (name, value) for name, value in start.get("headers", [])
+                if name not in (b"content-length", b"etag", b"vary")
+            ]
+            etag = headers.get(b"etag")
+            if etag is not None:
+                raw_headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+            vary = headers.get(b"vary")
+            raw_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            await send({**start, "headers": raw_headers})
+            await send({"type": "http.response.body", "body": compressed})
+        
+        await self.app(scope, receive, compressing_send)
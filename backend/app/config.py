@@ -11,6 +11,50 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./rvsync.db"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 200
+    
+    # File Storage
+    STORAGE_DIR: str = "./storage"
+    UPLOAD_CHUNK_SIZE: int = 5 * 1024 * 1024  # suggested client chunk size
+    MAX_UPLOAD_SIZE: int = 200 * 1024 * 1024
+    MATERIAL_CACHE_MAX_AGE: int = 86400  # seconds browsers may reuse a downloaded material
+    STORAGE_GC_GRACE_HOURS: int = 24  # unreferenced objects and stale uploads survive this long
+    
+    # Write-behind counters
+    COUNTER_LOG_PATH: str = "./storage/counters.log"
+    COUNTER_FLUSH_INTERVAL: float = 5.0  # seconds
+    
+    # Queued submission ingestion
+    SUBMISSION_QUEUE_PATH: str = "./storage/submissions.queue"
+    SUBMISSION_QUEUE_FLUSH_INTERVAL: float = 1.0  # seconds
+    SUBMISSION_QUEUE_BATCH: int = 500  # flush early once this many are waiting
+    
+    # Timed exam sessions
+    EXAM_AUTOSAVE_FLUSH_INTERVAL: float = 2.0  # seconds between writes of buffered answers
+    EXAM_SWEEP_INTERVAL: float = 5.0  # seconds between auto-submits of expired sessions
+    EXAM_DEADLINE_GRACE_SECONDS: int = 30  # allowance for saves and submits in flight at the deadline
+    
+    # Activity feed
+    ACTIVITY_FANOUT_MAX_MEMBERS: int = 500  # bigger classrooms' activity is merged in when feeds are read
+    ACTIVITY_BACKFILL: int = 50  # recent items copied into a new member's timeline
+    
+    # Classroom push channels
+    PUSH_SEND_TIMEOUT: float = 2.0  # seconds a subscriber may take to accept an event before it is dropped
+    
+    # User typeahead
+    USER_DIRECTORY_REFRESH_INTERVAL: float = 300.0  # seconds between rebuilds, to pick up other workers' writes
+    
+    # Cached GET responses
+    RESPONSE_CACHE_MAX_ENTRIES: int = 5000
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL: float = 60.0  # seconds; bounds staleness from other workers' writes
+    
+    # Response compression
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes; smaller JSON bodies are sent as they are
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # used when the brotli package is installed
     
     # JWT Authentication
     SECRET_KEY: str = "rvsync-secret-key-change-in-production"
@@ -0,0 +1,118 @@
+"""Write-behind counters
+
+Hot counters (material downloads, ...) are bumped in memory and flushed to the
+database in periodic batched UPDATEs instead of one row-locking write per request.
+
+Every increment is also appended to a small log before it is acknowledged. A
+flush rotates the log aside, applies the batch and deletes the rotated file; on
+startup the logs left by exited processes are replayed. Each worker has its own
+log and flushes one at a time (see journals), so flushes and recovery never
+touch increments another flush or worker still holds. A crash between the UPDATE commit and the delete replays
+that batch again, so counts are at-least-once, never lost.
+"""
+import asyncio
+import threading
+from collections import Counter
+from typing import Dict, Tuple
+
+from sqlalchemy import bindparam, update
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.journals import ProcessJournals
+from app.models.course import CourseMaterial
+
+settings = get_settings()
+
+# Counter name -> (model, column) it accumulates into
+COUNTERS = {
+    "material_downloads": (CourseMaterial, "download_count"),
+}
+
+
+class WriteBehindCounters:
+    def __init__(self, log_path: str):
+        self.journals = ProcessJournals(log_path, self._replay)
+        self.pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._task = None
+    
+    def increment(self, name: str, row_id: int, amount: int = 1):
+        if name not in COUNTERS:
+            raise KeyError(f"Unknown counter: {name}")
+        with self._lock:
+            self.journals.write(f"{name} {row_id} {amount}\n")
+            self.pending[(name, row_id)] += amount
+    
+    def _apply(self, batch: Dict[Tuple[str, int], int]):
+        by_counter: Dict[str, list] = {}
+        for (name, row_id), amount in batch.items():
+            by_counter.setdefault(name, []).append({"row_id": row_id, "amount": amount})
+        
+        db = SessionLocal()
+        try:
+            for name, params in by_counter.items():
+                model, column = COUNTERS[name]
+                table = model.__table__
+                stmt = update(table).where(table.c.id == bindparam("row_id")).values(
+                    {column: table.c[column] + bindparam("amount")}
+                )
+                db.connection().execute(stmt, params)
+            db.commit()
+        finally:
+            db.close()
+    
+    def flush(self):
+        """Write all pending increments in one transaction; returns rows touched"""
+        return self.journals.flush(self._lock, self._take, self._apply, self._restore)
+    
+    def _take(self) -> Counter:
+        batch, self.pending = self.pending, Counter()
+        return batch
+    
+    def _restore(self, batch: Counter):
+        self.pending.update(batch)
+    
+    def _replay(self, paths):
+        batch = Counter()
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    parts = line.split()
+                    # A torn final line from a crash mid-write is skipped
+                    if len(parts) == 3 and parts[0] in COUNTERS:
+                        batch[(parts[0], int(parts[1]))] += int(parts[2])
+        if batch:
+            self._apply(batch)
+        return sum(batch.values())
+    
+    def recover(self):
+        """Replay increments logged by processes that crashed or shut down uncleanly"""
+        return self.journals.recover()
+    
+    async def _flush_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"Counter flush failed, will retry: {e}")
+    
+    def start(self, interval: float):
+        replayed = self.recover()
+        if replayed:
+            print(f"🔁 Replayed {replayed} logged counter increments")
+        self._task = asyncio.create_task(self._flush_periodically(interval))
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+counters = WriteBehindCounters(settings.COUNTER_LOG_PATH)
@@ -1,15 +1,35 @@
 """Database Configuration"""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.config import get_settings
 
 settings = get_settings()
 
+# Handlers are async and use blocking sessions, so an exhausted pool stalls the
+# whole event loop; size it for the number of requests in flight, not the CPU count
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
 )
 
+
+if "sqlite" in settings.DATABASE_URL:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Use WAL so readers never block the writer, and wait on locks instead of failing"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+# INSERT ... ON CONFLICT for the configured backend
+if "sqlite" in settings.DATABASE_URL:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -28,5 +48,5 @@ def get_db():
 
 def init_db():
     """Initialize database tables"""
-    from app.models import user, classroom, course, assignment, chat, career, event
+    from app.models import user, classroom, course, assignment, chat, career, event, upload
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,235 @@
+"""Timed exam sessions
+
+Starting a test opens an attempt: a test_results row with no completed_at and an
+expires_at of the start time plus the test's time limit. While the student
+works, answers are autosaved over PATCH or the session WebSocket into an
+in-memory buffer that keeps only the latest answer per question. Every
+EXAM_AUTOSAVE_FLUSH_INTERVAL seconds the buffer is merged into the rows with one
+executemany UPDATE, so a class answering in lockstep costs one write per session
+per interval rather than one per click.
+
+The deadline is the server's. Saves are refused once expires_at (plus a grace
+period for requests in flight) has passed, and a sweeper submits every session
+whose time ran out with whatever was saved. Submitting claims the row by setting
+completed_at where it is still NULL, so an explicit submit, the sweeper and other
+workers never grade an attempt twice.
+
+The merge is done in SQL, one question at a time, so saves for the same session
+arriving at different workers don't overwrite each other. Saves acknowledged
+within the last interval are lost if the process dies before the flush; the page
+keeps its answers and sends them all again with the final submit.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import Text, bindparam, cast, func, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from app import answer_keys
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.assignment import Test, TestResult
+
+settings = get_settings()
+
+SWEEP_BATCH = 500
+
+_results = TestResult.__table__
+_saved_answers = func.coalesce(_results.c.answers, "{}")
+if "sqlite" in settings.DATABASE_URL:
+    _merged_answers = func.json_patch(_saved_answers, bindparam("patch"))
+else:
+    _merged_answers = cast(cast(_saved_answers, JSONB).op("||")(cast(bindparam("patch"), JSONB)), Text)
+
+
+@dataclass(frozen=True)
+class OpenSession:
+    session_id: int
+    test_id: int
+    user_id: int
+    expires_at: Optional[datetime]
+    
+    def accepts_answers(self, now: datetime) -> bool:
+        if self.expires_at is None:
+            return True
+        return now <= self.expires_at + timedelta(seconds=settings.EXAM_DEADLINE_GRACE_SECONDS)
+    
+    def remaining_seconds(self, now: datetime) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max((self.expires_at - now).total_seconds(), 0.0)
+
+
+def _merge(db: Session, patches: List[dict]):
+    """Merge [{session_id, patch}] into the open sessions' saved answers"""
+    db.connection().execute(
+        update(_results).where(
+            _results.c.id == bindparam("session_id"),
+            _results.c.completed_at.is_(None)
+        ).values(answers=_merged_answers),
+        patches
+    )
+
+
+class ExamSessions:
+    def __init__(self):
+        self._open: Dict[int, OpenSession] = {}
+        self._pending: Dict[int, dict] = {}  # session_id -> answers not yet written
+        self._lock = threading.Lock()
+        self._task = None
+    
+    def get(self, db: Session, session_id: int, user_id: int) -> Optional[OpenSession]:
+        """The user's session if it is still open, cached after the first lookup"""
+        session = self._open.get(session_id)
+        if session is None:
+            row = db.query(
+                TestResult.test_id, TestResult.user_id, TestResult.expires_at, TestResult.completed_at
+            ).filter(TestResult.id == session_id).first()
+            if row is None or row.completed_at is not None:
+                return None
+            session = OpenSession(session_id, row.test_id, row.user_id, row.expires_at)
+            with self._lock:
+                self._open[session_id] = session
+        return session if session.user_id == user_id else None
+    
+    def save(self, session: OpenSession, answers: dict):
+        """Buffer {question_index: answer} updates; written by the next flush"""
+        patch = {str(index): answer for index, answer in answers.items()}
+        with self._lock:
+            self._pending.setdefault(session.session_id, {}).update(patch)
+    
+    def answers(self, db: Session, session_id: int) -> dict:
+        """Saved answers with any still-buffered ones on top"""
+        saved = db.query(TestResult.answers).filter(TestResult.id == session_id).scalar()
+        answers = json.loads(saved) if saved else {}
+        with self._lock:
+            answers.update(self._pending.get(session_id, {}))
+        return {index: answer for index, answer in answers.items() if answer is not None}
+    
+    def flush(self) -> int:
+        """Write every buffered answer in one transaction; returns sessions written"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+        
+        db = SessionLocal()
+        try:
+            _merge(db, [{"session_id": sid, "patch": json.dumps(answers)} for sid, answers in batch.items()])
+            db.commit()
+        except Exception:
+            with self._lock:
+                for sid, answers in batch.items():
+                    self._pending[sid] = {**answers, **self._pending.get(sid, {})}
+            raise
+        finally:
+            db.close()
+        return len(batch)
+    
+    def finalize(self, db: Session, session_ids: List[int], now: datetime) -> List[int]:
+        """Grade and close open sessions in the caller's transaction
+        
+        Buffered answers are merged first. Sessions already submitted elsewhere are
+        skipped; returns the ids this call closed.
+        """
+        with self._lock:
+            patches = [
+                {"session_id": sid, "patch": json.dumps(self._pending.pop(sid))}
+                for sid in session_ids if sid in self._pending
+            ]
+        if patches:
+            _merge(db, patches)
+        
+        claimed = [row.id for row in db.execute(
+            update(_results).where(
+                _results.c.id.in_(session_ids),
+                _results.c.completed_at.is_(None)
+            ).values(completed_at=now).returning(_results.c.id)
+        )]
+        if not claimed:
+            return []
+        
+        rows = db.query(TestResult.id, TestResult.test_id, TestResult.answers).filter(TestResult.id.in_(claimed)).all()
+        versions = dict(db.query(Test.id, Test.key_version).filter(Test.id.in_({row.test_id for row in rows})))
+        keys = {test_id: answer_keys.get_key(db, test_id, version) for test_id, version in versions.items()}
+        scores = []
+        marks = defaultdict(list)
+        for row in rows:
+            key = keys[row.test_id]
+            correct = key.mark(json.loads(row.answers) if row.answers else {})
+            score, percentage, passed = key.score(correct)
+            scores.append({"id": row.id, "score": score, "percentage": percentage, "passed": passed})
+            marks[row.test_id].append((correct, percentage))
+        db.execute(update(TestResult), scores)
+        for test_id, test_marks in marks.items():
+            answer_keys.record_item_results(db, keys[test_id], test_marks)
+        
+        with self._lock:
+            for sid in claimed:
+                self._open.pop(sid, None)
+        return claimed
+    
+    def sweep(self) -> int:
+        """Submit every session past its deadline and grace period; returns sessions closed"""
+        self.flush()
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.EXAM_DEADLINE_GRACE_SECONDS)
+        closed = 0
+        db = SessionLocal()
+        try:
+            while True:
+                expired = [sid for sid, in db.query(TestResult.id).filter(
+                    TestResult.completed_at.is_(None),
+                    TestResult.expires_at < cutoff
+                ).limit(SWEEP_BATCH)]
+                if not expired:
+                    break
+                closed += len(self.finalize(db, expired, now))
+                db.commit()
+                if len(expired) < SWEEP_BATCH:
+                    break
+        finally:
+            db.close()
+        
+        # Forget sessions another worker closed
+        with self._lock:
+            for sid in [sid for sid, s in self._open.items() if s.expires_at is not None and s.expires_at < cutoff]:
+                del self._open[sid]
+        return closed
+    
+    async def _run_periodically(self, flush_interval: float, sweep_interval: float):
+        last_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"Exam autosave flush failed, will retry: {e}")
+            if time.monotonic() - last_sweep >= sweep_interval:
+                last_sweep = time.monotonic()
+                try:
+                    await asyncio.to_thread(self.sweep)
+                except Exception as e:
+                    print(f"Exam deadline sweep failed, will retry: {e}")
+    
+    def start(self, flush_interval: float, sweep_interval: float):
+        closed = self.sweep()
+        if closed:
+            print(f"⏱️ Submitted {closed} exam sessions that expired while stopped")
+        self._task = asyncio.create_task(self._run_periodically(flush_interval, sweep_interval))
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+exam_sessions = ExamSessions()
@@ -0,0 +1,169 @@
+"""Per-process journal files
+
+The write-behind counters and the submission queue append to a local journal
+before acknowledging anything. Under several workers (gunicorn -w 4) each
+process writes, rotates and deletes only its own file, {base}.{pid}, so no
+worker can touch entries another has acknowledged but not yet applied.
+
+A process shows it is still running by holding an exclusive lock on
+{base}.{pid}.owner for its whole life. Recovery, done under {base}.lock so two
+workers starting together don't both do it, replays the journals whose owner
+lock can be taken (their process has exited) and deletes them. A process
+recovers before claiming its own journal, so a leftover from an earlier process
+with the same pid is replayed rather than adopted. Without fcntl (Windows, where
+the app runs as a single process) every other process's journal counts as
+abandoned.
+
+flush() is the one rotate -> apply -> delete sequence both users share. Flushes
+are serialized, so the shutdown flush waits for a periodic one still running in
+its thread instead of rotating into the same .flushing file and having it
+deleted underneath.
+"""
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows; see above
+    fcntl = None
+
+
+def _lock(f, blocking: bool = True) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        return False
+    return True
+
+
+class ProcessJournals:
+    def __init__(self, base_path: str, replay: Callable[[List[str]], int]):
+        """replay(paths) applies the entries in abandoned journal files and returns how many"""
+        self.base_path = os.path.abspath(base_path)
+        self.replay = replay
+        self._owner = None
+        self._pid: Optional[int] = None
+        self._file = None
+        self._flush_lock = threading.Lock()
+    
+    @property
+    def path(self) -> str:
+        """This process's journal, claimed on first use"""
+        if self._pid != os.getpid():
+            self._claim()
+        return f"{self.base_path}.{self._pid}"
+    
+    def _recovery_lock(self):
+        os.makedirs(os.path.dirname(self.base_path), exist_ok=True)
+        f = open(self.base_path + ".lock", "a")
+        _lock(f)
+        return f  # closing it releases the lock
+    
+    def _claim(self):
+        with self._recovery_lock():
+            pid = os.getpid()
+            self._recover(exclude=None)
+            owner = open(f"{self.base_path}.{pid}.owner", "a")
+            _lock(owner)
+            self._owner, self._pid = owner, pid
+    
+    def write(self, line: str, sync: bool = False):
+        """Append a line to this process's journal; the caller serializes writes
+        
+        The line reaches the OS before this returns, and the disk too with sync.
+        """
+        if self._file is None:
+            self._file = open(self.path, "a", buffering=1)
+        self._file.write(line)
+        if sync:
+            os.fsync(self._file.fileno())
+    
+    def _rotate(self, sync: bool) -> str:
+        journal_path = self.path
+        flushing_path = journal_path + ".flushing"
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            # Appending (rather than renaming) keeps entries from a failed earlier flush
+            with open(journal_path) as src, open(flushing_path, "a") as dst:
+                shutil.copyfileobj(src, dst)
+                if sync:
+                    dst.flush()
+                    os.fsync(dst.fileno())
+            os.remove(journal_path)
+        return flushing_path
+    
+    def flush(
+        self,
+        lock,
+        take: Callable[[], Any],
+        apply: Callable[[Any], None],
+        restore: Callable[[Any], None],
+        sync: bool = False
+    ) -> int:
+        """Rotate the journal aside, apply the batch, then delete the rotated file
+        
+        take() hands over the pending batch and restore(batch) puts it back when
+        rotating or applying fails; both run under lock, the lock the caller holds
+        around write(). Returns the size of the batch applied.
+        """
+        with self._flush_lock:
+            with lock:
+                batch = take()
+                if not batch:
+                    return 0
+                try:
+                    flushing_path = self._rotate(sync)
+                except Exception:
+                    restore(batch)
+                    raise
+            
+            try:
+                apply(batch)
+            except Exception:
+                with lock:
+                    restore(batch)
+                raise
+            os.remove(flushing_path)
+            return len(batch)
+    
+    def recover(self) -> int:
+        """Replay and delete the journals of processes that have exited"""
+        with self._recovery_lock():
+            return self._recover(exclude=self._pid if self._pid == os.getpid() else None)
+    
+    def _recover(self, exclude: Optional[int]) -> int:
+        directory, prefix = os.path.split(self.base_path)
+        groups: Dict[Optional[int], List[str]] = {}  # pid (None before per-process files) -> its files
+        for name in sorted(os.listdir(directory)):
+            if name in (prefix, prefix + ".flushing"):
+                groups.setdefault(None, []).append(os.path.join(directory, name))
+            elif name.startswith(prefix + "."):
+                pid, _, suffix = name[len(prefix) + 1:].partition(".")
+                if pid.isdigit() and suffix in ("", "flushing", "owner"):
+                    groups.setdefault(int(pid), []).append(os.path.join(directory, name))
+        
+        journals, owners = [], {}
+        try:
+            for pid, paths in groups.items():
+                if pid is not None:
+                    if pid == exclude:
+                        continue
+                    owner_path = f"{self.base_path}.{pid}.owner"
+                    owners[owner_path] = owner = open(owner_path, "a")
+                    if not _lock(owner, blocking=False):
+                        del owners[owner_path]
+                        owner.close()
+                        continue  # still running
+                journals += [path for path in paths if not path.endswith(".owner")]
+            replayed = self.replay(journals) if journals else 0
+            for path in journals + list(owners):
+                os.remove(path)
+            return replayed
+        finally:
+            for owner in owners.values():
+                owner.close()
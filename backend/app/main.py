@@ -10,7 +10,12 @@ import os
 
 from app.config import get_settings
 from app.database import init_db
-from app.routers import auth, users, classrooms, courses, assignments, tests, chat, announcements, career, admin, events, ai_support
+from app.compression import CompressionMiddleware
+from app.counters import counters
+from app.submission_queue import submission_queue
+from app.exam_sessions import exam_sessions
+from app.user_directory import user_directory
+from app.routers import auth, users, classrooms, courses, assignments, tests, chat, announcements, career, admin, events, ai_support, uploads, gradebook, calendar, activity, search
 
 
 settings = get_settings()
@@ -23,11 +28,19 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting RVSync...")
     init_db()
     print("✅ Database initialized")
+    counters.start(settings.COUNTER_FLUSH_INTERVAL)
+    submission_queue.start(settings.SUBMISSION_QUEUE_FLUSH_INTERVAL)
+    exam_sessions.start(settings.EXAM_AUTOSAVE_FLUSH_INTERVAL, settings.EXAM_SWEEP_INTERVAL)
+    user_directory.start(settings.USER_DIRECTORY_REFRESH_INTERVAL)
     
     yield
     
     # Shutdown
     print("👋 Shutting down RVSync...")
+    await user_directory.stop()
+    await exam_sessions.stop()
+    await submission_queue.stop()
+    await counters.stop()
 
 
 # Create FastAPI app
@@ -45,6 +58,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+# Compress large JSON responses
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
 )
 
 # Include routers
@@ -59,7 +81,12 @@ app.include_router(announcements.router)
 app.include_router(career.router)
 app.include_router(admin.router)
 app.include_router(events.router)
+app.include_router(calendar.router)
+app.include_router(activity.router)
+app.include_router(search.router)
 app.include_router(ai_support.router)
+app.include_router(uploads.router)
+app.include_router(gradebook.router)
 
 
 @app.get("/")
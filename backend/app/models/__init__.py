@@ -1,7 +1,10 @@
 from app.models.user import User, GitHubRepo, LinkedInExperience
 from app.models.classroom import Classroom, ClassroomEnrollment, StudyGroup, StudyGroupMember
 from app.models.course import Course, CourseMaterial, CourseUpdate
-from app.models.assignment import Assignment, Submission, Test, TestResult
+from app.models.assignment import Assignment, Submission, Test, TestQuestion, TestResult, TestAttempts, AssignmentStats, AssignmentGradeBucket
 from app.models.chat import ChatMessage, Announcement, AnnouncementRead
-from app.models.event import Event
+from app.models.event import Event, CalendarVersion
 from app.models.career import Opportunity, OpportunityMatch, CareerPrediction, UserSkill
+from app.models.upload import Upload, StoredObject
+from app.models.activity import ActivityItem, TimelineEntry
+from app.models import search  # registers the search index and its write hooks
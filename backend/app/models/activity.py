@@ -0,0 +1,218 @@
+"""Activity Feed Models
+
+Announcements, course updates, assignments, published tests and events are each
+recorded once as an ActivityItem when they are created. For classrooms of up to
+ACTIVITY_FANOUT_MAX_MEMBERS members the item is also copied into every member's
+timeline in the same transaction (fan-out on write), so reading a feed is one
+index range scan per user. Items of bigger classrooms, and institution-wide
+ones, are not copied; feeds merge them in when read.
+"""
+from datetime import datetime
+from sqlalchemy import (
+    Column, Integer, String, DateTime, ForeignKey, Boolean, Index, UniqueConstraint,
+    delete, func, insert, literal, select, update
+)
+from sqlalchemy import event as orm_event
+from app.config import get_settings
+from app.database import Base
+from app.models.classroom import ClassroomEnrollment
+from app.models.course import Course, CourseUpdate
+from app.models.assignment import Assignment, Test
+from app.models.chat import Announcement
+from app.models.event import Event
+
+settings = get_settings()
+
+SUMMARY_LENGTH = 280
+
+
+class ActivityItem(Base):
+    __tablename__ = "activity_items"
+    __table_args__ = (
+        UniqueConstraint("kind", "source_id", name="uq_activity_source"),
+        # Feeds read the items that weren't fanned out per classroom, newest first
+        Index("ix_activity_unfanned", "fanned_out", "classroom_id", "created_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)  # announcement, course_update, assignment, test, event
+    source_id = Column(Integer, nullable=False)  # id of the row in the kind's table
+    classroom_id = Column(Integer, ForeignKey("classrooms.id"))  # NULL = institution-wide
+    course_id = Column(Integer, ForeignKey("courses.id"))
+    actor_id = Column(Integer, ForeignKey("users.id"))
+    
+    # Content
+    title = Column(String(255), nullable=False)
+    summary = Column(String(SUMMARY_LENGTH))
+    
+    # Copied into members' timelines when created
+    fanned_out = Column(Boolean, nullable=False, default=False)
+    
+    # Timestamps
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class TimelineEntry(Base):
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        Index("ix_timeline_user_recent", "user_id", "created_at", "activity_id"),
+    )
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    activity_id = Column(Integer, ForeignKey("activity_items.id"), primary_key=True)
+    created_at = Column(DateTime, nullable=False)  # the item's, so pages come straight off the index
+
+
+def _snippet(text):
+    if not text:
+        return None
+    return text if len(text) <= SUMMARY_LENGTH else text[:SUMMARY_LENGTH - 3] + "..."
+
+
+def _course_classroom(connection, course_id):
+    return connection.execute(select(Course.classroom_id).where(Course.id == course_id)).scalar()
+
+
+def _announcement(connection, row: Announcement) -> dict:
+    return dict(
+        classroom_id=row.classroom_id, course_id=None, actor_id=row.user_id,
+        title=row.title, summary=_snippet(row.content), created_at=row.created_at
+    )
+
+
+def _course_update(connection, row: CourseUpdate) -> dict:
+    return dict(
+        classroom_id=_course_classroom(connection, row.course_id), course_id=row.course_id, actor_id=row.user_id,
+        title=row.title or "Course update", summary=_snippet(row.content), created_at=row.created_at
+    )
+
+
+def _assignment(connection, row: Assignment) -> dict:
+    return dict(
+        classroom_id=_course_classroom(connection, row.course_id), course_id=row.course_id, actor_id=row.created_by,
+        title=row.title, summary=_snippet(row.description), created_at=row.created_at
+    )
+
+
+def _test(connection, row: Test) -> dict:
+    # A test appears when it is published, not when its draft was created
+    return dict(
+        classroom_id=_course_classroom(connection, row.course_id), course_id=row.course_id, actor_id=row.created_by,
+        title=row.title, summary=_snippet(row.description), created_at=datetime.utcnow()
+    )
+
+
+def _event(connection, row: Event) -> dict:
+    return dict(
+        classroom_id=row.classroom_id, course_id=None, actor_id=row.created_by,
+        title=row.title, summary=_snippet(row.description), created_at=row.created_at
+    )
+
+
+# Model -> (kind, describe(connection, row) -> ActivityItem values)
+SOURCES = {
+    Announcement: ("announcement", _announcement),
+    CourseUpdate: ("course_update", _course_update),
+    Assignment: ("assignment", _assignment),
+    Test: ("test", _test),
+    Event: ("event", _event),
+}
+
+
+def _listed(row) -> bool:
+    return getattr(row, "is_published", True)
+
+
+def publish(connection, kind: str, source_id: int, values: dict):
+    """Record an item and, for a small enough classroom, copy it into its members' timelines"""
+    values["created_at"] = values["created_at"] or datetime.utcnow()
+    classroom_id = values["classroom_id"]
+    fan_out = False
+    if classroom_id is not None:
+        members = connection.execute(select(func.count()).select_from(
+            select(ClassroomEnrollment.id).where(
+                ClassroomEnrollment.classroom_id == classroom_id
+            ).limit(settings.ACTIVITY_FANOUT_MAX_MEMBERS + 1).subquery()
+        )).scalar()
+        fan_out = members <= settings.ACTIVITY_FANOUT_MAX_MEMBERS
+    
+    activity_id = connection.execute(
+        insert(ActivityItem).values(kind=kind, source_id=source_id, fanned_out=fan_out, **values).returning(ActivityItem.id)
+    ).scalar()
+    if fan_out:
+        connection.execute(insert(TimelineEntry).from_select(
+            ["user_id", "activity_id", "created_at"],
+            select(
+                ClassroomEnrollment.user_id,
+                literal(activity_id, Integer),
+                literal(values["created_at"], DateTime)
+            ).where(ClassroomEnrollment.classroom_id == classroom_id)
+        ))
+
+
+def retract(connection, kind: str, source_id: int):
+    """Remove an item from the feed and every timeline it was copied into"""
+    activity_ids = select(ActivityItem.id).where(ActivityItem.kind == kind, ActivityItem.source_id == source_id)
+    connection.execute(delete(TimelineEntry).where(TimelineEntry.activity_id.in_(activity_ids)))
+    connection.execute(delete(ActivityItem).where(ActivityItem.kind == kind, ActivityItem.source_id == source_id))
+
+
+def _source_inserted(mapper, connection, target):
+    kind, describe = SOURCES[mapper.class_]
+    if _listed(target):
+        publish(connection, kind, target.id, describe(connection, target))
+
+
+def _source_updated(mapper, connection, target):
+    kind, describe = SOURCES[mapper.class_]
+    if not _listed(target):
+        retract(connection, kind, target.id)
+        return
+    
+    existing = connection.execute(select(
+        ActivityItem.classroom_id, ActivityItem.course_id, ActivityItem.title, ActivityItem.summary
+    ).where(ActivityItem.kind == kind, ActivityItem.source_id == target.id)).first()
+    values = describe(connection, target)
+    if existing is None or existing.classroom_id != values["classroom_id"]:
+        # Newly published, or moved to another classroom's members
+        retract(connection, kind, target.id)
+        publish(connection, kind, target.id, values)
+    elif (existing.course_id, existing.title, existing.summary) != (values["course_id"], values["title"], values["summary"]):
+        connection.execute(update(ActivityItem).where(
+            ActivityItem.kind == kind, ActivityItem.source_id == target.id
+        ).values(course_id=values["course_id"], title=values["title"], summary=values["summary"]))
+
+
+def _source_deleted(mapper, connection, target):
+    retract(connection, SOURCES[mapper.class_][0], target.id)
+
+
+for _model in SOURCES:
+    orm_event.listen(_model, "after_insert", _source_inserted)
+    orm_event.listen(_model, "after_update", _source_updated)
+    orm_event.listen(_model, "after_delete", _source_deleted)
+
+
+def join_timeline(connection, user_id: int, classroom_id: int):
+    """Start a new member's timeline with the classroom's recent activity
+    
+    Enrollments are written with Core inserts and updates, so the routers that
+    change them call this and leave_timeline themselves.
+    """
+    recent = select(ActivityItem.id, ActivityItem.created_at).where(
+        ActivityItem.fanned_out == True,
+        ActivityItem.classroom_id == classroom_id
+    ).order_by(ActivityItem.created_at.desc(), ActivityItem.id.desc()).limit(settings.ACTIVITY_BACKFILL).subquery()
+    connection.execute(insert(TimelineEntry).from_select(
+        ["user_id", "activity_id", "created_at"],
+        select(literal(user_id, Integer), recent.c.id, recent.c.created_at)
+    ))
+
+
+def leave_timeline(connection, user_id: int, classroom_id: int):
+    connection.execute(delete(TimelineEntry).where(
+        TimelineEntry.user_id == user_id,
+        TimelineEntry.activity_id.in_(
+            select(ActivityItem.id).where(ActivityItem.classroom_id == classroom_id)
+        )
+    ))
@@ -1,6 +1,6 @@
 """Assignment and Submission Models"""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -34,6 +34,10 @@ class Assignment(Base):
 
 class Submission(Base):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # One submission per student; resubmitting replaces it
+        UniqueConstraint("assignment_id", "user_id", name="uq_submission_assignment_user"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("assignments.id"), nullable=False)
@@ -73,8 +77,9 @@ class Test(Base):
     time_limit = Column(Integer, default=60)  # minutes
     max_attempts = Column(Integer, default=1)
     
-    # Questions (JSON-serialized)
+    # Legacy JSON-serialized questions; test_questions is the source of truth now
     questions = Column(Text, default="[]")
+    key_version = Column(Integer, default=1)  # bumped whenever the questions change
     
     # Settings
     is_published = Column(Boolean, default=False)
@@ -86,8 +91,37 @@ class Test(Base):
     results = relationship("TestResult", back_populates="test")
 
 
+class TestQuestion(Base):
+    __tablename__ = "test_questions"
+    __table_args__ = (
+        UniqueConstraint("test_id", "position", name="uq_test_question_position"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    test_id = Column(Integer, ForeignKey("tests.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # the index answers are keyed by
+    
+    question = Column(Text, nullable=False)
+    type = Column(String(20), default="mcq")  # mcq, short_answer
+    options = Column(Text, default="[]")  # JSON list
+    correct_answer = Column(Text, nullable=False)
+    points = Column(Float, default=10.0)
+    
+    # Item analysis, accumulated as results arrive (scores are result percentages)
+    attempt_count = Column(Integer, nullable=False, default=0)
+    correct_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    score_sq_sum = Column(Float, nullable=False, default=0.0)
+    correct_score_sum = Column(Float, nullable=False, default=0.0)
+
+
 class TestResult(Base):
     __tablename__ = "test_results"
+    __table_args__ = (
+        UniqueConstraint("test_id", "user_id", "attempt_number", name="uq_test_result_attempt"),
+        # The exam sweeper's scan for open attempts past their deadline
+        Index("ix_test_results_open", "completed_at", "expires_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     test_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
@@ -104,8 +138,39 @@ class TestResult(Base):
     
     # Timing
     started_at = Column(DateTime, default=datetime.utcnow)
-    completed_at = Column(DateTime)
+    completed_at = Column(DateTime)  # NULL while a timed session is still open
+    expires_at = Column(DateTime)  # deadline of a timed session
     
     # Relationships
     test = relationship("Test", back_populates="results")
     user = relationship("User", back_populates="test_results")
+
+
+class TestAttempts(Base):
+    """Attempts a student has used on a test, reserved atomically before the result is written"""
+    __tablename__ = "test_attempts"
+    
+    test_id = Column(Integer, ForeignKey("tests.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    used = Column(Integer, nullable=False, default=0)
+
+
+class AssignmentStats(Base):
+    """Running submission and grade totals, updated in the same transaction as the submissions"""
+    __tablename__ = "assignment_stats"
+    
+    assignment_id = Column(Integer, ForeignKey("assignments.id"), primary_key=True)
+    submission_count = Column(Integer, nullable=False, default=0)
+    late_count = Column(Integer, nullable=False, default=0)
+    graded_count = Column(Integer, nullable=False, default=0)
+    grade_sum = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AssignmentGradeBucket(Base):
+    """Graded submissions per whole percent of the assignment's points (0-100)"""
+    __tablename__ = "assignment_grade_buckets"
+    
+    assignment_id = Column(Integer, ForeignKey("assignments.id"), primary_key=True)
+    percent = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -1,6 +1,6 @@
 """Chat and Communication Models"""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -30,6 +30,9 @@ class ChatMessage(Base):
 
 class Announcement(Base):
     __tablename__ = "announcements"
+    __table_args__ = (
+        Index("ix_announcement_listing", "classroom_id", "is_pinned", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"))  # NULL = institution-wide
@@ -55,6 +58,9 @@ class Announcement(Base):
 
 class AnnouncementRead(Base):
     __tablename__ = "announcement_reads"
+    __table_args__ = (
+        UniqueConstraint("announcement_id", "user_id", name="uq_announcement_read"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     announcement_id = Column(Integer, ForeignKey("announcements.id"), nullable=False)
@@ -1,6 +1,6 @@
 """Classroom Models"""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
@@ -62,6 +62,18 @@ class Classroom(Base):
 
 class ClassroomEnrollment(Base):
     __tablename__ = "classroom_enrollments"
+    __table_args__ = (
+        UniqueConstraint("classroom_id", "user_id", name="uq_enrollment_classroom_user"),
+        # A student can only ever belong to one classroom (instructors may teach several)
+        Index(
+            "uq_enrollment_student",
+            "user_id",
+            unique=True,
+            sqlite_where=text("role = 'student'"),
+            postgresql_where=text("role = 'student'"),
+        ),
+        Index("ix_enrollment_classroom_role", "classroom_id", "role"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=False)
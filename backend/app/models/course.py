@@ -39,6 +39,10 @@ class CourseMaterial(Base):
     file_path = Column(String(500))
     description = Column(Text)
     
+    # From the upload behind file_path; served as the download's name and type
+    file_name = Column(String(255))
+    content_type = Column(String(100))
+    
     # Tracking
     uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     download_count = Column(Integer, default=0)
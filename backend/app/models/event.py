@@ -1,14 +1,23 @@
 """Event Model"""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index, select
+from sqlalchemy import event as orm_event
 from sqlalchemy.orm import relationship
-from app.database import Base
+from sqlalchemy.orm.attributes import get_history
+from app import recurrence
+from app.database import Base, upsert
 from app.models.classroom import Classroom
 from app.models.user import User
+from app.models.course import Course
+from app.models.assignment import Assignment, Test
 
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        # Range queries: series in a classroom starting before the window and ending after it
+        Index("ix_events_classroom_range", "classroom_id", "start_time", "series_end"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=True) # NULL = global event
@@ -24,6 +33,10 @@ class Event(Base):
     end_time = Column(DateTime, nullable=False)
     is_all_day = Column(Boolean, default=False)
     
+    # Recurrence: start_time/end_time are the first occurrence
+    recurrence_rule = Column(String(255))  # e.g. FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20270430
+    series_end = Column(DateTime)  # end of the last occurrence; NULL if the series never ends
+    
     # Event Category
     event_type = Column(String(50), default="other") # exam, assignment, seminar, holiday, activity
     
@@ -34,3 +47,59 @@ class Event(Base):
     # Relationships
     classroom = relationship("Classroom", back_populates="events")
     creator = relationship("User", back_populates="events_created")
+
+
+@orm_event.listens_for(Event, "before_insert")
+@orm_event.listens_for(Event, "before_update")
+def _set_series_end(mapper, connection, target: Event):
+    if target.recurrence_rule:
+        rule = recurrence.parse_rule(target.recurrence_rule)
+        target.series_end = recurrence.series_end(rule, target.start_time, target.end_time)
+    else:
+        target.series_end = target.end_time
+
+
+class CalendarVersion(Base):
+    """Bumped whenever anything shown in a classroom's calendar feed changes
+    
+    scope_id is the classroom, or 0 for global events. Feeds compare these
+    versions to decide whether a cached copy is still current.
+    """
+    __tablename__ = "calendar_versions"
+    
+    scope_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+def touch_calendar(connection, classroom_id):
+    """Bump a classroom's calendar version in the current transaction"""
+    now = datetime.utcnow()
+    stmt = upsert(CalendarVersion).values(scope_id=classroom_id or 0, version=1, updated_at=now)
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[CalendarVersion.scope_id],
+        set_={"version": CalendarVersion.version + 1, "updated_at": now}
+    ))
+
+
+@orm_event.listens_for(Event, "after_insert")
+@orm_event.listens_for(Event, "after_update")
+@orm_event.listens_for(Event, "after_delete")
+def _event_changed(mapper, connection, target: Event):
+    # An event moved between classrooms changes both calendars
+    for classroom_id in {target.classroom_id, *get_history(target, "classroom_id").deleted}:
+        touch_calendar(connection, classroom_id)
+
+
+@orm_event.listens_for(Assignment, "after_insert")
+@orm_event.listens_for(Assignment, "after_update")
+@orm_event.listens_for(Assignment, "after_delete")
+@orm_event.listens_for(Test, "after_insert")
+@orm_event.listens_for(Test, "after_update")
+@orm_event.listens_for(Test, "after_delete")
+def _course_item_changed(mapper, connection, target):
+    classroom_id = connection.execute(
+        select(Course.classroom_id).where(Course.id == target.course_id)
+    ).scalar()
+    if classroom_id is not None:
+        touch_calendar(connection, classroom_id)
@@ -0,0 +1,229 @@
+"""Full-text Search Index
+
+Courses, materials, course updates, announcements and direct messages are
+copied into one search index by write hooks, in the writing transaction, so
+search never lags behind the data. On SQLite the index is an FTS5 table ranked
+with bm25; on Postgres it is a table with a generated, weighted tsvector column
+under a GIN index, ranked with ts_rank_cd. Next to the text, every document
+stores who may see it (its classroom, or for messages the two participants),
+so permission filtering happens in the same query that matches and ranks.
+
+A document's id encodes its kind and source row, so reindexing or removing one
+is a primary key lookup.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import DDL, bindparam, select, text
+from sqlalchemy import event as orm_event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from app.config import get_settings
+from app.database import Base
+from app.models.course import Course, CourseMaterial, CourseUpdate
+from app.models.chat import Announcement, ChatMessage
+
+settings = get_settings()
+IS_SQLITE = "sqlite" in settings.DATABASE_URL
+
+KINDS = {"course": 1, "material": 2, "course_update": 3, "announcement": 4, "message": 5}
+_KIND_BITS = 3
+MAX_TERMS = 8
+
+orm_event.listen(Base.metadata, "after_create", DDL("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body,
+        kind UNINDEXED, source_id UNINDEXED, classroom_id UNINDEXED, course_id UNINDEXED,
+        user_a UNINDEXED, user_b UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+""").execute_if(dialect="sqlite"))
+orm_event.listen(Base.metadata, "after_create", DDL("""
+    CREATE TABLE IF NOT EXISTS search_documents (
+        doc_id BIGINT PRIMARY KEY,
+        kind VARCHAR(20) NOT NULL,
+        source_id INTEGER NOT NULL,
+        classroom_id INTEGER,
+        course_id INTEGER,
+        user_a INTEGER,
+        user_b INTEGER,
+        title TEXT,
+        body TEXT,
+        document TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(body, '')), 'B')
+        ) STORED
+    );
+    CREATE INDEX IF NOT EXISTS ix_search_documents_document ON search_documents USING gin (document)
+""").execute_if(dialect="postgresql"))
+
+if IS_SQLITE:
+    _INSERT = text("""
+        INSERT INTO search_index (rowid, title, body, kind, source_id, classroom_id, course_id, user_a, user_b)
+        VALUES (:doc_id, :title, :body, :kind, :source_id, :classroom_id, :course_id, :user_a, :user_b)
+    """)
+    _DELETE = text("DELETE FROM search_index WHERE rowid = :doc_id")
+    _SEARCH = """
+        SELECT rowid AS doc_id, kind, source_id, classroom_id, course_id, title,
+               snippet(search_index, -1, '', '', '...', 16) AS snippet,
+               bm25(search_index, 4.0, 1.0) AS score
+        FROM search_index
+        WHERE search_index MATCH :query AND {filters}
+        ORDER BY score, doc_id
+        LIMIT :limit
+    """
+    _AFTER = "(bm25(search_index, 4.0, 1.0), rowid) > (:after_score, :after_id)"
+else:
+    _INSERT = text("""
+        INSERT INTO search_documents (doc_id, title, body, kind, source_id, classroom_id, course_id, user_a, user_b)
+        VALUES (:doc_id, :title, :body, :kind, :source_id, :classroom_id, :course_id, :user_a, :user_b)
+        ON CONFLICT (doc_id) DO UPDATE SET
+            title = excluded.title, body = excluded.body, classroom_id = excluded.classroom_id,
+            course_id = excluded.course_id, user_a = excluded.user_a, user_b = excluded.user_b
+    """)
+    _DELETE = text("DELETE FROM search_documents WHERE doc_id = :doc_id")
+    _SEARCH = """
+        SELECT doc_id, kind, source_id, classroom_id, course_id, title,
+               ts_headline('english', coalesce(nullif(body, ''), title), q,
+                           'StartSel="", StopSel="", MinWords=8, MaxWords=24') AS snippet,
+               -ts_rank_cd(document, q) AS score
+        FROM search_documents, to_tsquery('english', :query) AS q
+        WHERE document @@ q AND {filters}
+        ORDER BY score, doc_id
+        LIMIT :limit
+    """
+    _AFTER = "(-ts_rank_cd(document, q), doc_id) > (:after_score, :after_id)"
+
+_VISIBLE = """(
+    (kind = 'message' AND (user_a = :user_id OR user_b = :user_id))
+    OR (kind <> 'message' AND (classroom_id IS NULL OR classroom_id IN :classroom_ids))
+)"""
+
+
+def doc_id(kind: str, source_id: int) -> int:
+    return source_id << _KIND_BITS | KINDS[kind]
+
+
+def _course_classroom(connection, course_id):
+    return connection.execute(select(Course.classroom_id).where(Course.id == course_id)).scalar()
+
+
+def _course(connection, row: Course) -> dict:
+    return dict(
+        classroom_id=row.classroom_id, course_id=row.id, user_a=None, user_b=None,
+        title=f"{row.code} {row.name}", body=" ".join(filter(None, [row.description, row.instructor]))
+    )
+
+
+def _material(connection, row: CourseMaterial) -> dict:
+    return dict(
+        classroom_id=_course_classroom(connection, row.course_id), course_id=row.course_id, user_a=None, user_b=None,
+        title=row.title, body=row.description or ""
+    )
+
+
+def _course_update(connection, row: CourseUpdate) -> dict:
+    return dict(
+        classroom_id=_course_classroom(connection, row.course_id), course_id=row.course_id, user_a=None, user_b=None,
+        title=row.title or "", body=row.content
+    )
+
+
+def _announcement(connection, row: Announcement) -> dict:
+    return dict(
+        classroom_id=row.classroom_id, course_id=None, user_a=None, user_b=None,
+        title=row.title, body=row.content
+    )
+
+
+def _message(connection, row: ChatMessage) -> dict:
+    return dict(
+        classroom_id=None, course_id=None, user_a=row.from_user_id, user_b=row.to_user_id,
+        title="", body=row.message
+    )
+
+
+# Model -> (kind, attributes whose change needs a reindex, describe(connection, row))
+SOURCES = {
+    Course: ("course", ("classroom_id", "code", "name", "description", "instructor"), _course),
+    CourseMaterial: ("material", ("course_id", "title", "description"), _material),
+    CourseUpdate: ("course_update", ("course_id", "title", "content"), _course_update),
+    Announcement: ("announcement", ("classroom_id", "title", "content"), _announcement),
+    ChatMessage: ("message", ("message",), _message),
+}
+
+
+def index_document(connection, kind: str, source_id: int, values: dict):
+    params = dict(values, doc_id=doc_id(kind, source_id), kind=kind, source_id=source_id)
+    if IS_SQLITE:
+        # FTS5 tables have no upsert
+        connection.execute(_DELETE, {"doc_id": params["doc_id"]})
+    connection.execute(_INSERT, params)
+
+
+def remove_document(connection, kind: str, source_id: int):
+    connection.execute(_DELETE, {"doc_id": doc_id(kind, source_id)})
+
+
+def _source_inserted(mapper, connection, target):
+    kind, _, describe = SOURCES[mapper.class_]
+    index_document(connection, kind, target.id, describe(connection, target))
+
+
+def _source_updated(mapper, connection, target):
+    kind, attributes, describe = SOURCES[mapper.class_]
+    # Read receipts, download counts and the like don't touch the index
+    if any(get_history(target, name).has_changes() for name in attributes):
+        index_document(connection, kind, target.id, describe(connection, target))
+
+
+def _source_deleted(mapper, connection, target):
+    remove_document(connection, SOURCES[mapper.class_][0], target.id)
+
+
+for _model in SOURCES:
+    orm_event.listen(_model, "after_insert", _source_inserted)
+    orm_event.listen(_model, "after_update", _source_updated)
+    orm_event.listen(_model, "after_delete", _source_deleted)
+
+
+def _terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def search(
+    db: Session,
+    user_id: int,
+    classroom_ids: List[int],
+    query: str,
+    kinds: Optional[List[str]],
+    limit: int,
+    after: Optional[Tuple[float, int]] = None
+):
+    """One page of the documents matching every word of query that the user may see
+    
+    Best match first; the last word also matches as a prefix. after is the
+    (score, doc_id) of the previous page's last row.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    if IS_SQLITE:
+        match = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+    else:
+        match = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+    
+    filters = [_VISIBLE]
+    params = {"query": match, "user_id": user_id, "classroom_ids": classroom_ids, "limit": limit}
+    bind = [bindparam("classroom_ids", expanding=True)]
+    if kinds:
+        filters.append("kind IN :kinds")
+        params["kinds"] = kinds
+        bind.append(bindparam("kinds", expanding=True))
+    if after:
+        filters.append(_AFTER)
+        params["after_score"], params["after_id"] = after
+    
+    statement = text(_SEARCH.format(filters=" AND ".join(filters))).bindparams(*bind)
+    return db.execute(statement, params).all()
@@ -0,0 +1,39 @@
+"""File Upload Models"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger
+from app.database import Base
+
+
+class Upload(Base):
+    __tablename__ = "uploads"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex, handed to the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    
+    # Declared by the client when the upload is started
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100))
+    size = Column(BigInteger, nullable=False)
+    
+    # Set once every byte has arrived and the file is in the content store
+    sha256 = Column(String(64), index=True)
+    file_path = Column(String(500))
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+
+
+class StoredObject(Base):
+    """One row per object in the content store, shared by every record pointing at it"""
+    __tablename__ = "stored_objects"
+    
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    
+    # Materials and submissions whose file_path is this object; GC removes it at 0
+    ref_count = Column(Integer, nullable=False, default=0)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_uploaded_at = Column(DateTime, default=datetime.utcnow)  # GC grace starts here
@@ -32,6 +32,9 @@ class User(Base):
     # Skills (JSON-serialized list)
     skills = Column(Text, default="[]")
     
+    # Secret in the user's calendar feed URL; calendar apps can't send auth headers
+    calendar_token = Column(String(64), unique=True, index=True)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,170 @@
+"""Recurring event rules
+
+Events repeat by an RRULE-style rule such as "FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20270430",
+covering FREQ=DAILY|WEEKLY|MONTHLY with INTERVAL, BYDAY (weekly rules only),
+COUNT and UNTIL. A series is stored as one row and expanded only when read, and
+only from the first period that can reach the requested window, so asking for
+one week of a semester-long timetable generates that week's occurrences and no
+more.
+"""
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import count
+from typing import Iterator, Optional, Tuple
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+# Upper bound on one period's length, for skipping periods that end before a window
+_MAX_PERIOD_DAYS = {"DAILY": 1, "WEEKLY": 7, "MONTHLY": 31}
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    freq: str
+    interval: int = 1
+    weekdays: Tuple[int, ...] = ()
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+
+
+def _parse_until(value: str) -> datetime:
+    value = value.rstrip("Z")
+    for fmt in ("%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            until = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        # A bare date includes occurrences on that day
+        return until if "T" in value else until + timedelta(days=1, microseconds=-1)
+    raise ValueError(f"UNTIL must look like 20270430 or 20270430T235959Z, not {value}")
+
+
+def parse_rule(text: str) -> RecurrenceRule:
+    """Parse a rule string; raises ValueError saying what is wrong with it"""
+    parts = {}
+    for part in text.strip().removeprefix("RRULE:").split(";"):
+        if part:
+            name, _, value = part.partition("=")
+            parts[name.strip().upper()] = value.strip().upper()
+    
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    interval = int(parts.pop("INTERVAL", 1))
+    if interval < 1:
+        raise ValueError("INTERVAL must be at least 1")
+    
+    weekdays = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        days = parts.pop("BYDAY").split(",")
+        unknown = [day for day in days if day not in WEEKDAYS]
+        if unknown:
+            raise ValueError(f"Unknown BYDAY weekday {unknown[0]}")
+        weekdays = tuple(sorted({WEEKDAYS[day] for day in days}))
+    
+    occurrences = int(parts.pop("COUNT")) if "COUNT" in parts else None
+    if occurrences is not None and occurrences < 1:
+        raise ValueError("COUNT must be at least 1")
+    until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+    if occurrences is not None and until is not None:
+        raise ValueError("COUNT and UNTIL can't be combined")
+    
+    if parts.get("WKST", "MO") == "MO":
+        parts.pop("WKST", None)
+    if parts:
+        raise ValueError(f"Unsupported rule part {next(iter(parts))}")
+    return RecurrenceRule(freq, interval, weekdays, occurrences, until)
+
+
+def format_rule(rule: RecurrenceRule, all_day: bool = False) -> str:
+    """The rule as an iCalendar RRULE value, with UNTIL in UTC (a date for all-day series)"""
+    parts = [f"FREQ={rule.freq}"]
+    if rule.interval != 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.weekdays:
+        names = {number: name for name, number in WEEKDAYS.items()}
+        parts.append("BYDAY=" + ",".join(names[day] for day in rule.weekdays))
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    if rule.until is not None:
+        parts.append(f"UNTIL={rule.until:%Y%m%d}" if all_day else f"UNTIL={rule.until:%Y%m%dT%H%M%S}Z")
+    return ";".join(parts)
+
+
+def _first_period(rule: RecurrenceRule, start: datetime, duration: timedelta, window_start: datetime) -> int:
+    """A period index before which every occurrence has ended by window_start"""
+    lead = window_start - duration - start
+    if lead <= timedelta(0):
+        return 0
+    period = timedelta(days=_MAX_PERIOD_DAYS[rule.freq] * rule.interval)
+    return max(int(lead / period) - 1, 0)
+
+
+def _candidates(rule: RecurrenceRule, start: datetime, first_period: int) -> Iterator[Tuple[int, datetime]]:
+    """(index in the series, occurrence start) from first_period on, in order"""
+    if rule.freq == "DAILY":
+        for period in count(first_period):
+            yield period, start + timedelta(days=period * rule.interval)
+    
+    elif rule.freq == "WEEKLY":
+        weekdays = rule.weekdays or (start.weekday(),)
+        week_start = start - timedelta(days=start.weekday())
+        first_week = [day for day in weekdays if day >= start.weekday()]
+        for period in count(first_period):
+            days = first_week if period == 0 else weekdays
+            index = 0 if period == 0 else len(first_week) + (period - 1) * len(weekdays)
+            base = week_start + timedelta(weeks=period * rule.interval)
+            for day in days:
+                yield index, base + timedelta(days=day)
+                index += 1
+    
+    else:
+        # Months too short for the start day are skipped, so they have to be counted
+        index = 0
+        for period in count(0):
+            month = start.month - 1 + period * rule.interval
+            year, month = start.year + month // 12, month % 12 + 1
+            if start.day > monthrange(year, month)[1]:
+                continue
+            if period >= first_period:
+                yield index, start.replace(year=year, month=month)
+            index += 1
+
+
+def occurrences(
+    rule: RecurrenceRule,
+    start: datetime,
+    end: datetime,
+    window_start: datetime,
+    window_end: datetime
+) -> Iterator[Tuple[datetime, datetime]]:
+    """(start, end) of each occurrence overlapping [window_start, window_end), earliest first"""
+    duration = end - start
+    for index, occurrence in _candidates(rule, start, _first_period(rule, start, duration, window_start)):
+        if occurrence >= window_end:
+            return
+        if rule.count is not None and index >= rule.count:
+            return
+        if rule.until is not None and occurrence > rule.until:
+            return
+        if occurrence + duration > window_start or occurrence >= window_start:
+            yield occurrence, occurrence + duration
+
+
+def series_end(rule: RecurrenceRule, start: datetime, end: datetime) -> Optional[datetime]:
+    """When the last occurrence ends, or None for a series that never does
+    
+    For UNTIL rules this is an upper bound rather than the exact last occurrence,
+    which is all the range index needs.
+    """
+    duration = end - start
+    if rule.until is not None:
+        return max(rule.until, start) + duration
+    if rule.count is not None:
+        for index, occurrence in _candidates(rule, start, 0):
+            if index == rule.count - 1:
+                return occurrence + duration
+    return None
@@ -0,0 +1,228 @@
+"""Cached GET responses
+
+Read-heavy endpoints that return the same data to everyone (a classroom, its
+courses, a course page, ...) are wrapped with @cached. The first request
+serializes the response once and keeps the bytes, with a strong ETag of their
+hash, in an in-memory LRU. Later requests are answered from those bytes, and a
+request whose If-None-Match carries the current ETag gets a 304 with nothing
+serialized at all. The endpoint's own dependencies (authentication, the
+database session) still run on every request.
+
+Each entry carries tags such as "course:12". Commits that add, change or delete
+the rows behind a tag invalidate it: ORM writes are collected by session hooks,
+and routers that write with Core statements call invalidate themselves. Writes
+made by other workers can't reach this process's cache, so entries also expire
+after RESPONSE_CACHE_TTL seconds; counters flushed in the background (material
+download counts) lag by up to the same time.
+"""
+import functools
+import hashlib
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import get_history
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.classroom import Classroom, ClassroomEnrollment
+from app.models.course import Course, CourseMaterial, CourseUpdate
+from app.models.assignment import Assignment, Test
+from app.models.event import Event
+
+settings = get_settings()
+
+# Browsers may keep responses but must revalidate them, which costs a 304
+CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    tags: Tuple[str, ...]
+    expires: float
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._tagged: Dict[str, Set[str]] = {}  # tag -> keys of the entries carrying it
+        self._size = 0
+        self._generation = 0  # bumped by every invalidation
+        self._lock = threading.Lock()
+    
+    @property
+    def generation(self) -> int:
+        return self._generation
+    
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key: str, body: bytes, tags: Tuple[str, ...], generation: int) -> CachedResponse:
+        """Store a response built when generation was current
+        
+        If anything was invalidated since, the response may already be stale and
+        is returned without being stored.
+        """
+        entry = CachedResponse(body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"', tags,
+                               time.monotonic() + self.ttl)
+        with self._lock:
+            if generation != self._generation or len(body) > self.max_bytes:
+                return entry
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += len(body)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+    
+    def invalidate(self, *tags: str):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tagged.get(tag, ())):
+                    self._remove(key)
+    
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tagged.clear()
+            self._size = 0
+
+
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES, settings.RESPONSE_CACHE_TTL
+)
+_adapters: Dict[object, TypeAdapter] = {}
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _respond(request: Request, entry: CachedResponse) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+    if _not_modified(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def cached(*tags: str):
+    """Cache a GET endpoint's response under tags formatted from its path parameters
+    
+    Use below the route decorator:
+        @router.get("/course/{course_id}", response_model=CourseDetail)
+        @cached("course:{course_id}")
+        async def get_course_detail(course_id: int, ...):
+    """
+    def decorate(endpoint):
+        signature = inspect.signature(endpoint)
+        wants_request = "request" in signature.parameters
+        
+        @functools.wraps(endpoint)
+        async def wrapper(*args, request: Request, **kwargs):
+            key = request.url.path + "?" + "&".join(sorted(request.url.query.split("&")))
+            entry = response_cache.get(key)
+            if entry is None:
+                generation = response_cache.generation
+                if wants_request:
+                    kwargs["request"] = request
+                result = await endpoint(*args, **kwargs)
+                if isinstance(result, Response):
+                    return result
+                
+                model = request.scope["route"].response_model
+                adapter = _adapters.get(model)
+                if adapter is None:
+                    adapter = _adapters[model] = TypeAdapter(model)
+                body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+                entry = response_cache.put(key, body, tuple(tag.format(**kwargs) for tag in tags), generation)
+            return _respond(request, entry)
+        
+        # FastAPI reads the parameters from the signature; make sure it passes the request
+        if not wants_request:
+            wrapper.__signature__ = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            ])
+        return wrapper
+    return decorate
+
+
+# Tags a row feeds, by the attribute holding each tag's id
+TAGGED = (
+    (Classroom, (("classroom:{}", "id"),)),
+    (ClassroomEnrollment, (("classroom:{}", "classroom_id"),)),  # student counts
+    (Course, (("classroom:{}", "classroom_id"), ("course:{}", "id"))),
+    ((CourseMaterial, CourseUpdate, Assignment, Test), (("course:{}", "course_id"),)),
+    (Event, (("events:{}", "classroom_id"),)),
+)
+
+
+def _tags(obj) -> List[str]:
+    for types, templates in TAGGED:
+        if isinstance(obj, types):
+            tags = []
+            for template, attribute in templates:
+                # A row moved to another course or classroom also leaves the old one
+                history = get_history(obj, attribute)
+                ids = {getattr(obj, attribute), *history.deleted}
+                tags += [template.format(value) for value in ids if value is not None]
+            return tags
+    return []
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_tags(session, flush_context):
+    tags = session.info.setdefault("response_cache", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tags.update(_tags(obj))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate(session):
+    tags = session.info.pop("response_cache", None)
+    if tags:
+        response_cache.invalidate(*tags)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard(session):
+    session.info.pop("response_cache", None)
@@ -0,0 +1,90 @@
+"""Activity Feed Router"""
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, tuple_, union_all
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db
+from app.models.user import User
+from app.models.classroom import ClassroomEnrollment
+from app.models.activity import ActivityItem, TimelineEntry
+from app.schemas.activity import ActivityResponse
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/api/activity", tags=["Activity"])
+
+ACTIVITY_MAX_PAGE_SIZE = 100
+
+
+def _encode_cursor(item: ActivityItem) -> str:
+    return f"{item.created_at.isoformat()},{item.id}"
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, activity_id = cursor.split(",")
+        return datetime.fromisoformat(created_at), int(activity_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/feed", response_model=List[ActivityResponse])
+async def get_activity_feed(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(30, ge=1, le=ACTIVITY_MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Newest-first activity across all of the user's classrooms and institution-wide
+    
+    One statement: the user's timeline, plus the newest items of each of their
+    classrooms (and the institution) that were too big to fan out, each taking
+    at most one page off its index, then merged. The X-Next-Cursor header
+    carries the keyset position of the last row when more rows may follow.
+    """
+    before = _decode_cursor(cursor) if cursor else None
+    
+    timeline = select(TimelineEntry.activity_id.label("id")).where(TimelineEntry.user_id == current_user.id)
+    if before:
+        timeline = timeline.where(tuple_(TimelineEntry.created_at, TimelineEntry.activity_id) < tuple_(*before))
+    pages = [timeline.order_by(TimelineEntry.created_at.desc(), TimelineEntry.activity_id.desc()).limit(limit)]
+    
+    classroom_ids = [cid for cid, in db.query(ClassroomEnrollment.classroom_id).filter(
+        ClassroomEnrollment.user_id == current_user.id
+    )]
+    for classroom_id in [None, *classroom_ids]:
+        unfanned = select(ActivityItem.id).where(
+            ActivityItem.fanned_out == False,
+            ActivityItem.classroom_id.is_(None) if classroom_id is None else ActivityItem.classroom_id == classroom_id
+        )
+        if before:
+            unfanned = unfanned.where(tuple_(ActivityItem.created_at, ActivityItem.id) < tuple_(*before))
+        pages.append(unfanned.order_by(ActivityItem.created_at.desc(), ActivityItem.id.desc()).limit(limit))
+    
+    candidates = union_all(*[select(page.subquery().c.id) for page in pages]).subquery()
+    rows = db.query(ActivityItem, User.name.label("actor_name")).outerjoin(
+        User, User.id == ActivityItem.actor_id
+    ).filter(
+        ActivityItem.id.in_(select(candidates.c.id))
+    ).order_by(ActivityItem.created_at.desc(), ActivityItem.id.desc()).limit(limit).all()
+    
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].ActivityItem)
+    
+    return [
+        ActivityResponse(
+            id=item.id,
+            kind=item.kind,
+            source_id=item.source_id,
+            classroom_id=item.classroom_id,
+            course_id=item.course_id,
+            actor_id=item.actor_id,
+            actor_name=actor_name,
+            title=item.title,
+            summary=item.summary,
+            created_at=item.created_at
+        )
+        for item, actor_name in rows
+    ]
@@ -1,10 +1,19 @@
 """Admin Router - Full access for administrators"""
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func, update, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app import storage
+from app.database import get_db, SessionLocal
+from app.fast_json import FastJSONResponse, dumps
 from app.models.user import User
 from app.models.classroom import Classroom, ClassroomEnrollment
+from app.models.activity import join_timeline, leave_timeline
+from app.user_directory import user_directory
+from app.response_cache import response_cache
+from app.schemas.admin import BulkAdminRequest, BulkAdminResponse, BulkRowResult
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
@@ -17,75 +26,187 @@ def require_admin(current_user: User = Depends(get_current_user)):
     return current_user
 
 
-@router.get("/stats")
+ADMIN_PAGE_SIZE = 100
+ADMIN_MAX_PAGE_SIZE = 1000
+ADMIN_STREAM_BATCH = 1000
+IN_CLAUSE_CHUNK = 500
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _user_rows(after_id: int, limit: int):
+    return select(
+        User.id, User.name, User.email, User.student_id, User.branch,
+        User.year_level, User.section, User.gpa, User.is_admin, User.created_at
+    ).where(User.id > after_id).order_by(User.id).limit(limit)
+
+
+def _user_to_dict(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "email": row.email,
+        "student_id": row.student_id,
+        "branch": row.branch,
+        "year_level": row.year_level,
+        "section": row.section,
+        "gpa": row.gpa,
+        "is_admin": row.is_admin,
+        "created_at": _isoformat(row.created_at)
+    }
+
+
+def _classroom_rows(after_id: int, limit: int):
+    student_counts = select(
+        ClassroomEnrollment.classroom_id,
+        func.count(ClassroomEnrollment.id).label("student_count")
+    ).where(
+        ClassroomEnrollment.role == "student"
+    ).group_by(ClassroomEnrollment.classroom_id).subquery()
+    
+    return select(
+        Classroom.id, Classroom.name, Classroom.code, Classroom.branch,
+        Classroom.year_level, Classroom.section, Classroom.max_students,
+        func.coalesce(student_counts.c.student_count, 0).label("student_count")
+    ).outerjoin(
+        student_counts, student_counts.c.classroom_id == Classroom.id
+    ).where(Classroom.id > after_id).order_by(Classroom.id).limit(limit)
+
+
+def _classroom_to_dict(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "code": row.code,
+        "branch": row.branch,
+        "year_level": row.year_level,
+        "section": row.section,
+        "student_count": row.student_count,
+        "max_students": row.max_students
+    }
+
+
+def _enrollment_rows(after_id: int, limit: int):
+    return select(
+        ClassroomEnrollment.id, ClassroomEnrollment.user_id, User.name.label("user_name"),
+        ClassroomEnrollment.classroom_id, Classroom.name.label("classroom_name"),
+        ClassroomEnrollment.role, ClassroomEnrollment.enrolled_at
+    ).outerjoin(
+        User, User.id == ClassroomEnrollment.user_id
+    ).outerjoin(
+        Classroom, Classroom.id == ClassroomEnrollment.classroom_id
+    ).where(ClassroomEnrollment.id > after_id).order_by(ClassroomEnrollment.id).limit(limit)
+
+
+def _enrollment_to_dict(row):
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "user_name": row.user_name or "Unknown",
+        "classroom_id": row.classroom_id,
+        "classroom_name": row.classroom_name or "Unknown",
+        "role": row.role,
+        "enrolled_at": _isoformat(row.enrolled_at)
+    }
+
+
+def _stream_ndjson(build_query, to_dict, after_id: int):
+    """Yield every row after after_id as NDJSON, walking the table in keyset batches
+    
+    Uses its own session because the request-scoped one is closed before the body is sent.
+    """
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(build_query(after_id, ADMIN_STREAM_BATCH)).all()
+            if not rows:
+                break
+            yield b"".join(dumps(to_dict(row)) + b"\n" for row in rows)
+            after_id = rows[-1].id
+    finally:
+        db.close()
+
+
+def _listing(db: Session, build_query, to_dict, after_id: int, limit: int, format: str):
+    """Serve one keyset page as JSON, or the whole listing streamed as NDJSON"""
+    if format == "ndjson":
+        return StreamingResponse(
+            _stream_ndjson(build_query, to_dict, after_id),
+            media_type="application/x-ndjson"
+        )
+    
+    rows = db.execute(build_query(after_id, limit)).all()
+    return FastJSONResponse({
+        "items": [to_dict(row) for row in rows],
+        "next_after_id": rows[-1].id if len(rows) == limit else None
+    })
+
+
+@router.get("/stats", response_class=FastJSONResponse)
 async def get_admin_stats(
     admin: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Get all system statistics - Admin only"""
-    
-    # Get all users
-    users = db.query(User).all()
-    users_data = [
-        {
-            "id": u.id,
-            "name": u.name,
-            "email": u.email,
-            "student_id": u.student_id,
-            "branch": u.branch,
-            "year_level": u.year_level,
-            "section": u.section,
-            "gpa": u.gpa,
-            "is_admin": u.is_admin,
-            "created_at": u.created_at.isoformat() if u.created_at else None
-        }
-        for u in users
-    ]
+    """Get system-wide counters - Admin only
     
-    # Get all classrooms
-    classrooms = db.query(Classroom).all()
-    classrooms_data = []
-    for c in classrooms:
-        student_count = db.query(ClassroomEnrollment).filter(
-            ClassroomEnrollment.classroom_id == c.id
-        ).count()
-        classrooms_data.append({
-            "id": c.id,
-            "name": c.name,
-            "code": c.code,
-            "branch": c.branch.value if c.branch else None,
-            "year_level": c.year_level.value if c.year_level else None,
-            "section": c.section,
-            "student_count": student_count,
-            "max_students": c.max_students
-        })
-    
-    # Get all enrollments
-    enrollments = db.query(ClassroomEnrollment).all()
-    enrollments_data = []
-    for e in enrollments:
-        user = db.query(User).filter(User.id == e.user_id).first()
-        classroom = db.query(Classroom).filter(Classroom.id == e.classroom_id).first()
-        enrollments_data.append({
-            "id": e.id,
-            "user_id": e.user_id,
-            "user_name": user.name if user else "Unknown",
-            "classroom_id": e.classroom_id,
-            "classroom_name": classroom.name if classroom else "Unknown",
-            "role": e.role,
-            "enrolled_at": e.enrolled_at.isoformat() if e.enrolled_at else None
-        })
+    Row-level data lives in the paginated /users, /classrooms and /enrollments listings.
+    """
+    total_users, total_admins = db.execute(
+        select(func.count(User.id), func.coalesce(func.sum(User.is_admin), 0))
+    ).one()
+    total_classrooms = db.execute(select(func.count(Classroom.id))).scalar()
+    enrollments_by_role = dict(db.execute(
+        select(ClassroomEnrollment.role, func.count(ClassroomEnrollment.id))
+        .group_by(ClassroomEnrollment.role)
+    ).all())
     
     return {
-        "total_users": len(users),
-        "total_classrooms": len(classrooms),
-        "total_enrollments": len(enrollments),
-        "users": users_data,
-        "classrooms": classrooms_data,
-        "enrollments": enrollments_data
+        "total_users": total_users,
+        "total_admins": total_admins,
+        "total_classrooms": total_classrooms,
+        "total_enrollments": sum(enrollments_by_role.values()),
+        "enrollments_by_role": enrollments_by_role
     }
 
 
+@router.get("/users")
+async def list_users(
+    after_id: int = 0,
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """List users ordered by id - Admin only (pass next_after_id to page, or format=ndjson to stream)"""
+    return _listing(db, _user_rows, _user_to_dict, after_id, limit, format)
+
+
+@router.get("/classrooms")
+async def list_classrooms(
+    after_id: int = 0,
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """List classrooms with student counts - Admin only"""
+    return _listing(db, _classroom_rows, _classroom_to_dict, after_id, limit, format)
+
+
+@router.get("/enrollments")
+async def list_enrollments(
+    after_id: int = 0,
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """List enrollments with user and classroom names - Admin only"""
+    return _listing(db, _enrollment_rows, _enrollment_to_dict, after_id, limit, format)
+
+
 @router.put("/user/{user_id}/update")
 async def admin_update_user(
     user_id: int,
@@ -107,3 +228,206 @@ async def admin_update_user(
     db.refresh(user)
     
     return {"message": f"User {user_id} updated successfully"}
+
+
+def _fetch_in(db: Session, columns, key_column, keys, for_update: bool = False):
+    """Run SELECT columns WHERE key_column IN keys, chunked to stay under SQLite's parameter limit
+    
+    With for_update the rows are locked, in key order so two callers can't deadlock.
+    """
+    keys = sorted(keys) if for_update else list(keys)
+    rows = []
+    for i in range(0, len(keys), IN_CLAUSE_CHUNK):
+        stmt = select(*columns).where(key_column.in_(keys[i:i + IN_CLAUSE_CHUNK]))
+        if for_update:
+            stmt = stmt.order_by(key_column).with_for_update()
+        rows.extend(db.execute(stmt).all())
+    return rows
+
+
+@router.post("/bulk", response_model=BulkAdminResponse)
+async def admin_bulk_update(
+    bulk_data: BulkAdminRequest,
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Apply many user patches and enrollment moves in one transaction - Admin only
+    
+    Every row is validated up front with a handful of set-based lookups; rows that fail
+    are reported and skipped, the rest are written as batched executemany statements.
+    With dry_run the report is produced but nothing is written.
+    """
+    results = []
+    patches = bulk_data.user_patches
+    moves = bulk_data.enrollment_moves
+    
+    user_ids = {p.user_id for p in patches} | {m.user_id for m in moves}
+    known_users = {row.id for row in _fetch_in(db, [User.id], User.id, user_ids)}
+    
+    # --- User patches ---
+    emails = {p.email for p in patches if p.email}
+    student_ids = {p.student_id for p in patches if p.student_id}
+    email_owner = {row.email: row.id for row in _fetch_in(db, [User.id, User.email], User.email, emails)}
+    student_id_owner = {
+        row.student_id: row.id
+        for row in _fetch_in(db, [User.id, User.student_id], User.student_id, student_ids)
+    }
+    
+    user_updates = []
+    for index, patch in enumerate(patches):
+        values = patch.model_dump(exclude_unset=True)
+        values.pop("user_id")
+        detail = None
+        if patch.user_id not in known_users:
+            detail = "User not found"
+        elif patch.null_fields():
+            detail = f"{', '.join(patch.null_fields())} can't be null"
+        elif email_owner.get(patch.email, patch.user_id) != patch.user_id:
+            detail = f"Email {patch.email} belongs to another user"
+        elif student_id_owner.get(patch.student_id, patch.user_id) != patch.user_id:
+            detail = f"Student ID {patch.student_id} belongs to another user"
+        
+        if detail:
+            results.append(BulkRowResult(kind="user_patch", index=index, user_id=patch.user_id, status="error", detail=detail))
+            continue
+        if not values:
+            results.append(BulkRowResult(kind="user_patch", index=index, user_id=patch.user_id, status="unchanged"))
+            continue
+        
+        # Claim the unique values so later rows in the same batch can't reuse them
+        if patch.email:
+            email_owner[patch.email] = patch.user_id
+        if patch.student_id:
+            student_id_owner[patch.student_id] = patch.user_id
+        user_updates.append({"id": patch.user_id, **values})
+        results.append(BulkRowResult(kind="user_patch", index=index, user_id=patch.user_id, status="ok"))
+    
+    # --- Enrollment moves ---
+    move_user_ids = {m.user_id for m in moves}
+    target_ids = {m.to_classroom_id for m in moves}
+    # Locked like in enroll_in_classroom, so concurrent enrollments can't take the seats counted here
+    capacity = {
+        row.id: row.max_students
+        for row in _fetch_in(
+            db, [Classroom.id, Classroom.max_students], Classroom.id, target_ids, for_update=not bulk_data.dry_run
+        )
+    }
+    seats_taken = dict(db.execute(
+        select(ClassroomEnrollment.classroom_id, func.count(ClassroomEnrollment.id))
+        .where(ClassroomEnrollment.classroom_id.in_(capacity), ClassroomEnrollment.role == "student")
+        .group_by(ClassroomEnrollment.classroom_id)
+    ).all())
+    
+    student_enrollment = {}  # user_id -> [enrollment_id or None, classroom_id]
+    other_classrooms = {}  # user_id -> classrooms they belong to in a non-student role
+    for row in _fetch_in(
+        db,
+        [ClassroomEnrollment.id, ClassroomEnrollment.user_id, ClassroomEnrollment.classroom_id, ClassroomEnrollment.role],
+        ClassroomEnrollment.user_id,
+        move_user_ids
+    ):
+        if row.role == "student":
+            student_enrollment[row.user_id] = [row.id, row.classroom_id]
+        else:
+            other_classrooms.setdefault(row.user_id, set()).add(row.classroom_id)
+    original_classroom = {user_id: state[1] for user_id, state in student_enrollment.items()}
+    
+    for index, move in enumerate(moves):
+        current = student_enrollment.get(move.user_id)
+        detail = None
+        if move.user_id not in known_users:
+            detail = "User not found"
+        elif move.to_classroom_id not in capacity:
+            detail = "Classroom not found"
+        elif move.to_classroom_id in other_classrooms.get(move.user_id, ()):
+            detail = "User already belongs to this classroom in a non-student role"
+        elif current and current[1] == move.to_classroom_id:
+            results.append(BulkRowResult(kind="enrollment_move", index=index, user_id=move.user_id, status="unchanged"))
+            continue
+        elif seats_taken.get(move.to_classroom_id, 0) >= capacity[move.to_classroom_id]:
+            detail = "Classroom is full"
+        
+        if detail:
+            results.append(BulkRowResult(kind="enrollment_move", index=index, user_id=move.user_id, status="error", detail=detail))
+            continue
+        
+        if current:
+            seats_taken[current[1]] = seats_taken.get(current[1], 1) - 1
+            current[1] = move.to_classroom_id
+        else:
+            student_enrollment[move.user_id] = [None, move.to_classroom_id]
+        seats_taken[move.to_classroom_id] = seats_taken.get(move.to_classroom_id, 0) + 1
+        results.append(BulkRowResult(kind="enrollment_move", index=index, user_id=move.user_id, status="ok"))
+    
+    # Only the final placement of each user is written, whatever path the batch took
+    enrollment_updates = [
+        {"id": enrollment_id, "classroom_id": classroom_id}
+        for user_id, (enrollment_id, classroom_id) in student_enrollment.items()
+        if enrollment_id is not None and original_classroom[user_id] != classroom_id
+    ]
+    enrollment_inserts = [
+        {"user_id": user_id, "classroom_id": classroom_id, "role": "student"}
+        for user_id, (enrollment_id, classroom_id) in student_enrollment.items()
+        if enrollment_id is None
+    ]
+    
+    if not bulk_data.dry_run:
+        try:
+            if user_updates:
+                db.execute(update(User), user_updates)
+            if enrollment_updates:
+                db.execute(update(ClassroomEnrollment), enrollment_updates)
+            if enrollment_inserts:
+                db.execute(insert(ClassroomEnrollment), enrollment_inserts)
+            for user_id, (enrollment_id, classroom_id) in student_enrollment.items():
+                original = original_classroom.get(user_id)
+                if original != classroom_id:
+                    if original is not None:
+                        leave_timeline(db.connection(), user_id, original)
+                    join_timeline(db.connection(), user_id, classroom_id)
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=f"Bulk update rolled back: {e.orig}")
+        user_directory.reload_users(
+            db, [patch["id"] for patch in user_updates] + list(student_enrollment)
+        )
+        moved = {
+            classroom_id
+            for user_id, (_, target) in student_enrollment.items()
+            if original_classroom.get(user_id) != target
+            for classroom_id in (target, original_classroom.get(user_id))
+        }
+        response_cache.invalidate(*(f"classroom:{classroom_id}" for classroom_id in moved if classroom_id is not None))
+    
+    applied = sum(1 for r in results if r.status == "ok")
+    return BulkAdminResponse(
+        dry_run=bulk_data.dry_run,
+        applied=applied,
+        failed=sum(1 for r in results if r.status == "error"),
+        results=results
+    )
+
+
+@router.get("/storage")
+async def get_storage_report(
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Content store usage and bytes saved by deduplication - Admin only"""
+    return storage.storage_report(db)
+
+
+@router.post("/storage/gc")
+async def run_storage_gc(
+    dry_run: bool = Query(False),
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Reconcile reference counts and remove unreferenced files - Admin only
+    
+    With dry_run nothing is changed and the response shows what would be removed.
+    """
+    result = storage.collect_garbage(db, dry_run=dry_run)
+    result["report"] = storage.storage_report(db)
+    return result
@@ -1,15 +1,19 @@
 """Announcements Router"""
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import or_, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
+from app.fast_json import FastJSONResponse, row_dicts
 from app.models.user import User
 from app.models.classroom import ClassroomEnrollment
 from app.models.chat import Announcement, AnnouncementRead
 from app.schemas.chat import AnnouncementCreate, AnnouncementResponse
 from app.routers.auth import get_current_user
+from app.routers.chat import manager
 
 router = APIRouter(prefix="/api/announcement", tags=["Announcements"])
 
@@ -43,7 +47,7 @@ async def create_announcement(
     db.commit()
     db.refresh(announcement)
     
-    return AnnouncementResponse(
+    response = AnnouncementResponse(
         id=announcement.id,
         classroom_id=announcement.classroom_id,
         user_id=announcement.user_id,
@@ -55,11 +59,71 @@ async def create_announcement(
         author_name=current_user.name,
         is_read=False
     )
+    await manager.publish(announcement.classroom_id, {
+        "type": "announcement",
+        "data": response.model_dump(mode="json")
+    })
+    
+    return response
+
+
+ANNOUNCEMENT_MAX_PAGE_SIZE = 100
+
+
+def _encode_cursor(row) -> str:
+    return f"{int(bool(row['is_pinned']))},{row['created_at'].isoformat()},{row['id']}"
+
+
+def _decode_cursor(cursor: str):
+    try:
+        pinned, created_at, announcement_id = cursor.split(",")
+        return bool(int(pinned)), datetime.fromisoformat(created_at), int(announcement_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _announcement_page(db: Session, current_user: User, scope, cursor: Optional[str], limit: int) -> FastJSONResponse:
+    """Fetch one page of announcements with author names and read status in a single query
+    
+    Ordered pinned-first then newest-first; the X-Next-Cursor header carries the
+    keyset position of the last row when more rows may follow. Rows go straight
+    into the JSON body without building AnnouncementResponse models.
+    """
+    query = db.query(
+        Announcement.id, Announcement.classroom_id, Announcement.user_id, Announcement.title,
+        Announcement.content, Announcement.priority, Announcement.is_pinned, Announcement.created_at,
+        User.name.label("author_name"),
+        AnnouncementRead.id.isnot(None).label("is_read")
+    ).outerjoin(
+        User, User.id == Announcement.user_id
+    ).outerjoin(
+        AnnouncementRead,
+        (AnnouncementRead.announcement_id == Announcement.id) & (AnnouncementRead.user_id == current_user.id)
+    ).filter(
+        scope,
+        or_(Announcement.expires_at == None, Announcement.expires_at > datetime.utcnow())
+    )
+    
+    if cursor:
+        query = query.filter(
+            tuple_(Announcement.is_pinned, Announcement.created_at, Announcement.id) < tuple_(*_decode_cursor(cursor))
+        )
+    
+    rows = row_dicts(query.order_by(
+        Announcement.is_pinned.desc(), Announcement.created_at.desc(), Announcement.id.desc()
+    ).limit(limit))
+    
+    response = FastJSONResponse(rows)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+    return response
 
 
 @router.get("/list/{classroom_id}", response_model=List[AnnouncementResponse])
 async def list_announcements(
     classroom_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=ANNOUNCEMENT_MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -72,66 +136,18 @@ async def list_announcements(
     if not enrollment:
         raise HTTPException(status_code=403, detail="Not enrolled in this classroom")
     
-    announcements = db.query(Announcement).filter(
-        Announcement.classroom_id == classroom_id
-    ).order_by(Announcement.is_pinned.desc(), Announcement.created_at.desc()).all()
-    
-    result = []
-    for a in announcements:
-        author = db.query(User).filter(User.id == a.user_id).first()
-        read_status = db.query(AnnouncementRead).filter(
-            AnnouncementRead.announcement_id == a.id,
-            AnnouncementRead.user_id == current_user.id
-        ).first()
-        
-        result.append(AnnouncementResponse(
-            id=a.id,
-            classroom_id=a.classroom_id,
-            user_id=a.user_id,
-            title=a.title,
-            content=a.content,
-            priority=a.priority,
-            is_pinned=a.is_pinned,
-            created_at=a.created_at,
-            author_name=author.name if author else None,
-            is_read=read_status is not None
-        ))
-    
-    return result
+    return _announcement_page(db, current_user, Announcement.classroom_id == classroom_id, cursor, limit)
 
 
 @router.get("/global", response_model=List[AnnouncementResponse])
 async def list_global_announcements(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=ANNOUNCEMENT_MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """List institution-wide announcements"""
-    announcements = db.query(Announcement).filter(
-        Announcement.classroom_id == None
-    ).order_by(Announcement.is_pinned.desc(), Announcement.created_at.desc()).limit(20).all()
-    
-    result = []
-    for a in announcements:
-        author = db.query(User).filter(User.id == a.user_id).first()
-        read_status = db.query(AnnouncementRead).filter(
-            AnnouncementRead.announcement_id == a.id,
-            AnnouncementRead.user_id == current_user.id
-        ).first()
-        
-        result.append(AnnouncementResponse(
-            id=a.id,
-            classroom_id=a.classroom_id,
-            user_id=a.user_id,
-            title=a.title,
-            content=a.content,
-            priority=a.priority,
-            is_pinned=a.is_pinned,
-            created_at=a.created_at,
-            author_name=author.name if author else None,
-            is_read=read_status is not None
-        ))
-    
-    return result
+    return _announcement_page(db, current_user, Announcement.classroom_id == None, cursor, limit)
 
 
 @router.put("/{announcement_id}/read")
@@ -157,6 +173,10 @@ async def mark_as_read(
             user_id=current_user.id
         )
         db.add(read_record)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Marked read concurrently from another tab
+            db.rollback()
     
     return {"message": "Marked as read"}
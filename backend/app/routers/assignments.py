@@ -1,22 +1,66 @@
 """Assignments Router"""
+import csv
+import io
+import time
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from pydantic import ValidationError
+from sqlalchemy import and_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Tuple
 
+from app import assignment_stats, storage
 from app.database import get_db
+from app.submission_queue import submission_queue
 from app.models.user import User
 from app.models.classroom import ClassroomEnrollment
 from app.models.course import Course
-from app.models.assignment import Assignment, Submission
+from app.models.assignment import Assignment, Submission, AssignmentStats
 from app.schemas.assignment import (
-    AssignmentCreate, AssignmentResponse,
-    SubmissionCreate, SubmissionResponse, GradeSubmission
+    AssignmentCreate, AssignmentResponse, AssignmentStatsResponse, GradeBin,
+    SubmissionCreate, SubmissionResponse, SubmissionReceipt, GradeSubmission,
+    BulkGradeEntry, BulkGradeRequest, BulkGradeResponse, BulkGradeRowResult
 )
 from app.routers.auth import get_current_user
+from app.routers.uploads import resolve_upload
 
 router = APIRouter(prefix="/api/classroom", tags=["Assignments"])
 
+MAX_LATE_PENALTY = 50  # percent
+MAX_GRADE_CSV_SIZE = 5 * 1024 * 1024
+DEADLINE_CACHE_TTL = 30  # seconds
+
+# assignment_id -> (due_date, allow_late, fetched_at); spares queued submits a DB read
+_deadline_cache = {}
+
+
+def late_penalty_percent(assignment: Assignment, submission_time: datetime, is_late: bool) -> float:
+    """Percent taken off a late submission: late_penalty per started day, capped at 50"""
+    if not is_late or not assignment.late_penalty or assignment.late_penalty <= 0:
+        return 0.0
+    days_late = (submission_time - assignment.due_date).days + 1
+    return min(days_late * assignment.late_penalty, MAX_LATE_PENALTY)
+
+
+def _instructor_assignment(db: Session, assignment_id: int, current_user: User, action: str) -> Assignment:
+    """Load an assignment and check the caller teaches its classroom, in one query"""
+    row = db.query(Assignment, ClassroomEnrollment.id).join(
+        Course, Course.id == Assignment.course_id
+    ).outerjoin(
+        ClassroomEnrollment,
+        and_(
+            ClassroomEnrollment.classroom_id == Course.classroom_id,
+            ClassroomEnrollment.user_id == current_user.id,
+            ClassroomEnrollment.role == "instructor"
+        )
+    ).filter(Assignment.id == assignment_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    if row[1] is None:
+        raise HTTPException(status_code=403, detail=f"Only instructors can {action}")
+    return row[0]
+
 
 @router.post("/{classroom_id}/course/{course_id}/assignment/create", response_model=AssignmentResponse)
 async def create_assignment(
@@ -54,6 +98,8 @@ async def create_assignment(
         created_by=current_user.id
     )
     db.add(assignment)
+    db.flush()
+    db.add(AssignmentStats(assignment_id=assignment.id))
     db.commit()
     db.refresh(assignment)
     
@@ -77,9 +123,7 @@ async def get_assignment(assignment_id: int, db: Session = Depends(get_db)):
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
-    submission_count = db.query(Submission).filter(
-        Submission.assignment_id == assignment_id
-    ).count()
+    submission_count = assignment_stats.get_stats(db, assignment_id).submission_count
     
     return AssignmentResponse(
         id=assignment.id,
@@ -94,6 +138,72 @@ async def get_assignment(assignment_id: int, db: Session = Depends(get_db)):
     )
 
 
+@router.get("/assignment/{assignment_id}/stats", response_model=AssignmentStatsResponse)
+async def get_assignment_stats(
+    assignment_id: int,
+    bins: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Submission and grade analytics for an assignment (instructor only)
+    
+    Served from the materialized stats row and histogram; bins sets how many equal
+    ranges of percent-of-points the histogram is grouped into.
+    """
+    assignment = _instructor_assignment(db, assignment_id, current_user, "view assignment statistics")
+    stats = assignment_stats.get_stats(db, assignment_id)
+    percents = assignment_stats.grade_histogram(db, assignment_id)
+    
+    histogram = [
+        GradeBin(low=round(i * 100 / bins, 2), high=round((i + 1) * 100 / bins, 2), count=0)
+        for i in range(bins)
+    ]
+    for percent, count in enumerate(percents):
+        histogram[min(percent * bins // 100, bins - 1)].count += count
+    
+    median = None
+    if stats.graded_count:
+        seen = 0
+        for percent, count in enumerate(percents):
+            seen += count
+            if seen * 2 >= stats.graded_count:
+                median = round(min(percent + 0.5, 100) * assignment.points / 100, 2)
+                break
+    
+    return AssignmentStatsResponse(
+        assignment_id=assignment_id,
+        points=assignment.points,
+        submission_count=stats.submission_count,
+        late_count=stats.late_count,
+        graded_count=stats.graded_count,
+        mean=round(stats.grade_sum / stats.graded_count, 2) if stats.graded_count else None,
+        median=median,
+        histogram=histogram
+    )
+
+
+def _replace_submission(
+    db: Session, assignment: Assignment, existing: Submission, submission_data: SubmissionCreate, file_path
+) -> Submission:
+    existing.text_content = submission_data.text_content
+    existing.url = submission_data.url
+    storage.move_reference(db, existing.file_path, file_path)
+    was_late = existing.is_late
+    existing.file_path = file_path
+    existing.submission_time = datetime.utcnow()
+    existing.is_late = datetime.utcnow() > assignment.due_date
+    assignment_stats.record_submissions(db, assignment.id, late_delta=int(existing.is_late) - int(bool(was_late)))
+    db.commit()
+    db.refresh(existing)
+    return existing
+
+
+def _is_duplicate_submission(error: IntegrityError) -> bool:
+    """Whether error is uq_submission_assignment_user (SQLite names the columns instead)"""
+    message = str(error.orig)
+    return "uq_submission_assignment_user" in message or "submissions.assignment_id, submissions.user_id" in message
+
+
 @router.post("/submission/{assignment_id}/submit", response_model=SubmissionResponse)
 async def submit_assignment(
     assignment_id: int,
@@ -106,20 +216,17 @@ async def submit_assignment(
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
+    file_path = None
+    if submission_data.upload_id:
+        file_path = resolve_upload(db, submission_data.upload_id, current_user).file_path
+    
     # Check for existing submission
     existing = db.query(Submission).filter(
         Submission.assignment_id == assignment_id,
         Submission.user_id == current_user.id
     ).first()
     if existing:
-        # Update existing submission
-        existing.text_content = submission_data.text_content
-        existing.url = submission_data.url
-        existing.submission_time = datetime.utcnow()
-        existing.is_late = datetime.utcnow() > assignment.due_date
-        db.commit()
-        db.refresh(existing)
-        return existing
+        return _replace_submission(db, assignment, existing, submission_data, file_path)
     
     # Create new submission
     is_late = datetime.utcnow() > assignment.due_date
@@ -131,15 +238,80 @@ async def submit_assignment(
         user_id=current_user.id,
         text_content=submission_data.text_content,
         url=submission_data.url,
+        file_path=file_path,
         is_late=is_late
     )
+    storage.move_reference(db, None, file_path)
     db.add(submission)
+    try:
+        db.flush()
+    except IntegrityError as e:
+        db.rollback()
+        if not _is_duplicate_submission(e):
+            raise
+        # A concurrent request (or the submission queue) stored one first; replace it instead
+        existing = db.query(Submission).filter(
+            Submission.assignment_id == assignment_id,
+            Submission.user_id == current_user.id
+        ).first()
+        if not existing:
+            raise HTTPException(status_code=409, detail="Submission changed concurrently, please try again")
+        return _replace_submission(db, assignment, existing, submission_data, file_path)
+    assignment_stats.record_submissions(db, assignment_id, added=1, late_delta=int(is_late))
     db.commit()
     db.refresh(submission)
     
     return submission
 
 
+def _assignment_deadline(db: Session, assignment_id: int):
+    cached = _deadline_cache.get(assignment_id)
+    if cached and time.monotonic() - cached[2] < DEADLINE_CACHE_TTL:
+        return cached[0], cached[1]
+    
+    row = db.query(Assignment.due_date, Assignment.allow_late).filter(Assignment.id == assignment_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    _deadline_cache[assignment_id] = (row.due_date, row.allow_late, time.monotonic())
+    return row.due_date, row.allow_late
+
+
+@router.post("/submission/{assignment_id}/queue", response_model=SubmissionReceipt, status_code=202)
+async def queue_submission(
+    assignment_id: int,
+    submission_data: SubmissionCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Submit an assignment through the ingestion queue
+    
+    For deadline rushes: the submission is timestamped on receipt, journaled to disk
+    and acknowledged without a database write. A background writer stores queued
+    submissions in batches within SUBMISSION_QUEUE_FLUSH_INTERVAL seconds; is_late
+    is judged by the receipt time. Late submissions are refused here when the
+    assignment doesn't allow them, resubmissions included.
+    """
+    received_at = datetime.utcnow()
+    due_date, allow_late = _assignment_deadline(db, assignment_id)
+    is_late = received_at > due_date
+    if is_late and not allow_late:
+        raise HTTPException(status_code=400, detail="Late submissions not allowed")
+    
+    file_path = None
+    if submission_data.upload_id:
+        file_path = resolve_upload(db, submission_data.upload_id, current_user).file_path
+    
+    ticket = submission_queue.enqueue(
+        assignment_id,
+        current_user.id,
+        received_at,
+        text_content=submission_data.text_content,
+        url=submission_data.url,
+        file_path=file_path
+    )
+    return SubmissionReceipt(ticket=ticket, assignment_id=assignment_id, received_at=received_at, is_late=is_late)
+
+
 @router.get("/submission/{assignment_id}/my", response_model=SubmissionResponse)
 async def get_my_submission(
     assignment_id: int,
@@ -163,19 +335,7 @@ async def list_assignment_submissions(
     db: Session = Depends(get_db)
 ):
     """List all submissions for an assignment (instructor only)"""
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
-    if not assignment:
-        raise HTTPException(status_code=404, detail="Assignment not found")
-    
-    # Get course and verify instructor role
-    course = db.query(Course).filter(Course.id == assignment.course_id).first()
-    enrollment = db.query(ClassroomEnrollment).filter(
-        ClassroomEnrollment.classroom_id == course.classroom_id,
-        ClassroomEnrollment.user_id == current_user.id,
-        ClassroomEnrollment.role == "instructor"
-    ).first()
-    if not enrollment:
-        raise HTTPException(status_code=403, detail="Only instructors can view all submissions")
+    _instructor_assignment(db, assignment_id, current_user, "view all submissions")
     
     submissions = db.query(Submission).filter(
         Submission.assignment_id == assignment_id
@@ -195,30 +355,164 @@ async def grade_submission(
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
     
-    # Verify instructor role
-    assignment = db.query(Assignment).filter(Assignment.id == submission.assignment_id).first()
-    course = db.query(Course).filter(Course.id == assignment.course_id).first()
-    enrollment = db.query(ClassroomEnrollment).filter(
-        ClassroomEnrollment.classroom_id == course.classroom_id,
-        ClassroomEnrollment.user_id == current_user.id,
-        ClassroomEnrollment.role == "instructor"
-    ).first()
-    if not enrollment:
-        raise HTTPException(status_code=403, detail="Only instructors can grade submissions")
+    assignment = _instructor_assignment(db, submission.assignment_id, current_user, "grade submissions")
     
     # Apply late penalty if applicable
-    grade = grade_data.grade
-    if submission.is_late and assignment.late_penalty > 0:
-        # Calculate days late
-        days_late = (submission.submission_time - assignment.due_date).days + 1
-        penalty = min(days_late * assignment.late_penalty, 50)  # Max 50% penalty
-        grade = grade * (1 - penalty / 100)
+    penalty = late_penalty_percent(assignment, submission.submission_time, submission.is_late)
+    grade = grade_data.grade * (1 - penalty / 100)
     
+    previous_grade = submission.grade
     submission.grade = grade
     submission.feedback = grade_data.feedback
     submission.graded_by = current_user.id
     submission.graded_at = datetime.utcnow()
+    db.flush()
+    assignment_stats.record_grades(db, assignment.id, assignment.points, [(previous_grade, grade)])
     db.commit()
     db.refresh(submission)
     
     return submission
+
+
+def _apply_grades(
+    db: Session,
+    assignment: Assignment,
+    entries: List[Tuple[int, BulkGradeEntry]],
+    results: List[BulkGradeRowResult],
+    current_user: User,
+    dry_run: bool
+) -> BulkGradeResponse:
+    """Resolve, penalize and write a batch of grades for one assignment
+    
+    The assignment's submissions are read once with their owner's identifiers, the
+    late penalty is worked out per row in the same pass, and every valid grade is
+    written with a single executemany UPDATE in one transaction. results may already
+    hold rows that failed to parse.
+    """
+    by_id, by_student_id, by_email = {}, {}, {}
+    for row in db.query(
+        Submission.id, Submission.submission_time, Submission.is_late, Submission.grade, User.student_id, User.email
+    ).join(User, User.id == Submission.user_id).filter(Submission.assignment_id == assignment.id):
+        by_id[row.id] = row
+        if row.student_id:
+            by_student_id[row.student_id] = row
+        by_email[row.email.lower()] = row
+    
+    now = datetime.utcnow()
+    updates = []
+    changes = []
+    graded = set()
+    for index, entry in entries:
+        if entry.submission_id is not None:
+            submission = by_id.get(entry.submission_id)
+        elif entry.student_id:
+            submission = by_student_id.get(entry.student_id)
+        elif entry.email:
+            submission = by_email.get(entry.email.lower())
+        else:
+            results.append(BulkGradeRowResult(index=index, status="error", detail="Row needs submission_id, student_id or email"))
+            continue
+        
+        if not submission:
+            results.append(BulkGradeRowResult(
+                index=index, submission_id=entry.submission_id, status="error",
+                detail="No submission for this assignment"
+            ))
+            continue
+        if submission.id in graded:
+            results.append(BulkGradeRowResult(
+                index=index, submission_id=submission.id, status="error",
+                detail="Submission appears more than once in this batch"
+            ))
+            continue
+        graded.add(submission.id)
+        
+        penalty = late_penalty_percent(assignment, submission.submission_time, submission.is_late)
+        grade = entry.grade * (1 - penalty / 100)
+        updates.append({
+            "id": submission.id,
+            "grade": grade,
+            "feedback": entry.feedback,
+            "graded_by": current_user.id,
+            "graded_at": now
+        })
+        changes.append((submission.grade, grade))
+        results.append(BulkGradeRowResult(index=index, submission_id=submission.id, status="ok", grade=grade, penalty=penalty))
+    
+    if updates and not dry_run:
+        db.execute(update(Submission), updates)
+        assignment_stats.record_grades(db, assignment.id, assignment.points, changes)
+        db.commit()
+    
+    results.sort(key=lambda r: r.index)
+    return BulkGradeResponse(
+        dry_run=dry_run,
+        applied=len(updates),
+        failed=len(results) - len(updates),
+        results=results
+    )
+
+
+@router.put("/assignment/{assignment_id}/grades", response_model=BulkGradeResponse)
+async def bulk_grade_submissions(
+    assignment_id: int,
+    grade_data: BulkGradeRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Grade many submissions of one assignment at once
+    
+    Rows that can't be matched are reported and skipped; the rest are written
+    together. With dry_run the report (including late penalties) is returned but
+    nothing is saved.
+    """
+    assignment = _instructor_assignment(db, assignment_id, current_user, "grade submissions")
+    return _apply_grades(db, assignment, list(enumerate(grade_data.grades)), [], current_user, grade_data.dry_run)
+
+
+@router.post("/assignment/{assignment_id}/grades/import", response_model=BulkGradeResponse)
+async def import_grades_csv(
+    assignment_id: int,
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Grade submissions from a CSV file
+    
+    The header row needs a grade column and one of submission_id, student_id or
+    email; feedback is optional. Row indexes in the response count data rows from 0.
+    """
+    assignment = _instructor_assignment(db, assignment_id, current_user, "grade submissions")
+    
+    content = await file.read(MAX_GRADE_CSV_SIZE + 1)
+    if len(content) > MAX_GRADE_CSV_SIZE:
+        raise HTTPException(status_code=413, detail="CSV file too large")
+    try:
+        reader = csv.DictReader(io.StringIO(content.decode("utf-8-sig")))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded")
+    
+    fields = {name.strip().lower() for name in reader.fieldnames or []}
+    if "grade" not in fields or not fields & {"submission_id", "student_id", "email"}:
+        raise HTTPException(
+            status_code=400,
+            detail="CSV needs a grade column and a submission_id, student_id or email column"
+        )
+    
+    entries, results = [], []
+    for index, raw in enumerate(reader):
+        row = {
+            key.strip().lower(): value.strip()
+            for key, value in raw.items() if key and value and value.strip()
+        }
+        try:
+            entries.append((index, BulkGradeEntry(**row)))
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            results.append(BulkGradeRowResult(index=index, status="error", detail=f"{field}: {error['msg']}"))
+    if len(entries) + len(results) > 10000:
+        raise HTTPException(status_code=400, detail="CSV has more than 10000 rows")
+    
+    return _apply_grades(db, assignment, entries, results, current_user, dry_run)
@@ -0,0 +1,86 @@
+"""Calendar Feed Router"""
+import secrets
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from app import calendar_feed
+from app.database import get_db
+from app.models.user import User
+from app.schemas.event import CalendarFeedResponse
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/api/calendar", tags=["Calendar"])
+
+FEED_CACHE_CONTROL = "private, max-age=300"
+
+
+def _feed_url(request: Request, user: User) -> CalendarFeedResponse:
+    return CalendarFeedResponse(url=str(request.url_for("get_calendar_feed", token=user.calendar_token)))
+
+
+def _not_modified(request: Request, feed: calendar_feed.Feed) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is sent
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or feed.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return feed.last_modified <= since
+    return False
+
+
+@router.get("/feed", response_model=CalendarFeedResponse)
+async def get_feed_url(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """The current user's calendar subscription URL, created on first use"""
+    if not current_user.calendar_token:
+        current_user.calendar_token = secrets.token_urlsafe(32)
+        db.commit()
+    return _feed_url(request, current_user)
+
+
+@router.post("/feed/reset", response_model=CalendarFeedResponse)
+async def reset_feed_url(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Replace the subscription URL, so the old one stops working"""
+    current_user.calendar_token = secrets.token_urlsafe(32)
+    db.commit()
+    return _feed_url(request, current_user)
+
+
+@router.get("/feed/{token}.ics", name="get_calendar_feed")
+async def get_calendar_feed(token: str, request: Request, db: Session = Depends(get_db)):
+    """iCalendar feed for calendar apps; the token in the URL is the only credential"""
+    user_id = db.query(User.id).filter(User.calendar_token == token).scalar()
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="Calendar feed not found")
+    
+    feed = calendar_feed.get_feed(db, user_id)
+    headers = {
+        "ETag": feed.etag,
+        "Last-Modified": format_datetime(feed.last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": FEED_CACHE_CONTROL
+    }
+    if _not_modified(request, feed):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        calendar_feed.render(db, feed.versions),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers
+    )
@@ -1,22 +1,29 @@
 """Chat Router with WebSocket Support"""
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Set, Optional
+import asyncio
 import json
 
+from app.config import get_settings
 from app.database import get_db, SessionLocal
+from app.fast_json import FastJSONResponse, row_dicts
 from app.models.user import User
+from app.models.classroom import ClassroomEnrollment
 from app.models.chat import ChatMessage
 from app.schemas.chat import MessageCreate, MessageResponse, ConversationResponse
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/api/messages", tags=["Chat"])
+settings = get_settings()
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        # Per-classroom push channels: classroom_id -> subscribed sockets
+        self.classroom_channels: Dict[int, Set[WebSocket]] = {}
     
     async def connect(self, websocket: WebSocket, user_id: int):
         await websocket.accept()
@@ -33,6 +40,46 @@ class ConnectionManager:
     async def broadcast(self, message: dict):
         for connection in self.active_connections.values():
             await connection.send_json(message)
+    
+    def subscribe(self, websocket: WebSocket, classroom_id: int):
+        self.classroom_channels.setdefault(classroom_id, set()).add(websocket)
+    
+    def unsubscribe(self, websocket: WebSocket, classroom_id: int):
+        channel = self.classroom_channels.get(classroom_id)
+        if channel is not None:
+            channel.discard(websocket)
+            if not channel:
+                del self.classroom_channels[classroom_id]
+    
+    async def publish(self, classroom_id: Optional[int], message: dict):
+        """Push an event to a classroom channel; classroom_id None reaches every subscriber
+        
+        The payload is serialized once and sent to all sockets concurrently, each at
+        most once however many of the channels it is subscribed to. A send that
+        takes longer than PUSH_SEND_TIMEOUT is abandoned, so a client stuck on
+        backpressure can't hold up the request that published; sockets that fail
+        or time out are dropped from every channel.
+        """
+        targets: Dict[WebSocket, List[int]] = {}  # socket -> channels it was reached through
+        if classroom_id is None:
+            for cid, channel in self.classroom_channels.items():
+                for ws in channel:
+                    targets.setdefault(ws, []).append(cid)
+        else:
+            for ws in self.classroom_channels.get(classroom_id, ()):
+                targets[ws] = [classroom_id]
+        if not targets:
+            return
+        
+        payload = json.dumps(message, default=str)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(ws.send_text(payload), settings.PUSH_SEND_TIMEOUT) for ws in targets),
+            return_exceptions=True
+        )
+        for ws, result in zip(list(targets), results):
+            if isinstance(result, Exception):
+                for cid in list(self.classroom_channels):
+                    self.unsubscribe(ws, cid)
 
 
 manager = ConnectionManager()
@@ -149,36 +196,33 @@ async def get_conversation(
     if current_user.id not in [user1_id, user2_id]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    from sqlalchemy import or_
+    from sqlalchemy import or_, update
     
-    messages = db.query(ChatMessage).filter(
+    other_id = user2_id if current_user.id == user1_id else user1_id
+    # Mark messages as read
+    db.execute(
+        update(ChatMessage).where(
+            ChatMessage.from_user_id == other_id,
+            ChatMessage.to_user_id == current_user.id,
+            ChatMessage.is_read == False
+        ).values(is_read=True, read_at=datetime.utcnow())
+    )
+    db.commit()
+    
+    # Trusted columns straight into JSON, with sender names from the same query
+    rows = db.query(
+        ChatMessage.id, ChatMessage.from_user_id, ChatMessage.to_user_id, ChatMessage.message,
+        ChatMessage.message_type, ChatMessage.is_read, ChatMessage.created_at,
+        User.name.label("sender_name")
+    ).outerjoin(
+        User, User.id == ChatMessage.from_user_id
+    ).filter(
         or_(
             (ChatMessage.from_user_id == user1_id) & (ChatMessage.to_user_id == user2_id),
             (ChatMessage.from_user_id == user2_id) & (ChatMessage.to_user_id == user1_id)
         )
     ).order_by(ChatMessage.created_at).all()
-    
-    # Mark messages as read
-    for msg in messages:
-        if msg.to_user_id == current_user.id and not msg.is_read:
-            msg.is_read = True
-            msg.read_at = datetime.utcnow()
-    db.commit()
-    
-    result = []
-    for msg in messages:
-        sender = db.query(User).filter(User.id == msg.from_user_id).first()
-        result.append(MessageResponse(
-            id=msg.id,
-            from_user_id=msg.from_user_id,
-            to_user_id=msg.to_user_id,
-            message=msg.message,
-            message_type=msg.message_type,
-            is_read=msg.is_read,
-            created_at=msg.created_at,
-            sender_name=sender.name if sender else None
-        ))
-    return result
+    return FastJSONResponse(row_dicts(rows))
 
 
 @router.websocket("/ws/chat/{from_id}/{to_id}")
@@ -220,3 +264,39 @@ async def websocket_chat(websocket: WebSocket, from_id: int, to_id: int):
                 db.close()
     except WebSocketDisconnect:
         manager.disconnect(from_id)
+
+
+@router.websocket("/ws/classroom/{classroom_id}")
+async def websocket_classroom(websocket: WebSocket, classroom_id: int, token: str):
+    """WebSocket push channel for a classroom's announcements and course updates
+    
+    Browsers can't set headers on WebSockets, so the bearer token comes as ?token=.
+    """
+    db = SessionLocal()
+    try:
+        try:
+            user = await get_current_user(token=token, db=db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        
+        enrollment = db.query(ClassroomEnrollment.id).filter(
+            ClassroomEnrollment.classroom_id == classroom_id,
+            ClassroomEnrollment.user_id == user.id
+        ).first()
+        if not enrollment:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+    finally:
+        db.close()
+    
+    await websocket.accept()
+    manager.subscribe(websocket, classroom_id)
+    try:
+        # Clients only listen; reading keeps the socket alive and notices disconnects
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.unsubscribe(websocket, classroom_id)
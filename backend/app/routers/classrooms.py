@@ -1,11 +1,17 @@
 """Classroom Router"""
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, insert, func, literal
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.database import get_db
 from app.models.user import User
 from app.models.classroom import Classroom, ClassroomEnrollment, StudyGroup, StudyGroupMember
+from app.models.activity import join_timeline
+from app.user_directory import user_directory
+from app.response_cache import cached, response_cache
 from app.schemas.classroom import (
     ClassroomCreate, ClassroomResponse, ClassroomHub,
     EnrollmentCreate, EnrollmentResponse,
@@ -69,6 +75,7 @@ async def create_classroom(
 
 
 @router.get("/{classroom_id}", response_model=ClassroomResponse)
+@cached("classroom:{classroom_id}")
 async def get_classroom(classroom_id: int, db: Session = Depends(get_db)):
     """Get classroom by ID"""
     classroom = db.query(Classroom).filter(Classroom.id == classroom_id).first()
@@ -187,12 +194,12 @@ async def list_classrooms_by_branch(
         query = query.filter(Classroom.year_level == current_user.year_level)
     elif year_level: # Fallback if user hasn't set it (should prompt them)
         query = query.filter(Classroom.year_level == year_level)
-        
+    
     if current_user.branch:
         query = query.filter(Classroom.branch == current_user.branch)
     elif branch:
         query = query.filter(Classroom.branch == branch)
-        
+    
     if current_user.section:
         query = query.filter(Classroom.section == current_user.section)
     
@@ -225,43 +232,68 @@ async def enroll_in_classroom(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Enroll current user in a classroom"""
-    classroom = db.query(Classroom).filter(Classroom.id == classroom_id).first()
-    if not classroom:
-        raise HTTPException(status_code=404, detail="Classroom not found")
+    """Enroll current user in a classroom
     
-    # Check if already enrolled
-    # Check if already enrolled in ANY classroom (Role=student)
-    # Allows instructors to be in multiple? Maybe just students restricted?
-    # User said: "allow him to see only that year classroom and let him pick his classroom once picked cannot be changed"
+    Students pick their classroom once; it cannot be changed without admin permission.
+    The seat check and the insert are a single conditional INSERT ... SELECT, run
+    with the classroom row locked FOR UPDATE: on PostgreSQL at READ COMMITTED the
+    statement alone would let concurrent registrations all see the old count, and
+    the lock makes them take their turn. (SQLite has no row locks and needs none,
+    as it runs one writer at a time.) The unique indexes on classroom_enrollments
+    reject double enrollments atomically.
+    """
+    seats_taken = select(func.count(ClassroomEnrollment.id)).where(
+        ClassroomEnrollment.classroom_id == classroom_id,
+        ClassroomEnrollment.role == "student"
+    ).scalar_subquery()
     
-    # Check if user is enrolled in ANY classroom
-    existing_any = db.query(ClassroomEnrollment).filter(
-        ClassroomEnrollment.user_id == current_user.id
-    ).first()
+    stmt = insert(ClassroomEnrollment).from_select(
+        ["classroom_id", "user_id", "role", "enrolled_at"],
+        select(
+            Classroom.id,
+            literal(current_user.id),
+            literal("student"),
+            literal(datetime.utcnow())
+        ).where(
+            Classroom.id == classroom_id,
+            seats_taken < Classroom.max_students
+        )
+    )
     
-    if existing_any:
-        if existing_any.classroom_id == classroom_id:
-             raise HTTPException(status_code=400, detail="Already enrolled in this classroom")
-        else:
-             raise HTTPException(status_code=400, detail="You are already enrolled in a classroom. Cannot change without admin permission.")
+    try:
+        db.execute(select(Classroom.id).where(Classroom.id == classroom_id).with_for_update())
+        inserted = db.execute(stmt).rowcount
+        if inserted:
+            join_timeline(db.connection(), current_user.id, classroom_id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        inserted = 0
     
-    # Check capacity
-    current_count = db.query(ClassroomEnrollment).filter(
-        ClassroomEnrollment.classroom_id == classroom_id
-    ).count()
-    if current_count >= classroom.max_students:
-        raise HTTPException(status_code=400, detail="Classroom is full")
+    if inserted:
+        user_directory.reload_users(db, [current_user.id])
+        response_cache.invalidate(f"classroom:{classroom_id}")
     
-    enrollment = ClassroomEnrollment(
-        classroom_id=classroom_id,
-        user_id=current_user.id,
-        role="student"
-    )
-    db.add(enrollment)
-    db.commit()
-    db.refresh(enrollment)
+    if not inserted:
+        # Slow path only: work out which rule rejected the enrollment
+        existing = db.query(ClassroomEnrollment).filter(
+            ClassroomEnrollment.user_id == current_user.id
+        ).order_by(ClassroomEnrollment.classroom_id != classroom_id).first()
+        if existing:
+            if existing.classroom_id == classroom_id:
+                raise HTTPException(status_code=400, detail="Already enrolled in this classroom")
+            if existing.role == "student":
+                raise HTTPException(status_code=400, detail="You are already enrolled in a classroom. Cannot change without admin permission.")
+        
+        classroom_exists = db.query(Classroom.id).filter(Classroom.id == classroom_id).first()
+        if not classroom_exists:
+            raise HTTPException(status_code=404, detail="Classroom not found")
+        raise HTTPException(status_code=400, detail="Classroom is full")
     
+    enrollment = db.query(ClassroomEnrollment).filter(
+        ClassroomEnrollment.classroom_id == classroom_id,
+        ClassroomEnrollment.user_id == current_user.id
+    ).first()
     return enrollment
 
 
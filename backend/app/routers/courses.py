@@ -1,8 +1,15 @@
 """Courses Router"""
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import mimetypes
+import os
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from typing import List
 
+from app import storage
+from app.counters import counters
+from app.response_cache import cached
+from app.config import get_settings
 from app.database import get_db
 from app.models.user import User
 from app.models.classroom import Classroom, ClassroomEnrollment
@@ -13,8 +20,14 @@ from app.schemas.classroom import (
     CourseUpdateCreate, CourseUpdateResponse
 )
 from app.routers.auth import get_current_user
+from app.routers.chat import manager
+from app.routers.uploads import resolve_upload
 
 router = APIRouter(prefix="/api/classroom", tags=["Courses"])
+settings = get_settings()
+
+# Large reads mean fewer thread hops per file when the server can't sendfile
+MATERIAL_READ_CHUNK = 1024 * 1024
 
 
 @router.post("/{classroom_id}/course/create", response_model=CourseResponse)
@@ -68,6 +81,7 @@ async def get_my_courses(
 
 
 @router.get("/{classroom_id}/courses", response_model=List[CourseResponse])
+@cached("classroom:{classroom_id}")
 async def list_classroom_courses(
     classroom_id: int,
     db: Session = Depends(get_db)
@@ -78,6 +92,7 @@ async def list_classroom_courses(
 
 
 @router.get("/course/{course_id}", response_model=CourseDetail)
+@cached("course:{course_id}")
 async def get_course_detail(
     course_id: int,
     current_user: User = Depends(get_current_user),
@@ -185,7 +200,12 @@ async def post_course_update(
     
     # Add author name for response
     update.author_name = current_user.name
-    return update
+    response = CourseUpdateResponse.model_validate(update)
+    await manager.publish(course.classroom_id, {
+        "type": "course_update",
+        "data": response.model_dump(mode="json")
+    })
+    return response
 
 
 @router.post("/{classroom_id}/course/{course_id}/material/add", response_model=MaterialResponse)
@@ -213,14 +233,23 @@ async def add_course_material(
     if not enrollment:
         raise HTTPException(status_code=403, detail="Only instructors can add materials")
     
+    upload = None
+    if material_data.upload_id:
+        upload = resolve_upload(db, material_data.upload_id, current_user)
+    file_path = upload.file_path if upload else None
+    
     material = CourseMaterial(
         course_id=course_id,
         title=material_data.title,
         type=material_data.type,
         url=material_data.url,
+        file_path=file_path,
+        file_name=upload.filename if upload else None,
+        content_type=upload.content_type if upload else None,
         description=material_data.description,
         uploaded_by=current_user.id
     )
+    storage.move_reference(db, None, file_path)
     db.add(material)
     db.commit()
     db.refresh(material)
@@ -229,6 +258,7 @@ async def add_course_material(
 
 
 @router.get("/course/{course_id}/materials", response_model=List[MaterialResponse])
+@cached("course:{course_id}")
 async def get_course_materials(course_id: int, db: Session = Depends(get_db)):
     """Get all materials for a course"""
     materials = db.query(CourseMaterial).filter(
@@ -239,12 +269,77 @@ async def get_course_materials(course_id: int, db: Session = Depends(get_db)):
 
 @router.post("/material/{material_id}/download")
 async def track_material_download(material_id: int, db: Session = Depends(get_db)):
-    """Increment download count for a material"""
-    material = db.query(CourseMaterial).filter(CourseMaterial.id == material_id).first()
+    """Increment download count for a material
+    
+    The increment is buffered and flushed in batches, so download_count lags by up
+    to COUNTER_FLUSH_INTERVAL seconds.
+    """
+    material = db.query(CourseMaterial.url, CourseMaterial.file_path).filter(
+        CourseMaterial.id == material_id
+    ).first()
     if not material:
         raise HTTPException(status_code=404, detail="Material not found")
     
-    material.download_count += 1
-    db.commit()
+    counters.increment("material_downloads", material_id)
+    
+    url = material.url
+    if not url and material.file_path:
+        url = f"/api/classroom/material/{material_id}/file"
+    return {"message": "Download tracked", "url": url}
+
+
+@router.get("/material/{material_id}/file")
+async def download_material_file(
+    material_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Serve a stored material file to members of its classroom
+    
+    Objects are content-addressed, so the SHA-256 in the path is a strong ETag and
+    If-None-Match revalidation never touches the file. FileResponse handles Range /
+    If-Range for resumable downloads and uses zero-copy pathsend when the server offers it.
+    The file goes out under the name and type it was uploaded with.
+    """
+    row = db.query(
+        CourseMaterial.title, CourseMaterial.file_path, CourseMaterial.file_name, CourseMaterial.content_type,
+        Course.classroom_id
+    ).join(Course, Course.id == CourseMaterial.course_id).filter(
+        CourseMaterial.id == material_id
+    ).first()
+    if not row or not row.file_path:
+        raise HTTPException(status_code=404, detail="Material file not found")
+    
+    enrollment = db.query(ClassroomEnrollment.id).filter(
+        ClassroomEnrollment.classroom_id == row.classroom_id,
+        ClassroomEnrollment.user_id == current_user.id
+    ).first()
+    if not enrollment:
+        raise HTTPException(status_code=403, detail="Not a member of this classroom")
+    # Release the connection now rather than after the whole file has been sent
+    db.close()
+    
+    headers = {
+        "ETag": f'"{storage.content_hash(row.file_path)}"',
+        "Cache-Control": f"private, max-age={settings.MATERIAL_CACHE_MAX_AGE}"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match == "*" or headers["ETag"] in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
     
-    return {"message": "Download tracked", "url": material.url}
+    path = storage.absolute_path(row.file_path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Material file not found")
+    
+    filename = row.file_name or row.title
+    response = FileResponse(
+        path,
+        media_type=row.content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        filename=filename,
+        content_disposition_type="inline",
+        headers=headers
+    )
+    response.chunk_size = MATERIAL_READ_CHUNK
+    return response
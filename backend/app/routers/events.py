@@ -1,18 +1,63 @@
 """Events Router"""
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 
+from app import recurrence
 from app.database import get_db
+from app.response_cache import cached
 from app.models.event import Event
 from app.models.user import User
 from app.models.classroom import ClassroomEnrollment
-from app.schemas.event import EventCreate, EventResponse, EventUpdate
+from app.schemas.event import EventCreate, EventResponse, EventUpdate, EventOccurrence
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/api/events", tags=["Events"])
 
+MAX_RANGE_DAYS = 366
+UPCOMING_HORIZON_DAYS = 366  # how far ahead /upcoming looks for a recurring event's next occurrence
+
+
+def _check_rule(rule: Optional[str]):
+    if rule:
+        try:
+            recurrence.parse_rule(rule)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid recurrence rule: {e}")
+
+
+def _utc(value: datetime) -> datetime:
+    """Naive UTC, as event times are stored"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _visible(current_user: User):
+    classroom_ids = [e.classroom_id for e in current_user.enrollments]
+    return (Event.classroom_id == None) | (Event.classroom_id.in_(classroom_ids))
+
+
+def _occurrences(events: Iterable[Event], start: datetime, end: datetime, per_event: Optional[int] = None) -> List[EventOccurrence]:
+    """Occurrences of events within [start, end), earliest first"""
+    occurrences = []
+    for event in events:
+        series = EventOccurrence(**EventResponse.model_validate(event).model_dump(), series_start=event.start_time)
+        if event.recurrence_rule:
+            rule = recurrence.parse_rule(event.recurrence_rule)
+            spans = islice(recurrence.occurrences(rule, event.start_time, event.end_time, start, end), per_event)
+        else:
+            spans = [(event.start_time, event.end_time)]
+        occurrences.extend(
+            series.model_copy(update={"start_time": occurrence_start, "end_time": occurrence_end})
+            for occurrence_start, occurrence_end in spans
+        )
+    occurrences.sort(key=lambda occurrence: occurrence.start_time)
+    return occurrences
+
 
 @router.post("/", response_model=EventResponse)
 async def create_event(
@@ -33,6 +78,7 @@ async def create_event(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Only instructors or admins can create classroom events"
             )
+    _check_rule(event_data.recurrence_rule)
 
     event = Event(
         **event_data.model_dump(),
@@ -49,7 +95,10 @@ async def get_my_events(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all events relevant to the current user (global + their classrooms)"""
+    """Get all events relevant to the current user (global + their classrooms)
+    
+    Recurring events appear once, as their series; use /range for occurrences.
+    """
     classroom_ids = [e.classroom_id for e in current_user.enrollments]
     
     events = db.query(Event).filter(
@@ -59,7 +108,44 @@ async def get_my_events(
     return events
 
 
+@router.get("/range", response_model=List[EventOccurrence])
+async def get_events_in_range(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    classroom_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Every occurrence between from and to of the events the user can see
+    
+    Candidate series are found through the (classroom_id, start_time, series_end)
+    index, and recurring ones are expanded within the window only. Each occurrence
+    carries its own start_time/end_time and the series' first start as series_start.
+    """
+    start, end = _utc(start), _utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise HTTPException(status_code=400, detail=f"Ranges are limited to {MAX_RANGE_DAYS} days")
+    
+    if classroom_id is not None:
+        enrolled = any(e.classroom_id == classroom_id for e in current_user.enrollments)
+        if not enrolled and not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Not a member of this classroom")
+        visible = Event.classroom_id == classroom_id
+    else:
+        visible = _visible(current_user)
+    
+    events = db.query(Event).filter(
+        visible,
+        Event.start_time < end,
+        or_(Event.series_end.is_(None), Event.series_end >= start)
+    ).all()
+    return _occurrences(events, start, end)
+
+
 @router.get("/classroom/{classroom_id}", response_model=List[EventResponse])
+@cached("events:{classroom_id}")
 async def get_classroom_events(
     classroom_id: int,
     db: Session = Depends(get_db)
@@ -75,16 +161,26 @@ async def get_upcoming_events(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get upcoming events for the current user"""
-    classroom_ids = [e.classroom_id for e in current_user.enrollments]
+    """Get upcoming events for the current user, recurring ones by their next occurrences"""
+    visible = _visible(current_user)
     now = datetime.utcnow()
     
     events = db.query(Event).filter(
-        ((Event.classroom_id == None) | (Event.classroom_id.in_(classroom_ids))),
+        visible,
+        Event.recurrence_rule.is_(None),
         Event.end_time >= now
     ).order_by(Event.start_time.asc()).limit(limit).all()
     
-    return events
+    series = db.query(Event).filter(
+        visible,
+        Event.recurrence_rule.isnot(None),
+        Event.start_time < now + timedelta(days=UPCOMING_HORIZON_DAYS),
+        or_(Event.series_end.is_(None), Event.series_end >= now)
+    ).all()
+    
+    upcoming = events + _occurrences(series, now, now + timedelta(days=UPCOMING_HORIZON_DAYS), per_event=limit)
+    upcoming.sort(key=lambda occurrence: occurrence.start_time)
+    return upcoming[:limit]
 
 
 @router.get("/{event_id}", response_model=EventResponse)
@@ -112,6 +208,7 @@ async def update_event(
         raise HTTPException(status_code=403, detail="Not authorized to update this event")
         
     update_data = event_data.model_dump(exclude_unset=True)
+    _check_rule(update_data.get("recurrence_rule"))
     for key, value in update_data.items():
         setattr(event, key, value)
         
@@ -0,0 +1,238 @@
+"""Gradebook Router - course and classroom grade exports"""
+import csv
+import io
+from itertools import groupby
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func, literal, union_all
+from sqlalchemy.orm import Session
+
+from app.database import get_db, SessionLocal
+from app.models.user import User
+from app.models.classroom import ClassroomEnrollment
+from app.models.course import Course
+from app.models.assignment import Assignment, Submission, Test, TestResult
+from app.routers.auth import get_current_user
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+router = APIRouter(prefix="/api/classroom", tags=["Gradebook"])
+
+GRADEBOOK_BATCH = 1000  # students per CSV flush / Parquet row group
+STUDENT_COLUMNS = ["student_id", "name", "email"]
+
+
+def _require_instructor(db: Session, classroom_id: int, current_user: User):
+    enrollment = db.query(ClassroomEnrollment.id).filter(
+        ClassroomEnrollment.classroom_id == classroom_id,
+        ClassroomEnrollment.user_id == current_user.id,
+        ClassroomEnrollment.role == "instructor"
+    ).first()
+    if not enrollment:
+        raise HTTPException(status_code=403, detail="Only instructors can export the gradebook")
+
+
+def _gradebook_items(db: Session, course_ids, prefix_code: bool):
+    """Column list for the export: [(kind, item_id, header)] for every assignment and test"""
+    courses = dict(db.query(Course.id, Course.code).filter(Course.id.in_(course_ids)))
+    items = []
+    seen = set(STUDENT_COLUMNS)
+    for kind, model in (("assignment", Assignment), ("test", Test)):
+        rows = db.query(model.id, model.course_id, model.title).filter(
+            model.course_id.in_(course_ids)
+        ).order_by(model.course_id, model.id)
+        for row in rows:
+            header = f"{courses[row.course_id]} {row.title}" if prefix_code else row.title
+            if header in seen:
+                header = f"{header} ({kind} {row.id})"
+            seen.add(header)
+            items.append((kind, row.id, header))
+    return items
+
+
+def _gradebook_query(classroom_id: int, course_ids):
+    """Every student of the classroom with each of their scores, ordered by student
+    
+    Assignment grades and best test scores are unioned into one (user, item, score)
+    set and LEFT JOINed to the classroom's student enrollments, so students with no
+    work still get a row.
+    """
+    scores = union_all(
+        select(
+            Submission.user_id,
+            literal("assignment").label("kind"),
+            Submission.assignment_id.label("item_id"),
+            Submission.grade.label("score")
+        ).join(Assignment, Assignment.id == Submission.assignment_id)
+        .where(Assignment.course_id.in_(course_ids)),
+        select(
+            TestResult.user_id,
+            literal("test").label("kind"),
+            TestResult.test_id.label("item_id"),
+            func.max(TestResult.score).label("score")
+        ).join(Test, Test.id == TestResult.test_id)
+        .where(Test.course_id.in_(course_ids), TestResult.completed_at.isnot(None))
+        .group_by(TestResult.user_id, TestResult.test_id)
+    ).subquery()
+    
+    return select(
+        User.id, User.student_id, User.name, User.email,
+        scores.c.kind, scores.c.item_id, scores.c.score
+    ).select_from(ClassroomEnrollment).join(
+        User, User.id == ClassroomEnrollment.user_id
+    ).outerjoin(
+        scores, scores.c.user_id == ClassroomEnrollment.user_id
+    ).where(
+        ClassroomEnrollment.classroom_id == classroom_id,
+        ClassroomEnrollment.role == "student"
+    ).order_by(User.id)
+
+
+def _student_rows(classroom_id: int, course_ids, items):
+    """Yield one [student_id, name, email, score...] row per student
+    
+    Uses its own session because the request-scoped one is closed before the body is
+    sent, and reads the joined result in yield_per batches so only one student's
+    scores are grouped at a time.
+    """
+    position = {(kind, item_id): i for i, (kind, item_id, _) in enumerate(items)}
+    db = SessionLocal()
+    try:
+        result = db.execute(_gradebook_query(classroom_id, course_ids).execution_options(yield_per=GRADEBOOK_BATCH))
+        for _, rows in groupby(result, key=lambda row: row.id):
+            rows = list(rows)
+            scores = [None] * len(items)
+            for row in rows:
+                # Items created after the header was built have no column; leave them out
+                index = position.get((row.kind, row.item_id))
+                if index is not None:
+                    scores[index] = row.score
+            first = rows[0]
+            yield [first.student_id, first.name, first.email] + scores
+    finally:
+        db.close()
+
+
+def _stream_csv(rows, headers):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % GRADEBOOK_BATCH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _stream_parquet(rows, headers):
+    """Write GRADEBOOK_BATCH students per row group, yielding each group's bytes"""
+    schema = pa.schema(
+        [pa.field(name, pa.string()) for name in STUDENT_COLUMNS]
+        + [pa.field(name, pa.float64()) for name in headers[len(STUDENT_COLUMNS):]]
+    )
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    
+    def write_batch(batch):
+        columns = list(zip(*batch)) if batch else [[] for _ in headers]
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        ))
+    
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == GRADEBOOK_BATCH:
+            write_batch(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write_batch(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def _export(db: Session, classroom_id: int, course_ids, filename: str, format: str, prefix_code: bool):
+    if format == "parquet" and pq is None:
+        raise HTTPException(status_code=400, detail="Parquet export needs pyarrow installed on the server")
+    
+    items = _gradebook_items(db, course_ids, prefix_code)
+    headers = STUDENT_COLUMNS + [header for _, _, header in items]
+    # Nothing else is read through the request session; give its connection back
+    db.close()
+    
+    rows = _student_rows(classroom_id, course_ids, items)
+    if format == "parquet":
+        body, media_type = _stream_parquet(rows, headers), "application/vnd.apache.parquet"
+    else:
+        body, media_type = _stream_csv(rows, headers), "text/csv"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    )
+
+
+@router.get("/course/{course_id}/gradebook")
+async def export_course_gradebook(
+    course_id: int,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download a course's gradebook: one row per student, one column per assignment and test
+    
+    Assignment columns hold the graded score, test columns the best attempt; blanks
+    mean not submitted or not graded yet.
+    """
+    course = db.query(Course.classroom_id, Course.code).filter(Course.id == course_id).first()
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    _require_instructor(db, course.classroom_id, current_user)
+    
+    return _export(db, course.classroom_id, [course_id], f"gradebook-{course.code}", format, prefix_code=False)
+
+
+@router.get("/{classroom_id}/gradebook")
+async def export_classroom_gradebook(
+    classroom_id: int,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download the gradebook for every course in a classroom, columns prefixed by course code"""
+    _require_instructor(db, classroom_id, current_user)
+    course_ids = [row.id for row in db.query(Course.id).filter(Course.classroom_id == classroom_id)]
+    
+    return _export(db, classroom_id, course_ids, f"gradebook-classroom-{classroom_id}", format, prefix_code=True)
@@ -0,0 +1,67 @@
+"""Search Router"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db
+from app.models.user import User
+from app.models.classroom import ClassroomEnrollment
+from app.models import search as search_index
+from app.schemas.search import SearchResult
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/api/search", tags=["Search"])
+
+SEARCH_MAX_PAGE_SIZE = 50
+
+
+def _decode_cursor(cursor: str):
+    try:
+        score, doc_id = cursor.split(",")
+        return float(score), int(doc_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("", response_model=List[SearchResult])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    kinds: Optional[str] = Query(None, description="Comma-separated: " + ", ".join(search_index.KINDS)),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Search the user's classrooms, institution-wide announcements and their own messages
+    
+    Results are best match first; the X-Next-Cursor header carries the position
+    of the last row when more rows may follow.
+    """
+    kind_list = [kind.strip() for kind in kinds.split(",") if kind.strip()] if kinds else None
+    unknown = [kind for kind in kind_list or [] if kind not in search_index.KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown kind: {unknown[0]}")
+    
+    classroom_ids = [cid for cid, in db.query(ClassroomEnrollment.classroom_id).filter(
+        ClassroomEnrollment.user_id == current_user.id
+    )]
+    rows = search_index.search(
+        db, current_user.id, classroom_ids, q, kind_list, limit,
+        after=_decode_cursor(cursor) if cursor else None
+    )
+    
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = f"{rows[-1].score!r},{rows[-1].doc_id}"
+    
+    return [
+        SearchResult(
+            kind=row.kind,
+            id=row.source_id,
+            classroom_id=row.classroom_id,
+            course_id=row.course_id,
+            title=row.title or "",
+            snippet=row.snippet or ""
+        )
+        for row in rows
+    ]
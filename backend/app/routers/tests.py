@@ -1,24 +1,79 @@
 """Tests Router"""
+import asyncio
 import json
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.database import get_db
+from app import answer_keys
+from app.config import get_settings
+from app.database import get_db, SessionLocal, upsert
+from app.exam_sessions import exam_sessions, OpenSession
+from app.fast_json import FastJSONResponse
 from app.models.user import User
 from app.models.classroom import ClassroomEnrollment
 from app.models.course import Course
-from app.models.assignment import Test, TestResult
+from app.models.assignment import Test, TestResult, TestAttempts
 from app.schemas.assignment import (
-    TestCreate, TestResponse, TestDetail,
-    TestSubmit, TestResultResponse, TestResultDetail
+    TestCreate, TestResponse, TestDetail, TestQuestionsUpdate, TestRegradeResponse, ItemAnalysis,
+    TestSubmit, TestResultResponse, TestResultDetail,
+    ExamSessionResponse, ExamAnswersUpdate, ExamAutosaveResponse
 )
 from app.routers.auth import get_current_user
 
+settings = get_settings()
+
 router = APIRouter(prefix="/api", tags=["Tests"])
 
 
+def _instructor_test(db: Session, test_id: int, current_user: User, action: str) -> Test:
+    test = db.query(Test).filter(Test.id == test_id).first()
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    enrollment = db.query(ClassroomEnrollment.id).join(
+        Course, Course.classroom_id == ClassroomEnrollment.classroom_id
+    ).filter(
+        Course.id == test.course_id,
+        ClassroomEnrollment.user_id == current_user.id,
+        ClassroomEnrollment.role == "instructor"
+    ).first()
+    if not enrollment:
+        raise HTTPException(status_code=403, detail=f"Only instructors can {action}")
+    return test
+
+
+def _reserve_attempt(db: Session, test_id: int, user_id: int, max_attempts: int) -> Optional[int]:
+    """Claim the user's next attempt number, or None when all are used
+    
+    A single INSERT ... ON CONFLICT DO UPDATE ... WHERE used < max_attempts, so two
+    simultaneous submits can never both take the last attempt and nothing has to
+    count the user's results. The claim is undone if the transaction rolls back.
+    """
+    if not max_attempts or max_attempts < 1:
+        return None
+    stmt = upsert(TestAttempts).values(test_id=test_id, user_id=user_id, used=1)
+    return db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[TestAttempts.test_id, TestAttempts.user_id],
+            set_={"used": TestAttempts.used + 1},
+            where=TestAttempts.used < max_attempts
+        ).returning(TestAttempts.used)
+    ).scalar()
+
+
+def _regrade_results(db: Session, test: Test, write_scores: bool = True) -> TestRegradeResponse:
+    key = answer_keys.compile_key(db, test)
+    rows = db.query(
+        TestResult.id, TestResult.answers, TestResult.score, TestResult.percentage, TestResult.passed
+    ).filter(TestResult.test_id == test.id, TestResult.completed_at.isnot(None)).all()
+    changed = answer_keys.regrade(db, key, rows, write_scores=write_scores)
+    if not write_scores:
+        return TestRegradeResponse(test_id=test.id, regraded=0, changed=0)
+    return TestRegradeResponse(test_id=test.id, regraded=len(rows), changed=len(changed))
+
+
 @router.post("/classroom/{classroom_id}/course/{course_id}/test/create", response_model=TestResponse)
 async def create_test(
     classroom_id: int,
@@ -44,9 +99,6 @@ async def create_test(
     if not enrollment:
         raise HTTPException(status_code=403, detail="Only instructors can create tests")
     
-    # Serialize questions to JSON
-    questions_json = json.dumps([q.model_dump() for q in test_data.questions])
-    
     test = Test(
         course_id=course_id,
         title=test_data.title,
@@ -55,10 +107,11 @@ async def create_test(
         passing_score=test_data.passing_score,
         time_limit=test_data.time_limit,
         max_attempts=test_data.max_attempts,
-        questions=questions_json,
         created_by=current_user.id
     )
     db.add(test)
+    db.flush()
+    answer_keys.replace_questions(db, test, [q.model_dump() for q in test_data.questions])
     db.commit()
     db.refresh(test)
     
@@ -83,39 +136,46 @@ async def get_test_details(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get test details including questions"""
+    """Get test details including questions
+    
+    The questions come from the compiled test, with correct answers only in the
+    instructors' copy, and the whole body is encoded once by FastJSONResponse.
+    Students only get a timed test's questions while one of their sessions for it
+    is open; otherwise the list is empty and they start one with /test/{id}/start.
+    """
     test = db.query(Test).filter(Test.id == test_id).first()
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    questions = json.loads(test.questions) if test.questions else []
-    
-    # For students, remove correct answers
-    course = db.query(Course).filter(Course.id == test.course_id).first()
-    enrollment = db.query(ClassroomEnrollment).filter(
-        ClassroomEnrollment.classroom_id == course.classroom_id,
+    role = db.query(ClassroomEnrollment.role).join(
+        Course, Course.classroom_id == ClassroomEnrollment.classroom_id
+    ).filter(
+        Course.id == test.course_id,
         ClassroomEnrollment.user_id == current_user.id
-    ).first()
+    ).scalar()
     
-    is_instructor = enrollment and enrollment.role == "instructor"
-    if not is_instructor:
-        for q in questions:
-            q.pop("correct_answer", None)
+    key = answer_keys.get_key(db, test_id, test.key_version)
+    if role == "instructor":
+        questions = key.instructor_questions
+    elif test.time_limit and not _has_open_session(db, test_id, current_user.id, datetime.utcnow()):
+        questions = ()
+    else:
+        questions = key.student_questions
     
-    return TestDetail(
-        id=test.id,
-        course_id=test.course_id,
-        title=test.title,
-        description=test.description,
-        total_points=test.total_points,
-        passing_score=test.passing_score,
-        time_limit=test.time_limit,
-        max_attempts=test.max_attempts,
-        is_published=test.is_published,
-        created_at=test.created_at,
-        question_count=len(questions),
-        questions=questions
-    )
+    return FastJSONResponse({
+        "id": test.id,
+        "course_id": test.course_id,
+        "title": test.title,
+        "description": test.description,
+        "total_points": test.total_points,
+        "passing_score": test.passing_score,
+        "time_limit": test.time_limit,
+        "max_attempts": test.max_attempts,
+        "is_published": test.is_published,
+        "created_at": test.created_at,
+        "question_count": len(key.question_ids),
+        "questions": list(questions)
+    })
 
 
 @router.put("/test/{test_id}/publish")
@@ -135,6 +195,46 @@ async def publish_test(
     return {"message": "Test published successfully"}
 
 
+@router.put("/test/{test_id}/questions", response_model=TestRegradeResponse)
+async def update_test_questions(
+    test_id: int,
+    update_data: TestQuestionsUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Replace a test's questions, e.g. to correct an answer key
+    
+    The compiled answer key is invalidated everywhere by bumping key_version. With
+    regrade (the default) every existing result is re-scored in the same transaction.
+    """
+    test = _instructor_test(db, test_id, current_user, "edit tests")
+    
+    answer_keys.replace_questions(db, test, [q.model_dump() for q in update_data.questions])
+    test.questions = "[]"
+    test.key_version = (test.key_version or 1) + 1
+    db.flush()
+    
+    # Item analysis restarts with the new rows and is rebuilt from every result
+    response = _regrade_results(db, test, write_scores=update_data.regrade)
+    db.commit()
+    answer_keys.invalidate(test_id)
+    
+    return response
+
+
+@router.post("/test/{test_id}/regrade", response_model=TestRegradeResponse)
+async def regrade_test(
+    test_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Re-score every result of a test against its current answer key"""
+    test = _instructor_test(db, test_id, current_user, "regrade tests")
+    response = _regrade_results(db, test)
+    db.commit()
+    return response
+
+
 @router.post("/test/{test_id}/submit", response_model=TestResultResponse)
 async def submit_test(
     test_id: int,
@@ -142,34 +242,31 @@ async def submit_test(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Submit test answers and get results"""
-    test = db.query(Test).filter(Test.id == test_id).first()
+    """Submit test answers and get results
+    
+    Only for untimed tests; a timed test is taken through a session so the server
+    can enforce its deadline.
+    """
+    test = db.query(
+        Test.is_published, Test.max_attempts, Test.key_version, Test.time_limit
+    ).filter(Test.id == test_id).first()
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     
     if not test.is_published:
         raise HTTPException(status_code=400, detail="Test not available yet")
     
-    # Check attempt count
-    existing_attempts = db.query(TestResult).filter(
-        TestResult.test_id == test_id,
-        TestResult.user_id == current_user.id
-    ).count()
+    if test.time_limit:
+        raise HTTPException(status_code=400, detail="Timed tests must be started and submitted as a session")
     
-    if existing_attempts >= test.max_attempts:
+    attempt_number = _reserve_attempt(db, test_id, current_user.id, test.max_attempts)
+    if attempt_number is None:
         raise HTTPException(status_code=400, detail="Maximum attempts reached")
     
-    # Grade the test
-    questions = json.loads(test.questions) if test.questions else []
-    score = 0.0
-    
-    for i, q in enumerate(questions):
-        user_answer = answers_data.answers.get(str(i))
-        if user_answer and user_answer.lower() == q.get("correct_answer", "").lower():
-            score += q.get("points", 0)
-    
-    percentage = (score / test.total_points * 100) if test.total_points > 0 else 0
-    passed = percentage >= test.passing_score
+    # Grade the test against the compiled answer key
+    key = answer_keys.get_key(db, test_id, test.key_version)
+    correct = key.mark(answers_data.answers)
+    score, percentage, passed = key.score(correct)
     
     result = TestResult(
         test_id=test_id,
@@ -177,17 +274,227 @@ async def submit_test(
         score=score,
         percentage=percentage,
         passed=passed,
-        attempt_number=existing_attempts + 1,
+        attempt_number=attempt_number,
         answers=json.dumps(answers_data.answers),
         completed_at=datetime.utcnow()
     )
     db.add(result)
+    answer_keys.record_item_results(db, key, [(correct, percentage)])
     db.commit()
     db.refresh(result)
     
     return result
 
 
+def _session_response(db: Session, result: TestResult, now: datetime) -> ExamSessionResponse:
+    return ExamSessionResponse(
+        session_id=result.id,
+        test_id=result.test_id,
+        attempt_number=result.attempt_number,
+        started_at=result.started_at,
+        expires_at=result.expires_at,
+        server_time=now,
+        answers=exam_sessions.answers(db, result.id)
+    )
+
+
+def _has_open_session(db: Session, test_id: int, user_id: int, now: datetime) -> bool:
+    """Whether the user has a session for the test that still accepts answers"""
+    open_attempts = db.query(TestResult.id).filter(
+        TestResult.test_id == test_id,
+        TestResult.user_id == user_id,
+        TestResult.completed_at.is_(None)
+    ).all()
+    for attempt in open_attempts:
+        session = exam_sessions.get(db, attempt.id, user_id)
+        if session is not None and session.accepts_answers(now):
+            return True
+    return False
+
+
+def _open_session(db: Session, session_id: int, current_user: User) -> OpenSession:
+    session = exam_sessions.get(db, session_id, current_user.id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="No open exam session")
+    return session
+
+
+@router.post("/test/{test_id}/start", response_model=ExamSessionResponse)
+async def start_test_session(
+    test_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Start a timed attempt, or resume the one already open
+    
+    The deadline is fixed here from the test's time limit. Answers are then
+    autosaved to the session, which is submitted automatically when time runs out.
+    """
+    test = db.query(Test.is_published, Test.max_attempts, Test.time_limit).filter(Test.id == test_id).first()
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    if not test.is_published:
+        raise HTTPException(status_code=400, detail="Test not available yet")
+    
+    now = datetime.utcnow()
+    open_attempts = db.query(TestResult).filter(
+        TestResult.test_id == test_id,
+        TestResult.user_id == current_user.id,
+        TestResult.completed_at.is_(None)
+    ).all()
+    for attempt in open_attempts:
+        session = exam_sessions.get(db, attempt.id, current_user.id)
+        if session is not None and session.accepts_answers(now):
+            return _session_response(db, attempt, now)
+    if open_attempts:
+        # Out of time but not swept yet; submit them before starting another
+        exam_sessions.finalize(db, [attempt.id for attempt in open_attempts], now)
+        db.commit()
+    
+    attempt_number = _reserve_attempt(db, test_id, current_user.id, test.max_attempts)
+    if attempt_number is None:
+        raise HTTPException(status_code=400, detail="Maximum attempts reached")
+    
+    result = TestResult(
+        test_id=test_id,
+        user_id=current_user.id,
+        attempt_number=attempt_number,
+        answers="{}",
+        started_at=now,
+        expires_at=now + timedelta(minutes=test.time_limit) if test.time_limit else None
+    )
+    db.add(result)
+    db.commit()
+    
+    return ExamSessionResponse(
+        session_id=result.id,
+        test_id=test_id,
+        attempt_number=result.attempt_number,
+        started_at=now,
+        expires_at=result.expires_at,
+        server_time=now
+    )
+
+
+@router.get("/test-session/{session_id}", response_model=ExamSessionResponse)
+async def get_test_session(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Current state of an open session, e.g. to resume after a reload"""
+    _open_session(db, session_id, current_user)
+    result = db.query(TestResult).filter(TestResult.id == session_id).first()
+    return _session_response(db, result, datetime.utcnow())
+
+
+@router.patch("/test-session/{session_id}/answers", response_model=ExamAutosaveResponse)
+async def autosave_test_answers(
+    session_id: int,
+    update_data: ExamAnswersUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Autosave changed answers; only the given questions are touched"""
+    session = _open_session(db, session_id, current_user)
+    now = datetime.utcnow()
+    if not session.accepts_answers(now):
+        raise HTTPException(status_code=409, detail="Time is up for this attempt")
+    
+    exam_sessions.save(session, update_data.answers)
+    return ExamAutosaveResponse(saved=len(update_data.answers), remaining_seconds=session.remaining_seconds(now))
+
+
+@router.post("/test-session/{session_id}/submit", response_model=TestResultResponse)
+async def submit_test_session(
+    session_id: int,
+    answers_data: Optional[ExamAnswersUpdate] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Submit a session and get results
+    
+    Answers sent along are saved first unless time is up, in which case the
+    attempt is graded on what was saved before the deadline. Submitting an attempt
+    that was already submitted, e.g. by the deadline sweeper, returns its result.
+    """
+    session = exam_sessions.get(db, session_id, current_user.id)
+    if session is not None:
+        now = datetime.utcnow()
+        if answers_data and answers_data.answers and session.accepts_answers(now):
+            exam_sessions.save(session, answers_data.answers)
+        exam_sessions.finalize(db, [session_id], now)
+        db.commit()
+    
+    result = db.query(TestResult).filter(
+        TestResult.id == session_id,
+        TestResult.user_id == current_user.id,
+        TestResult.completed_at.isnot(None)
+    ).first()
+    if not result:
+        raise HTTPException(status_code=404, detail="Exam session not found")
+    return result
+
+
+@router.websocket("/test-session/{session_id}/ws")
+async def exam_session_channel(websocket: WebSocket, session_id: int, token: str):
+    """Autosave channel for an open session
+    
+    Each message is {"answers": {question_index: answer}} and is acknowledged with
+    {"type": "saved", ...}. Once the deadline and grace period have passed the
+    server sends {"type": "expired"} and closes; the sweeper submits what was saved.
+    """
+    db = SessionLocal()
+    try:
+        try:
+            user = await get_current_user(token=token, db=db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        session = exam_sessions.get(db, session_id, user.id)
+    finally:
+        db.close()
+    if session is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    grace = settings.EXAM_DEADLINE_GRACE_SECONDS
+    try:
+        while True:
+            now = datetime.utcnow()
+            if not session.accepts_answers(now):
+                await websocket.send_json({"type": "expired"})
+                await websocket.close()
+                return
+            
+            remaining = session.remaining_seconds(now)
+            try:
+                text = await asyncio.wait_for(
+                    websocket.receive_text(),
+                    timeout=remaining + grace if remaining is not None else None
+                )
+            except asyncio.TimeoutError:
+                continue
+            try:
+                answers = json.loads(text).get("answers") or {}
+                if not isinstance(answers, dict):
+                    raise ValueError
+            except (ValueError, AttributeError):
+                await websocket.send_json({"type": "error", "detail": "Expected {\"answers\": {...}}"})
+                continue
+            
+            exam_sessions.save(session, answers)
+            await websocket.send_json({
+                "type": "saved",
+                "saved": len(answers),
+                "remaining_seconds": session.remaining_seconds(datetime.utcnow())
+            })
+    except WebSocketDisconnect:
+        pass
+
+
 @router.get("/test-result/{user_id}/all", response_model=List[TestResultResponse])
 async def get_user_test_results(
     user_id: int,
@@ -198,5 +505,36 @@ async def get_user_test_results(
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    results = db.query(TestResult).filter(TestResult.user_id == user_id).all()
+    results = db.query(TestResult).filter(
+        TestResult.user_id == user_id,
+        TestResult.completed_at.isnot(None)
+    ).all()
     return results
+
+
+@router.get("/test/{test_id}/item-analysis", response_model=List[ItemAnalysis])
+async def get_item_analysis(
+    test_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Per-question difficulty and discrimination (instructor only)
+    
+    difficulty is the share of attempts answering correctly; discrimination is the
+    point-biserial correlation between getting the question right and the overall
+    percentage. Both come from sums kept up to date as results arrive.
+    """
+    test = _instructor_test(db, test_id, current_user, "view item analysis")
+    analysis = []
+    for q in answer_keys.load_questions(db, test):
+        difficulty, discrimination = answer_keys.item_analysis(q)
+        analysis.append(ItemAnalysis(
+            question_id=q.id,
+            position=q.position,
+            question=q.question,
+            attempts=q.attempt_count,
+            correct=q.correct_count,
+            difficulty=round(difficulty, 4) if difficulty is not None else None,
+            discrimination=round(discrimination, 4) if discrimination is not None else None
+        ))
+    return analysis
@@ -0,0 +1,137 @@
+"""Uploads Router - chunked, resumable file uploads"""
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from sqlalchemy.orm import Session
+
+from app import storage
+from app.config import get_settings
+from app.database import get_db
+from app.models.user import User
+from app.models.upload import Upload
+from app.schemas.upload import UploadCreate, UploadResponse
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/api/uploads", tags=["Uploads"])
+settings = get_settings()
+
+# Uploads currently receiving a chunk; a second concurrent PATCH would interleave bytes
+_receiving = set()
+
+
+def _upload_response(upload: Upload) -> UploadResponse:
+    return UploadResponse(
+        id=upload.id,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        size=upload.size,
+        offset=upload.size if upload.completed_at else storage.received_bytes(upload.id),
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        sha256=upload.sha256,
+        file_path=upload.file_path,
+        created_at=upload.created_at,
+        completed_at=upload.completed_at
+    )
+
+
+def _get_own_upload(db: Session, upload_id: str, current_user: User) -> Upload:
+    upload = db.query(Upload).filter(Upload.id == upload_id).first()
+    if not upload or upload.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+def resolve_upload(db: Session, upload_id: str, current_user: User) -> Upload:
+    """Look up a finished upload owned by the current user, for attaching to a record"""
+    upload = _get_own_upload(db, upload_id, current_user)
+    if not upload.completed_at:
+        raise HTTPException(status_code=400, detail="Upload is not complete")
+    if not os.path.isfile(storage.absolute_path(upload.file_path)):
+        # Never attached within the GC grace period, so the object was collected
+        raise HTTPException(status_code=410, detail="Upload has expired, please upload the file again")
+    return upload
+
+
+@router.post("/", response_model=UploadResponse)
+async def create_upload(
+    upload_data: UploadCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Start a resumable upload; send the bytes with PATCH in chunk_size pieces"""
+    if upload_data.size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="File too large")
+    
+    upload = Upload(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=upload_data.filename,
+        content_type=upload_data.content_type,
+        size=upload_data.size
+    )
+    storage.start_upload(upload.id)
+    db.add(upload)
+    db.flush()
+    response = _upload_response(upload)
+    db.commit()
+    
+    return response
+
+
+@router.get("/{upload_id}", response_model=UploadResponse)
+async def get_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get upload progress; offset is where an interrupted upload resumes"""
+    return _upload_response(_get_own_upload(db, upload_id, current_user))
+
+
+@router.patch("/{upload_id}", response_model=UploadResponse)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Append the raw request body at Upload-Offset
+    
+    The body is streamed to disk and hashed as it arrives. When the last byte lands
+    the file moves into the content store and sha256/file_path are returned.
+    """
+    upload = _get_own_upload(db, upload_id, current_user)
+    if upload.completed_at:
+        raise HTTPException(status_code=409, detail="Upload already complete")
+    if upload_id in _receiving:
+        raise HTTPException(status_code=409, detail="Another chunk is being received for this upload")
+    
+    offset = storage.received_bytes(upload_id)
+    if upload_offset != offset:
+        raise HTTPException(status_code=409, detail=f"Upload-Offset mismatch, resume from {offset}")
+    
+    # Hand the pooled connection back while the body streams in; a slow client
+    # must not pin a DB connection for the length of its chunk
+    upload_size = upload.size
+    db.rollback()
+    
+    _receiving.add(upload_id)
+    try:
+        offset = await storage.append_chunk(upload_id, offset, upload_size, request.stream())
+        if offset == upload_size:
+            upload.sha256, upload.file_path = await asyncio.to_thread(storage.finish_upload, upload_id)
+    except storage.UploadSizeExceeded:
+        raise HTTPException(status_code=413, detail="More data than the declared size")
+    finally:
+        _receiving.discard(upload_id)
+    
+    if offset == upload_size:
+        upload.completed_at = datetime.utcnow()
+        storage.register_object(db, upload.sha256, upload_size)
+    
+    response = _upload_response(upload)
+    db.commit()
+    return response
@@ -1,17 +1,20 @@
 """Users Router"""
 import json
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List
 
 from app.database import get_db
 from app.models.user import User, GitHubRepo, LinkedInExperience
 from app.models.career import UserSkill
-from app.schemas.user import UserResponse, UserUpdate, UserProfile, SkillCreate, SkillResponse
+from app.schemas.user import UserResponse, UserUpdate, UserProfile, UserLookupResponse, SkillCreate, SkillResponse
 from app.routers.auth import get_current_user
+from app.user_directory import user_directory
 
 router = APIRouter(prefix="/api/users", tags=["Users"])
 
+LOOKUP_MAX_RESULTS = 20
+
 
 @router.get("/profile/me", response_model=UserProfile)
 async def get_my_profile(
@@ -84,6 +87,25 @@ async def get_my_profile(
     )
 
 
+@router.get("/lookup", response_model=List[UserLookupResponse])
+async def lookup_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=LOOKUP_MAX_RESULTS),
+    current_user: User = Depends(get_current_user)
+):
+    """Typeahead over classmates' names, emails and student ids, answered from memory"""
+    return [
+        UserLookupResponse(
+            id=entry.id,
+            name=entry.name,
+            email=entry.email,
+            student_id=entry.student_id,
+            profile_image=entry.profile_image
+        )
+        for entry in user_directory.lookup(current_user.id, q, limit)
+    ]
+
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(user_id: int, db: Session = Depends(get_db)):
     """Get user by ID"""
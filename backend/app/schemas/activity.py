@@ -0,0 +1,17 @@
+"""Activity Feed Schemas"""
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class ActivityResponse(BaseModel):
+    id: int
+    kind: str  # announcement, course_update, assignment, test, event
+    source_id: int
+    classroom_id: Optional[int] = None
+    course_id: Optional[int] = None
+    actor_id: Optional[int] = None
+    actor_name: Optional[str] = None
+    title: str
+    summary: Optional[str] = None
+    created_at: datetime
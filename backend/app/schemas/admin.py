@@ -0,0 +1,58 @@
+"""Admin Schemas"""
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List
+
+# Patch fields backed by NOT NULL columns on users
+NOT_NULL_FIELDS = ("name", "email")
+
+
+class AdminUserPatch(BaseModel):
+    """Fields an admin may change on a user; unset fields are left untouched"""
+    user_id: int
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    student_id: Optional[str] = None
+    phone: Optional[str] = None
+    gpa: Optional[float] = Field(None, ge=0.0, le=10.0)
+    year_level: Optional[str] = None
+    branch: Optional[str] = None
+    section: Optional[str] = None
+    is_admin: Optional[int] = Field(None, ge=0, le=1)
+    github_url: Optional[str] = None
+    linkedin_url: Optional[str] = None
+    profile_image: Optional[str] = None
+    bio: Optional[str] = None
+    
+    def null_fields(self) -> List[str]:
+        """Fields explicitly set to null that the users table doesn't allow to be null"""
+        return [
+            field for field in NOT_NULL_FIELDS
+            if field in self.model_fields_set and getattr(self, field) is None
+        ]
+
+
+class EnrollmentMove(BaseModel):
+    """Move a student's enrollment to another classroom (or enroll them if they have none)"""
+    user_id: int
+    to_classroom_id: int
+
+
+class BulkAdminRequest(BaseModel):
+    dry_run: bool = False
+    user_patches: List[AdminUserPatch] = Field(default=[], max_length=10000)
+    enrollment_moves: List[EnrollmentMove] = Field(default=[], max_length=10000)
+
+
+class BulkRowResult(BaseModel):
+    kind: str  # user_patch, enrollment_move
+    index: int
+    user_id: int
+    status: str  # ok, unchanged, error
+    detail: Optional[str] = None
+
+
+class BulkAdminResponse(BaseModel):
+    dry_run: bool
+    applied: int
+    failed: int
+    results: List[BulkRowResult] = []
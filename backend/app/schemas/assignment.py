@@ -1,5 +1,5 @@
 """Assignment, Test, and Submission Schemas"""
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List, Any
 
@@ -29,10 +29,28 @@ class AssignmentResponse(BaseModel):
         from_attributes = True
 
 
+class GradeBin(BaseModel):
+    low: float  # percent of points, inclusive
+    high: float  # percent of points, exclusive except for the last bin
+    count: int
+
+
+class AssignmentStatsResponse(BaseModel):
+    assignment_id: int
+    points: float
+    submission_count: int
+    late_count: int
+    graded_count: int
+    mean: Optional[float] = None
+    median: Optional[float] = None  # within 1% of points
+    histogram: List[GradeBin] = []
+
+
 # Submission Schemas
 class SubmissionCreate(BaseModel):
     text_content: Optional[str] = None
     url: Optional[str] = None
+    upload_id: Optional[str] = None  # finished upload from /api/uploads
 
 
 class SubmissionResponse(BaseModel):
@@ -52,11 +70,50 @@ class SubmissionResponse(BaseModel):
         from_attributes = True
 
 
+class SubmissionReceipt(BaseModel):
+    """Acknowledgement for a queued submission; it is persisted shortly after"""
+    ticket: str
+    assignment_id: int
+    received_at: datetime
+    is_late: bool
+    status: str = "queued"
+
+
 class GradeSubmission(BaseModel):
     grade: float
     feedback: Optional[str] = None
 
 
+class BulkGradeEntry(BaseModel):
+    """One grade; the submission is picked by submission_id, student_id or email"""
+    submission_id: Optional[int] = None
+    student_id: Optional[str] = None
+    email: Optional[str] = None
+    grade: float = Field(..., ge=0)
+    feedback: Optional[str] = None
+
+
+class BulkGradeRequest(BaseModel):
+    dry_run: bool = False
+    grades: List[BulkGradeEntry] = Field(..., max_length=10000)
+
+
+class BulkGradeRowResult(BaseModel):
+    index: int
+    submission_id: Optional[int] = None
+    status: str  # ok, error
+    grade: Optional[float] = None  # after the late penalty
+    penalty: float = 0.0  # percent deducted
+    detail: Optional[str] = None
+
+
+class BulkGradeResponse(BaseModel):
+    dry_run: bool
+    applied: int
+    failed: int
+    results: List[BulkGradeRowResult] = []
+
+
 # Test Schemas
 class QuestionCreate(BaseModel):
     question: str
@@ -76,6 +133,27 @@ class TestCreate(BaseModel):
     questions: List[QuestionCreate] = []
 
 
+class TestQuestionsUpdate(BaseModel):
+    questions: List[QuestionCreate]
+    regrade: bool = True  # re-score existing results against the new answers
+
+
+class TestRegradeResponse(BaseModel):
+    test_id: int
+    regraded: int
+    changed: int
+
+
+class ItemAnalysis(BaseModel):
+    question_id: int
+    position: int
+    question: str
+    attempts: int
+    correct: int
+    difficulty: Optional[float] = None  # share answering correctly
+    discrimination: Optional[float] = None  # point-biserial, -1..1
+
+
 class TestResponse(BaseModel):
     id: int
     course_id: int
@@ -117,6 +195,25 @@ class TestResultResponse(BaseModel):
         from_attributes = True
 
 
+class ExamSessionResponse(BaseModel):
+    session_id: int
+    test_id: int
+    attempt_number: int
+    started_at: datetime
+    expires_at: Optional[datetime] = None  # None when the test has no time limit
+    server_time: datetime  # lets the client correct its countdown for clock skew
+    answers: dict = {}
+
+
+class ExamAnswersUpdate(BaseModel):
+    answers: dict = {}  # {question_index: answer}; a null answer clears it
+
+
+class ExamAutosaveResponse(BaseModel):
+    saved: int
+    remaining_seconds: Optional[float] = None
+
+
 class TestResultDetail(TestResultResponse):
     answers: dict = {}
     correct_answers: dict = {}
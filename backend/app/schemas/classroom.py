@@ -116,6 +116,7 @@ class MaterialCreate(BaseModel):
     type: str = "document"  # document, link, video
     url: Optional[str] = None
     description: Optional[str] = None
+    upload_id: Optional[str] = None  # finished upload from /api/uploads
 
 
 class MaterialResponse(BaseModel):
@@ -13,6 +13,7 @@ class EventBase(BaseModel):
     is_all_day: bool = False
     event_type: str = "other"
     classroom_id: Optional[int] = None
+    recurrence_rule: Optional[str] = None  # RRULE subset, see app/recurrence.py
 
 
 class EventCreate(EventBase):
@@ -27,6 +28,7 @@ class EventUpdate(BaseModel):
     end_time: Optional[datetime] = None
     is_all_day: Optional[bool] = None
     event_type: Optional[str] = None
+    recurrence_rule: Optional[str] = None
 
 
 class EventResponse(EventBase):
@@ -36,3 +38,12 @@ class EventResponse(EventBase):
     created_by: int
     created_at: datetime
     updated_at: datetime
+
+
+class EventOccurrence(EventResponse):
+    """One occurrence of an event; start_time/end_time are this occurrence's"""
+    series_start: datetime  # the first occurrence's start, identifying recurring series
+
+
+class CalendarFeedResponse(BaseModel):
+    url: str  # iCalendar subscription URL; anyone holding it can read the feed
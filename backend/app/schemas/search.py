@@ -0,0 +1,12 @@
+"""Search Schemas"""
+from typing import Optional
+from pydantic import BaseModel
+
+
+class SearchResult(BaseModel):
+    kind: str  # course, material, course_update, announcement, message
+    id: int  # of the course, material, ... row
+    classroom_id: Optional[int] = None
+    course_id: Optional[int] = None
+    title: str
+    snippet: str  # matching passage of the text
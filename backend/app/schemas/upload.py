@@ -0,0 +1,23 @@
+"""File Upload Schemas"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+
+class UploadCreate(BaseModel):
+    filename: str = Field(..., max_length=255)
+    size: int = Field(..., gt=0)
+    content_type: Optional[str] = None
+
+
+class UploadResponse(BaseModel):
+    id: str
+    filename: str
+    content_type: Optional[str] = None
+    size: int
+    offset: int = 0
+    chunk_size: int
+    sha256: Optional[str] = None
+    file_path: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
@@ -61,6 +61,14 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class UserLookupResponse(BaseModel):
+    id: int
+    name: str
+    email: str
+    student_id: Optional[str] = None
+    profile_image: Optional[str] = None
+
+
 class UserProfile(UserResponse):
     enrollments: List[dict] = []
     github_repos: List[dict] = []
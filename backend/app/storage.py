@@ -0,0 +1,332 @@
+"""Content-addressed file storage
+
+Uploads stream into STORAGE_DIR/uploads/<upload_id>.part and are hashed as the
+bytes arrive. Once complete they move to STORAGE_DIR/objects/<sha[:2]>/<sha[2:]>,
+so a file is never buffered whole in memory and identical files share one object.
+
+Each object has a stored_objects row counting the materials and submissions that
+point at it; collect_garbage() removes objects nothing references any more.
+"""
+import asyncio
+import hashlib
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import upsert
+from app.models.assignment import Submission
+from app.models.course import CourseMaterial
+from app.models.upload import StoredObject, Upload
+
+settings = get_settings()
+
+# Records whose file_path holds a reference to a stored object
+REFERENCING_MODELS = (CourseMaterial, Submission)
+GC_DELETE_CHUNK = 500
+
+HASH_BLOCK_SIZE = 1024 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024  # request body bytes handed to the writer thread at a time
+
+# Running SHA-256 per in-flight upload; rebuilt from the .part file after a restart
+_hashers: Dict[str, "hashlib._Hash"] = {}
+
+
+class UploadSizeExceeded(Exception):
+    """More bytes were sent than the upload declared"""
+
+
+def _part_path(upload_id: str) -> str:
+    return os.path.join(settings.STORAGE_DIR, "uploads", f"{upload_id}.part")
+
+
+def object_key(sha256: str) -> str:
+    """Storage-relative path of the object holding content with this hash"""
+    return os.path.join("objects", sha256[:2], sha256[2:])
+
+
+def content_hash(file_path: str) -> str:
+    """SHA-256 of a stored object, recovered from its key"""
+    head, tail = os.path.split(file_path)
+    return os.path.basename(head) + tail
+
+
+def absolute_path(file_path: str) -> str:
+    return os.path.join(settings.STORAGE_DIR, file_path)
+
+
+def received_bytes(upload_id: str) -> int:
+    """Bytes already on disk for an upload - the offset a client should resume from"""
+    try:
+        return os.path.getsize(_part_path(upload_id))
+    except FileNotFoundError:
+        return 0
+
+
+def start_upload(upload_id: str):
+    os.makedirs(os.path.dirname(_part_path(upload_id)), exist_ok=True)
+    open(_part_path(upload_id), "wb").close()
+    _hashers[upload_id] = hashlib.sha256()
+
+
+def _hasher_for(upload_id: str):
+    hasher = _hashers.get(upload_id)
+    if hasher is None:
+        hasher = hashlib.sha256()
+        with open(_part_path(upload_id), "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                hasher.update(block)
+        _hashers[upload_id] = hasher
+    return hasher
+
+
+def _write(f, hasher, pieces: List[bytes]):
+    for data in pieces:
+        f.write(data)
+        hasher.update(data)
+
+
+async def append_chunk(upload_id: str, offset: int, size: int, chunks: AsyncIterator[bytes]) -> int:
+    """Append a streamed chunk at offset, hashing on the fly; returns the new offset
+    
+    offset must equal received_bytes(upload_id) - callers check it first. Writing,
+    hashing and rehashing a resumed upload run in a worker thread, so they never
+    block the event loop.
+    """
+    hasher = await asyncio.to_thread(_hasher_for, upload_id)
+    try:
+        with open(_part_path(upload_id), "ab") as f:
+            pieces, buffered = [], 0
+            async for data in chunks:
+                if offset + buffered + len(data) > size:
+                    raise UploadSizeExceeded()
+                pieces.append(data)
+                buffered += len(data)
+                if buffered >= WRITE_BUFFER_SIZE:
+                    await asyncio.to_thread(_write, f, hasher, pieces)
+                    offset += buffered
+                    pieces, buffered = [], 0
+            if pieces:
+                await asyncio.to_thread(_write, f, hasher, pieces)
+                offset += buffered
+    except BaseException:
+        # Whatever reached the disk stays resumable; rehash it on the next chunk
+        _hashers.pop(upload_id, None)
+        raise
+    return offset
+
+
+def finish_upload(upload_id: str) -> Tuple[str, str]:
+    """Move a complete upload into the object store; returns (sha256, file_path)
+    
+    May rehash the whole file and moves it on disk, so async callers run it in a thread.
+    """
+    sha256 = _hasher_for(upload_id).hexdigest()
+    _hashers.pop(upload_id, None)
+    
+    file_path = object_key(sha256)
+    destination = absolute_path(file_path)
+    if os.path.exists(destination):
+        # Same content already stored - keep the existing object
+        os.remove(_part_path(upload_id))
+    else:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(_part_path(upload_id), destination)
+    return sha256, file_path
+
+
+def register_object(db: Session, sha256: str, size: int):
+    """Record a finished upload's object, restarting its GC grace if it already exists"""
+    now = datetime.utcnow()
+    db.execute(
+        upsert(StoredObject)
+        .values(sha256=sha256, size=size, ref_count=0, created_at=now, last_uploaded_at=now)
+        .on_conflict_do_update(index_elements=[StoredObject.sha256], set_={"last_uploaded_at": now})
+    )
+
+
+def move_reference(db: Session, old_file_path: Optional[str], new_file_path: Optional[str]):
+    """Move one record's reference from old_file_path to new_file_path; either may be None"""
+    if old_file_path == new_file_path:
+        return
+    for file_path, delta in ((old_file_path, -1), (new_file_path, 1)):
+        if file_path:
+            db.execute(
+                update(StoredObject)
+                .where(StoredObject.sha256 == content_hash(file_path))
+                .values(ref_count=StoredObject.ref_count + delta)
+            )
+
+
+def adjust_references(db: Session, deltas: Dict[str, int]):
+    """Apply net reference changes for many file paths in one executemany UPDATE"""
+    params = [
+        {"sha": content_hash(file_path), "delta": delta}
+        for file_path, delta in deltas.items() if file_path and delta
+    ]
+    if params:
+        table = StoredObject.__table__
+        db.connection().execute(
+            update(table).where(table.c.sha256 == bindparam("sha")).values(
+                ref_count=table.c.ref_count + bindparam("delta")
+            ),
+            params
+        )
+
+
+def storage_report(db: Session) -> dict:
+    """Disk actually used versus what storing every reference separately would take"""
+    objects, stored_bytes, referenced_objects, unique_bytes, logical_bytes = db.query(
+        func.count(StoredObject.sha256),
+        func.coalesce(func.sum(StoredObject.size), 0),
+        func.count(StoredObject.sha256).filter(StoredObject.ref_count > 0),
+        func.coalesce(func.sum(StoredObject.size).filter(StoredObject.ref_count > 0), 0),
+        func.coalesce(func.sum(StoredObject.size * StoredObject.ref_count), 0)
+    ).one()
+    return {
+        "objects": objects,
+        "referenced_objects": referenced_objects,
+        "stored_bytes": stored_bytes,
+        "logical_bytes": logical_bytes,
+        "bytes_saved": logical_bytes - unique_bytes
+    }
+
+
+def _reference_counts(db: Session) -> Counter:
+    counts = Counter()
+    for model in REFERENCING_MODELS:
+        rows = db.query(model.file_path, func.count(model.id)).filter(
+            model.file_path.isnot(None)
+        ).group_by(model.file_path)
+        for file_path, count in rows:
+            counts[content_hash(file_path)] += count
+    return counts
+
+
+def _remove(path: str) -> int:
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+def _last_chunk_at(upload_id: str) -> float:
+    try:
+        return os.path.getmtime(_part_path(upload_id))
+    except FileNotFoundError:
+        return 0.0
+
+
+def collect_garbage(db: Session, dry_run: bool = False) -> dict:
+    """Reconcile reference counts and delete what nothing points at
+    
+    Counts are rebuilt from the referencing records, so drift from crashes or
+    direct SQL edits is repaired. Objects with no references, object files with no
+    row, and abandoned .part uploads are removed once they are older than
+    STORAGE_GC_GRACE_HOURS - the grace covers uploads that finished but have not
+    been attached to a material or submission yet.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=settings.STORAGE_GC_GRACE_HOURS)
+    counts = _reference_counts(db)
+    rows = {
+        row.sha256: row for row in db.query(
+            StoredObject.sha256, StoredObject.size, StoredObject.ref_count, StoredObject.last_uploaded_at
+        )
+    }
+    
+    # Referenced files from before reference counting have no row yet
+    missing = [sha for sha in counts if sha not in rows and os.path.isfile(absolute_path(object_key(sha)))]
+    corrected = [
+        {"sha": sha, "seen": row.ref_count, "counted": counts[sha]}
+        for sha, row in rows.items() if row.ref_count != counts[sha]
+    ]
+    collectable = [
+        sha for sha, row in rows.items()
+        if counts[sha] == 0 and row.last_uploaded_at and row.last_uploaded_at < cutoff
+    ]
+    
+    # Object files on disk that no row accounts for, e.g. a crash between move and commit
+    orphans = []
+    objects_dir = os.path.join(settings.STORAGE_DIR, "objects")
+    for directory, _, names in os.walk(objects_dir):
+        for name in names:
+            sha = os.path.basename(directory) + name
+            path = os.path.join(directory, name)
+            if sha not in rows and sha not in counts and os.path.getmtime(path) < cutoff.timestamp():
+                orphans.append(path)
+    
+    # Unfinished uploads nobody has sent a chunk to within the grace period
+    stale_uploads = [
+        upload_id for upload_id, in db.query(Upload.id).filter(
+            Upload.completed_at.is_(None),
+            Upload.created_at < cutoff
+        )
+        if _last_chunk_at(upload_id) < cutoff.timestamp()
+    ]
+    
+    result = {
+        "dry_run": dry_run,
+        "refs_corrected": len(corrected) + len(missing),
+        "objects_removed": len(collectable) + len(orphans),
+        "stale_uploads_removed": len(stale_uploads),
+        "bytes_reclaimed": sum(rows[sha].size for sha in collectable)
+                           + sum(os.path.getsize(path) for path in orphans)
+                           + sum(received_bytes(upload_id) for upload_id in stale_uploads)
+    }
+    if dry_run:
+        return result
+    
+    for sha in missing:
+        db.execute(
+            upsert(StoredObject)
+            .values(sha256=sha, size=os.path.getsize(absolute_path(object_key(sha))),
+                    ref_count=counts[sha], created_at=cutoff, last_uploaded_at=cutoff)
+            .on_conflict_do_nothing()
+        )
+    if corrected:
+        # Only where the count is still the one read above: an attach or detach
+        # committed since then has moved it, and the next pass reconciles it
+        table = StoredObject.__table__
+        db.connection().execute(
+            update(table).where(
+                table.c.sha256 == bindparam("sha"),
+                table.c.ref_count == bindparam("seen")
+            ).values(ref_count=bindparam("counted")),
+            corrected
+        )
+    
+    for start in range(0, len(collectable), GC_DELETE_CHUNK):
+        chunk = collectable[start:start + GC_DELETE_CHUNK]
+        # Re-check inside the DELETE so an object attached since the count survives
+        deleted = db.execute(
+            delete(StoredObject)
+            .where(
+                StoredObject.sha256.in_(chunk),
+                StoredObject.ref_count == 0,
+                StoredObject.last_uploaded_at < cutoff
+            )
+            .returning(StoredObject.sha256)
+        ).scalars().all()
+        db.commit()
+        for sha in deleted:
+            _remove(absolute_path(object_key(sha)))
+    
+    for path in orphans:
+        _remove(path)
+    
+    for start in range(0, len(stale_uploads), GC_DELETE_CHUNK):
+        chunk = stale_uploads[start:start + GC_DELETE_CHUNK]
+        db.execute(delete(Upload).where(Upload.id.in_(chunk), Upload.completed_at.is_(None)))
+        db.commit()
+        for upload_id in chunk:
+            _hashers.pop(upload_id, None)
+            _remove(_part_path(upload_id))
+    
+    db.commit()
+    return result
@@ -0,0 +1,239 @@
+"""Queued submission ingestion
+
+At a deadline the whole class submits within the same minute, and one SQLite
+write transaction per submission queues every request behind the write lock.
+In queued mode a submission is stamped with its receipt time, fsynced to an
+append-only journal and acknowledged; a background writer then persists the
+backlog in batched transactions.
+
+is_late is decided from the receipt time, not from when the writer gets to the
+row, so queueing never makes an on-time submission late. Like the write-behind
+counters, each worker journals to its own file and flushes one batch at a time
+(see journals); a flush rotates it aside, applies the batch and deletes the
+rotated file, and the journals of exited workers are replayed on startup.
+Applying an entry is idempotent and never overwrites a submission received
+later, so a replay after a crash is harmless.
+
+When a batch fails for any reason other than the database being unreachable,
+its entries are retried one at a time, so a single bad entry can't hold back the
+rest of the queue. This is also how a batch racing the direct submit endpoint
+recovers: uq_submission_assignment_user rejects the second row, and the retry
+finds the stored one and updates it. Entries that still fail are parked in
+{journal}.rejected, one JSON line each, for an administrator to look at.
+"""
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app import assignment_stats, storage
+from app.config import get_settings
+from app.database import SessionLocal
+from app.journals import ProcessJournals
+from app.models.assignment import Assignment, Submission
+
+settings = get_settings()
+
+IN_CLAUSE_CHUNK = 500
+
+
+class SubmissionQueue:
+    def __init__(self, journal_path: str):
+        self.journals = ProcessJournals(journal_path, self._replay)
+        self.pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._task = None
+        self._wake: Optional[asyncio.Event] = None
+    
+    def enqueue(
+        self,
+        assignment_id: int,
+        user_id: int,
+        received_at: datetime,
+        text_content: Optional[str] = None,
+        url: Optional[str] = None,
+        file_path: Optional[str] = None
+    ) -> str:
+        """Durably record a submission; returns a ticket id once it is on disk"""
+        entry = {
+            "ticket": uuid.uuid4().hex,
+            "assignment_id": assignment_id,
+            "user_id": user_id,
+            "received_at": received_at.isoformat(),
+            "text_content": text_content,
+            "url": url,
+            "file_path": file_path
+        }
+        with self._lock:
+            self.journals.write(json.dumps(entry) + "\n", sync=True)
+            self.pending.append(entry)
+            backlog = len(self.pending)
+        
+        if backlog >= settings.SUBMISSION_QUEUE_BATCH and self._wake is not None:
+            self._wake.set()
+        return entry["ticket"]
+    
+    def _apply(self, entries: List[dict]):
+        # Only the latest receipt per student matters
+        latest = {}
+        for entry in entries:
+            entry_time = datetime.fromisoformat(entry["received_at"])
+            key = (entry["assignment_id"], entry["user_id"])
+            if key not in latest or entry_time >= latest[key][0]:
+                latest[key] = (entry_time, entry)
+        
+        db = SessionLocal()
+        try:
+            user_ids_by_assignment = {}
+            for assignment_id, user_id in latest:
+                user_ids_by_assignment.setdefault(assignment_id, []).append(user_id)
+            due_dates = dict(db.query(Assignment.id, Assignment.due_date).filter(
+                Assignment.id.in_(list(user_ids_by_assignment))
+            ))
+            
+            existing = {}
+            for assignment_id, user_ids in user_ids_by_assignment.items():
+                for i in range(0, len(user_ids), IN_CLAUSE_CHUNK):
+                    rows = db.query(
+                        Submission.id, Submission.user_id, Submission.submission_time, Submission.file_path,
+                        Submission.is_late
+                    ).filter(
+                        Submission.assignment_id == assignment_id,
+                        Submission.user_id.in_(user_ids[i:i + IN_CLAUSE_CHUNK])
+                    )
+                    for row in rows:
+                        existing[(assignment_id, row.user_id)] = row
+            
+            inserts, updates = [], []
+            reference_deltas = Counter()
+            added, late_deltas = Counter(), Counter()
+            for key, (received_at, entry) in latest.items():
+                due_date = due_dates.get(entry["assignment_id"])
+                if due_date is None:
+                    continue  # assignment was deleted after the submission was accepted
+                values = {
+                    "text_content": entry["text_content"],
+                    "url": entry["url"],
+                    "file_path": entry["file_path"],
+                    "submission_time": received_at,
+                    "is_late": received_at > due_date
+                }
+                row = existing.get(key)
+                if row is None:
+                    inserts.append({"assignment_id": entry["assignment_id"], "user_id": entry["user_id"], **values})
+                    added[entry["assignment_id"]] += 1
+                    late_deltas[entry["assignment_id"]] += int(values["is_late"])
+                elif row.submission_time is None or row.submission_time <= received_at:
+                    updates.append({"id": row.id, **values})
+                    reference_deltas[row.file_path] -= 1
+                    late_deltas[entry["assignment_id"]] += int(values["is_late"]) - int(bool(row.is_late))
+                else:
+                    continue  # a newer submission is already stored
+                reference_deltas[entry["file_path"]] += 1
+            
+            if inserts:
+                db.execute(insert(Submission), inserts)
+            if updates:
+                db.execute(update(Submission), updates)
+            storage.adjust_references(db, reference_deltas)
+            for assignment_id in added.keys() | late_deltas.keys():
+                assignment_stats.record_submissions(db, assignment_id, added[assignment_id], late_deltas[assignment_id])
+            db.commit()
+        finally:
+            db.close()
+    
+    def _apply_isolating(self, entries: List[dict]):
+        """_apply, falling back to one entry at a time and parking the ones that fail"""
+        try:
+            self._apply(entries)
+            return
+        except (OperationalError, InterfaceError):
+            raise  # database unavailable; retry the whole batch later
+        except Exception as e:
+            if len(entries) == 1:
+                self._park(entries, e)
+                return
+        
+        for entry in entries:
+            try:
+                self._apply([entry])
+            except (OperationalError, InterfaceError):
+                raise
+            except Exception as e:
+                self._park([entry], e)
+    
+    def _park(self, entries: List[dict], error):
+        print(f"Parking {len(entries)} submission(s) that can't be applied: {error}")
+        with open(self.journals.base_path + ".rejected", "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def flush(self):
+        """Persist everything queued in one transaction; returns entries written"""
+        return self.journals.flush(self._lock, self._take, self._apply_isolating, self._restore, sync=True)
+    
+    def _take(self) -> List[dict]:
+        batch, self.pending = self.pending, []
+        return batch
+    
+    def _restore(self, batch: List[dict]):
+        self.pending[:0] = batch
+    
+    def _replay(self, paths):
+        entries = []
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        pass  # a torn final line was never acknowledged
+        if entries:
+            self._apply_isolating(entries)
+        return len(entries)
+    
+    def recover(self):
+        """Persist submissions journaled by workers that crashed or shut down uncleanly"""
+        return self.journals.recover()
+    
+    async def _write_periodically(self, interval: float):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"Submission queue flush failed, will retry: {e}")
+    
+    def start(self, interval: float):
+        replayed = self.recover()
+        if replayed:
+            print(f"🔁 Persisted {replayed} journaled submissions")
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._write_periodically(interval))
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wake = None
+        await asyncio.to_thread(self.flush)
+
+
+submission_queue = SubmissionQueue(settings.SUBMISSION_QUEUE_PATH)
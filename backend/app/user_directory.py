@@ -0,0 +1,253 @@
+"""User typeahead
+
+An in-memory prefix index over every user's name (each word and the whole
+name), email and student id, plus who is enrolled where, so looking up a
+classmate to message never touches the database. The index is one sorted list
+of (key, user_id); a prefix is a contiguous slice found with two binary
+searches.
+
+Lookups only return users who share a classroom with the caller. A query walks
+whichever is smaller: the slice of keys matching the prefix, filtered to the
+caller's classmates, or the classmates' own keys. A one-letter query over 50k
+users is bounded by the classmates; a precise query by its few matching keys.
+
+Commits made through this process's sessions are applied as they happen: user
+and enrollment rows written through the ORM are picked up by session hooks, and
+routers that write them with Core statements call reload_users. Writes made by
+other workers show up at the next periodic rebuild.
+"""
+import asyncio
+import bisect
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from app.database import SessionLocal
+from app.models.user import User
+from app.models.classroom import ClassroomEnrollment
+
+INDEXED_FIELDS = ("name", "email", "student_id", "profile_image")
+_END = "\U0010ffff"
+
+
+@dataclass(frozen=True)
+class DirectoryEntry:
+    id: int
+    name: str
+    email: str
+    student_id: Optional[str]
+    profile_image: Optional[str]
+    
+    def keys(self) -> Set[str]:
+        name = (self.name or "").lower()
+        keys = {name, *name.split(), (self.email or "").lower()}
+        if self.student_id:
+            keys.add(self.student_id.lower())
+        keys.discard("")
+        return keys
+
+
+class UserDirectory:
+    def __init__(self):
+        self._entries: Dict[int, DirectoryEntry] = {}
+        self._keys: List[Tuple[str, int]] = []
+        self._members: Dict[int, Set[int]] = defaultdict(set)  # classroom_id -> user ids
+        self._classrooms: Dict[int, Set[int]] = defaultdict(set)  # user_id -> classroom ids
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._replay: Optional[list] = None  # changes made while a rebuild was reading
+        self._task = None
+    
+    def _put(self, entry: DirectoryEntry):
+        self._drop(entry.id)
+        self._entries[entry.id] = entry
+        for key in entry.keys():
+            bisect.insort(self._keys, (key, entry.id))
+    
+    def _drop(self, user_id: int):
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            for key in old.keys():
+                index = bisect.bisect_left(self._keys, (key, user_id))
+                if index < len(self._keys) and self._keys[index] == (key, user_id):
+                    del self._keys[index]
+    
+    def _set_classrooms(self, user_id: int, classroom_ids: Iterable[int]):
+        for classroom_id in self._classrooms.pop(user_id, ()):
+            self._members[classroom_id].discard(user_id)
+        for classroom_id in classroom_ids:
+            self._members[classroom_id].add(user_id)
+            self._classrooms[user_id].add(classroom_id)
+    
+    def _apply(self, changes: list):
+        for change in changes:
+            kind, user_id, value = change
+            if kind == "user":
+                self._put(value)
+            elif kind == "removed":
+                self._drop(user_id)
+                self._set_classrooms(user_id, ())
+            elif kind == "joined":
+                self._members[value].add(user_id)
+                self._classrooms[user_id].add(value)
+            elif kind == "left":
+                self._members[value].discard(user_id)
+                self._classrooms[user_id].discard(value)
+            elif kind == "classrooms":
+                self._set_classrooms(user_id, value)
+    
+    def apply(self, changes: list):
+        """Apply [(kind, user_id, value)] changes that have been committed"""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.extend(changes)
+            if self._loaded:
+                self._apply(changes)
+    
+    def reload_users(self, db: Session, user_ids: Iterable[int]):
+        """Re-read users and their enrollments after a Core write the hooks can't see"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        users = db.query(
+            User.id, User.name, User.email, User.student_id, User.profile_image
+        ).filter(User.id.in_(user_ids)).all()
+        classrooms = defaultdict(set)
+        for user_id, classroom_id in db.query(ClassroomEnrollment.user_id, ClassroomEnrollment.classroom_id).filter(
+            ClassroomEnrollment.user_id.in_(user_ids)
+        ):
+            classrooms[user_id].add(classroom_id)
+        
+        found = {row.id for row in users}
+        self.apply(
+            [("user", row.id, DirectoryEntry(*row)) for row in users]
+            + [("classrooms", user_id, classrooms[user_id]) for user_id in found]
+            + [("removed", user_id, None) for user_id in user_ids - found]
+        )
+    
+    def load(self):
+        """Rebuild the whole index from the database"""
+        with self._lock:
+            self._replay = []
+        try:
+            db = SessionLocal()
+            try:
+                users = db.query(User.id, User.name, User.email, User.student_id, User.profile_image).all()
+                enrollments = db.query(ClassroomEnrollment.user_id, ClassroomEnrollment.classroom_id).all()
+            finally:
+                db.close()
+            
+            entries = {row.id: DirectoryEntry(*row) for row in users}
+            keys = sorted((key, user_id) for user_id, entry in entries.items() for key in entry.keys())
+            members, classrooms = defaultdict(set), defaultdict(set)
+            for user_id, classroom_id in enrollments:
+                members[classroom_id].add(user_id)
+                classrooms[user_id].add(classroom_id)
+            
+            with self._lock:
+                self._entries, self._keys, self._members, self._classrooms = entries, keys, members, classrooms
+                # Changes committed while we were reading may be missing from what we read
+                self._apply(self._replay)
+                self._loaded = True
+        finally:
+            with self._lock:
+                self._replay = None
+    
+    def lookup(self, user_id: int, query: str, limit: int) -> List[DirectoryEntry]:
+        """Classmates of user_id with a name word, name, email or student id starting with query"""
+        prefix = " ".join(query.lower().split())
+        if not prefix:
+            return []
+        if not self._loaded:
+            self.load()
+        
+        with self._lock:
+            classmates = set()
+            for classroom_id in self._classrooms.get(user_id, ()):
+                classmates |= self._members[classroom_id]
+            classmates.discard(user_id)
+            if not classmates:
+                return []
+            
+            lo = bisect.bisect_left(self._keys, (prefix,))
+            hi = bisect.bisect_left(self._keys, (prefix + _END,))
+            found: Dict[int, str] = {}  # user_id -> first key that matched
+            if hi - lo <= len(classmates) * 4:
+                # Keys come out in order, so the first `limit` users found are the answer
+                for key, match_id in self._keys[lo:hi]:
+                    if match_id in classmates and match_id not in found:
+                        found[match_id] = key
+                        if len(found) == limit:
+                            break
+            else:
+                for match_id in classmates:
+                    entry = self._entries.get(match_id)
+                    keys = [key for key in entry.keys() if key.startswith(prefix)] if entry else []
+                    if keys:
+                        found[match_id] = min(keys)
+            
+            best = sorted(found.items(), key=lambda item: (item[1], item[0]))[:limit]
+            return [self._entries[match_id] for match_id, _ in best]
+    
+    async def _reload_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as e:
+                print(f"User directory rebuild failed, will retry: {e}")
+    
+    def start(self, interval: float):
+        self.load()
+        self._task = asyncio.create_task(self._reload_periodically(interval))
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+user_directory = UserDirectory()
+
+
+def _entry(user: User) -> DirectoryEntry:
+    return DirectoryEntry(user.id, *(getattr(user, field) for field in INDEXED_FIELDS))
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault("user_directory", [])
+    for obj in session.new:
+        if isinstance(obj, User):
+            changes.append(("user", obj.id, _entry(obj)))
+        elif isinstance(obj, ClassroomEnrollment):
+            changes.append(("joined", obj.user_id, obj.classroom_id))
+    for obj in session.dirty:
+        if isinstance(obj, User) and any(get_history(obj, f).has_changes() for f in INDEXED_FIELDS):
+            changes.append(("user", obj.id, _entry(obj)))
+        elif isinstance(obj, ClassroomEnrollment) and get_history(obj, "classroom_id").has_changes():
+            for classroom_id in get_history(obj, "classroom_id").deleted:
+                changes.append(("left", obj.user_id, classroom_id))
+            changes.append(("joined", obj.user_id, obj.classroom_id))
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changes.append(("removed", obj.id, None))
+        elif isinstance(obj, ClassroomEnrollment):
+            changes.append(("left", obj.user_id, obj.classroom_id))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_changes(session):
+    changes = session.info.pop("user_directory", None)
+    if changes:
+        user_directory.apply(changes)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("user_directory", None)
@@ -0,0 +1,218 @@
+"""Benchmark: serialization cost of large list responses.
+
+Seeds a conversation of MESSAGES messages, a classroom with ANNOUNCEMENTS
+announcements and ADMIN_ROWS users, then for each endpoint times turning the
+same rows into a response body two ways:
+
+  model  the previous path: a Pydantic model per row, FastAPI's response_model
+         validation and serialization, rendered by JSONResponse
+  fast   the rows as dicts, rendered by FastJSONResponse (orjson if installed)
+
+and checks both produce the same JSON. Also reports the latency of the
+endpoints themselves through HTTP.
+
+Runs in-process against a throwaway database:
+    python benchmark_serialization.py
+    MESSAGES=500 ANNOUNCEMENTS=100 python benchmark_serialization.py   # quick run
+"""
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+WORK_DIR = os.path.join(tempfile.gettempdir(), "rvsync_benchmark_serialization")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'rvsync.db')}"
+os.environ["STORAGE_DIR"] = os.path.join(WORK_DIR, "storage")
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from sqlalchemy import insert, or_
+
+from app.main import app
+from app.database import SessionLocal, init_db
+from app.fast_json import FastJSONResponse, orjson, row_dicts
+from app.models.user import User
+from app.models.classroom import Classroom, ClassroomEnrollment
+from app.models.chat import Announcement, AnnouncementRead, ChatMessage
+from app.routers.admin import ADMIN_MAX_PAGE_SIZE, _user_rows, _user_to_dict
+from app.routers.auth import create_access_token
+from app.schemas.chat import AnnouncementResponse, MessageResponse
+
+MESSAGES = int(os.environ.get("MESSAGES", 5000))
+ANNOUNCEMENTS = int(os.environ.get("ANNOUNCEMENTS", 100))
+ADMIN_ROWS = int(os.environ.get("ADMIN_ROWS", ADMIN_MAX_PAGE_SIZE))
+ROUNDS = int(os.environ.get("ROUNDS", 50))
+
+
+def seed():
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+    os.makedirs(WORK_DIR)
+    init_db()
+    
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"email": f"bench{i}@rvce.edu.in", "password_hash": "x", "name": f"Student {i}", "is_admin": i == 0}
+            for i in range(max(ADMIN_ROWS, 2))
+        ])
+        classroom = Classroom(name="Benchmark Section", code="BENCH", created_by=1)
+        db.add(classroom)
+        db.flush()
+        db.add_all([
+            ClassroomEnrollment(classroom_id=classroom.id, user_id=1, role="instructor"),
+            ClassroomEnrollment(classroom_id=classroom.id, user_id=2, role="student")
+        ])
+        
+        start = datetime.utcnow() - timedelta(days=30)
+        db.execute(insert(ChatMessage), [
+            {
+                "from_user_id": 1 + i % 2, "to_user_id": 2 - i % 2, "message": f"Message number {i} about the lab",
+                "message_type": "text", "is_read": True, "created_at": start + timedelta(seconds=i * 37)
+            }
+            for i in range(MESSAGES)
+        ])
+        db.execute(insert(Announcement), [
+            {
+                "classroom_id": classroom.id, "user_id": 1, "title": f"Announcement {i}",
+                "content": "Lab submissions close on Friday. " * 10, "priority": "normal",
+                "is_pinned": i % 25 == 0, "created_at": start + timedelta(hours=i)
+            }
+            for i in range(ANNOUNCEMENTS)
+        ])
+        db.execute(insert(AnnouncementRead), [
+            {"announcement_id": i, "user_id": 2} for i in range(1, ANNOUNCEMENTS + 1, 3)
+        ])
+        db.commit()
+        return classroom.id
+    finally:
+        db.close()
+
+
+def conversation_rows(db):
+    return db.query(
+        ChatMessage.id, ChatMessage.from_user_id, ChatMessage.to_user_id, ChatMessage.message,
+        ChatMessage.message_type, ChatMessage.is_read, ChatMessage.created_at,
+        User.name.label("sender_name")
+    ).outerjoin(User, User.id == ChatMessage.from_user_id).filter(
+        or_(
+            (ChatMessage.from_user_id == 1) & (ChatMessage.to_user_id == 2),
+            (ChatMessage.from_user_id == 2) & (ChatMessage.to_user_id == 1)
+        )
+    ).order_by(ChatMessage.created_at).all()
+
+
+def announcement_rows(db, classroom_id):
+    return db.query(
+        Announcement.id, Announcement.classroom_id, Announcement.user_id, Announcement.title,
+        Announcement.content, Announcement.priority, Announcement.is_pinned, Announcement.created_at,
+        User.name.label("author_name"),
+        AnnouncementRead.id.isnot(None).label("is_read")
+    ).outerjoin(User, User.id == Announcement.user_id).outerjoin(
+        AnnouncementRead, (AnnouncementRead.announcement_id == Announcement.id) & (AnnouncementRead.user_id == 2)
+    ).filter(Announcement.classroom_id == classroom_id).order_by(
+        Announcement.is_pinned.desc(), Announcement.created_at.desc(), Announcement.id.desc()
+    ).limit(ANNOUNCEMENTS).all()
+
+
+def response_field(path):
+    return next(route.response_field for route in app.routes if getattr(route, "path", None) == path)
+
+
+async def model_body(rows, model, field):
+    """What a response_model endpoint returning a model per row used to cost"""
+    content = [model(**row._asdict()) for row in rows]
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def dict_body(content):
+    """What an endpoint returning plain dicts used to cost"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+async def time_body(build):
+    timings = []
+    for _ in range(ROUNDS):
+        began = time.perf_counter()
+        body = build()
+        if asyncio.iscoroutine(body):
+            body = await body
+        timings.append(time.perf_counter() - began)
+    return statistics.median(timings), body
+
+
+async def time_requests(client, url, headers):
+    timings = []
+    for _ in range(ROUNDS):
+        began = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        timings.append(time.perf_counter() - began)
+    return statistics.median(timings)
+
+
+async def run():
+    classroom_id = seed()
+    print(f"Seeded {MESSAGES} messages, {ANNOUNCEMENTS} announcements, {ADMIN_ROWS} users")
+    print(f"FastJSONResponse encodes with {'orjson' if orjson is not None else 'the json module'}")
+    
+    db = SessionLocal()
+    try:
+        messages = conversation_rows(db)
+        announcements = announcement_rows(db, classroom_id)
+        users = db.execute(_user_rows(0, ADMIN_ROWS)).all()
+    finally:
+        db.close()
+    
+    cases = [
+        (
+            "get_conversation", len(messages),
+            lambda: model_body(messages, MessageResponse, response_field("/api/messages/conversation/{user1_id}/{user2_id}")),
+            lambda: FastJSONResponse(row_dicts(messages)).body
+        ),
+        (
+            "list_announcements", len(announcements),
+            lambda: model_body(announcements, AnnouncementResponse, response_field("/api/announcement/list/{classroom_id}")),
+            lambda: FastJSONResponse(row_dicts(announcements)).body
+        ),
+        (
+            "admin list_users", len(users),
+            lambda: dict_body({"items": [_user_to_dict(row) for row in users], "next_after_id": None}),
+            lambda: FastJSONResponse({"items": [_user_to_dict(row) for row in users], "next_after_id": None}).body
+        ),
+    ]
+    
+    ok = True
+    print(f"{'endpoint':>20} {'rows':>6} {'model':>10} {'fast':>10} {'speedup':>8}")
+    for name, count, slow, fast in cases:
+        model_time, model = await time_body(slow)
+        fast_time, body = await time_body(fast)
+        same = json.loads(model) == json.loads(body)
+        ok = ok and same
+        print(
+            f"{name:>20} {count:>6} {model_time * 1000:>8.2f}ms {fast_time * 1000:>8.2f}ms "
+            f"{model_time / fast_time:>7.1f}x{'' if same else '  BODIES DIFFER'}"
+        )
+    
+    transport = httpx.ASGITransport(app=app)
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': '1'})}"}
+    student = {"Authorization": f"Bearer {create_access_token({'sub': '2'})}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for name, url, headers in [
+            ("get_conversation", "/api/messages/conversation/1/2", student),
+            ("list_announcements", f"/api/announcement/list/{classroom_id}?limit=100", student),
+            ("get_admin_stats", "/api/admin/stats", admin),
+            ("admin list_users", f"/api/admin/users?limit={ADMIN_ROWS}", admin),
+        ]:
+            print(f"{name:>20} over HTTP: p50={await time_requests(client, url, headers) * 1000:.2f}ms")
+    
+    print("SUCCESS" if ok else "FAILURE")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,119 @@
+"""Load test: concurrent enrollment into a single classroom.
+
+Fires TOTAL_REQUESTS simultaneous enrollments from distinct students at one
+classroom with SEATS seats and checks that exactly SEATS succeed, the rest are
+rejected cleanly, and latency stays bounded.
+
+Runs against a throwaway SQLite database so it never touches rvsync.db:
+    python load_test_enrollment.py
+"""
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "rvsync_loadtest_enrollment.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import SessionLocal, init_db
+from app.models.user import User
+from app.models.classroom import Classroom, ClassroomEnrollment
+from app.routers.auth import create_access_token
+
+TOTAL_REQUESTS = 1000
+SEATS = 60
+WORKERS = 64
+MAX_P99_SECONDS = 2.0
+
+_local = threading.local()
+
+
+def seed():
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+    init_db()
+    
+    db = SessionLocal()
+    try:
+        instructor = User(email="loadtest-faculty@rvce.edu.in", password_hash="x", name="Load Test Faculty")
+        db.add(instructor)
+        db.commit()
+        
+        classroom = Classroom(
+            name="Load Test Section",
+            code="LOADTEST-1A",
+            max_students=SEATS,
+            created_by=instructor.id
+        )
+        db.add(classroom)
+        db.commit()
+        db.add(ClassroomEnrollment(classroom_id=classroom.id, user_id=instructor.id, role="instructor"))
+        
+        students = [
+            User(email=f"loadtest-{i}@rvce.edu.in", password_hash="x", name=f"Student {i}")
+            for i in range(TOTAL_REQUESTS)
+        ]
+        db.add_all(students)
+        db.commit()
+        
+        return classroom.id, [create_access_token({"sub": str(s.id)}) for s in students]
+    finally:
+        db.close()
+
+
+def enroll(classroom_id, token):
+    client = getattr(_local, "client", None)
+    if client is None:
+        client = _local.client = TestClient(app)
+    start = time.perf_counter()
+    response = client.post(
+        f"/api/classroom/{classroom_id}/enroll",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    return response.status_code, response.json().get("detail"), time.perf_counter() - start
+
+
+def run():
+    classroom_id, tokens = seed()
+    print(f"Seeded classroom {classroom_id} with {SEATS} seats and {len(tokens)} students")
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        results = list(pool.map(lambda t: enroll(classroom_id, t), tokens))
+    elapsed = time.perf_counter() - start
+    
+    succeeded = sum(1 for status, _, _ in results if status == 200)
+    full = sum(1 for status, detail, _ in results if status == 400 and detail == "Classroom is full")
+    errors = [(status, detail) for status, detail, _ in results if status not in (200, 400)]
+    latencies = sorted(latency for _, _, latency in results)
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    
+    db = SessionLocal()
+    try:
+        stored = db.query(ClassroomEnrollment).filter(
+            ClassroomEnrollment.classroom_id == classroom_id,
+            ClassroomEnrollment.role == "student"
+        ).count()
+    finally:
+        db.close()
+    
+    print(f"Requests: {len(results)} in {elapsed:.2f}s ({len(results) / elapsed:.0f} req/s)")
+    print(f"Enrolled: {succeeded}, rejected as full: {full}, unexpected: {len(errors)}")
+    print(f"Stored student enrollments: {stored}")
+    print(f"Latency p50={p50 * 1000:.1f}ms p99={p99 * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms")
+    
+    ok = succeeded == SEATS and stored == SEATS and full == TOTAL_REQUESTS - SEATS and not errors and p99 <= MAX_P99_SECONDS
+    print("SUCCESS" if ok else "FAILURE")
+    if errors:
+        print(f"First unexpected responses: {errors[:5]}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,204 @@
+"""Benchmark: a class sitting the same timed test.
+
+TAKERS students start a one-minute test within the first few seconds, autosave
+each of QUESTIONS answers over the following minute and submit just before the
+deadline; SILENT_FRACTION of them never submit and are left to the deadline
+sweeper. Reports start, autosave and submit latency, how many writes the
+autosave buffer coalesced the saves into, and checks that every attempt was
+graded on exactly the answers saved before its deadline.
+
+Runs in-process against a throwaway database:
+    python load_test_exam_sessions.py
+    TAKERS=200 python load_test_exam_sessions.py   # quick run
+"""
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+WORK_DIR = os.path.join(tempfile.gettempdir(), "rvsync_loadtest_exams")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'rvsync.db')}"
+os.environ["STORAGE_DIR"] = os.path.join(WORK_DIR, "storage")
+os.environ.setdefault("EXAM_DEADLINE_GRACE_SECONDS", "2")
+os.environ.setdefault("EXAM_SWEEP_INTERVAL", "1")
+
+import httpx
+
+from app.main import app
+from app.config import get_settings
+from app.database import SessionLocal, init_db
+from app.models.user import User
+from app.models.classroom import Classroom, ClassroomEnrollment
+from app.models.course import Course
+from app.models.assignment import Test, TestResult
+from app import answer_keys
+from app.exam_sessions import exam_sessions, _merge
+from app.routers.auth import create_access_token
+
+TAKERS = int(os.environ.get("TAKERS", 1500))
+QUESTIONS = int(os.environ.get("QUESTIONS", 10))
+SILENT_FRACTION = 0.2
+TIME_LIMIT = 60  # seconds; Test.time_limit is whole minutes
+START_WINDOW = 5.0
+OPTIONS = ["a", "b", "c", "d"]
+
+
+def seed():
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+    os.makedirs(WORK_DIR)
+    init_db()
+    
+    db = SessionLocal()
+    try:
+        instructor = User(email="loadtest-faculty@rvce.edu.in", password_hash="x", name="Load Test Faculty")
+        db.add(instructor)
+        db.commit()
+        classroom = Classroom(name="Load Test Section", code="LOADTEST-EXAM", max_students=TAKERS, created_by=instructor.id)
+        db.add(classroom)
+        db.commit()
+        course = Course(classroom_id=classroom.id, name="Load Testing", code="LT101")
+        db.add(course)
+        db.commit()
+        test = Test(
+            course_id=course.id, title="Timed test", total_points=QUESTIONS * 10.0,
+            time_limit=TIME_LIMIT // 60, max_attempts=1, is_published=True, created_by=instructor.id
+        )
+        db.add(test)
+        db.flush()
+        answer_keys.replace_questions(db, test, [
+            {"question": f"Question {i}", "options": OPTIONS, "correct_answer": OPTIONS[i % len(OPTIONS)], "points": 10}
+            for i in range(QUESTIONS)
+        ])
+        
+        students = [
+            User(email=f"loadtest-exam-{i}@rvce.edu.in", password_hash="x", name=f"Student {i}")
+            for i in range(TAKERS)
+        ]
+        db.add_all(students)
+        db.commit()
+        db.add_all([ClassroomEnrollment(classroom_id=classroom.id, user_id=s.id, role="student") for s in students])
+        db.commit()
+        
+        return test.id, [(s.id, create_access_token({"sub": str(s.id)})) for s in students]
+    finally:
+        db.close()
+
+
+async def take_test(client, test_id, token, started, timings, silent):
+    headers = {"Authorization": f"Bearer {token}"}
+    await asyncio.sleep(random.uniform(0, START_WINDOW))
+    
+    began = time.perf_counter()
+    response = await client.post(f"/api/test/{test_id}/start", headers=headers)
+    response.raise_for_status()
+    timings["start"].append(time.perf_counter() - began)
+    session_id = response.json()["session_id"]
+    
+    # Answer at random moments in a random order, changing some answers, until
+    # shortly before time is up; the submit comes in the last few seconds
+    answers = {}
+    end = started + START_WINDOW + TIME_LIMIT - 8
+    moments = sorted(random.uniform(time.perf_counter(), end) for _ in range(QUESTIONS))
+    for moment in moments:
+        await asyncio.sleep(max(moment - time.perf_counter(), 0))
+        question, answer = str(random.randrange(QUESTIONS)), random.choice(OPTIONS)
+        began = time.perf_counter()
+        response = await client.patch(
+            f"/api/test-session/{session_id}/answers", json={"answers": {question: answer}}, headers=headers
+        )
+        response.raise_for_status()
+        timings["autosave"].append(time.perf_counter() - began)
+        answers[question] = answer
+    
+    if not silent:
+        await asyncio.sleep(random.uniform(0, 5))
+        began = time.perf_counter()
+        response = await client.post(f"/api/test-session/{session_id}/submit", json={"answers": answers}, headers=headers)
+        response.raise_for_status()
+        timings["submit"].append(time.perf_counter() - began)
+    return session_id, answers
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)] if values else 0.0
+
+
+async def run():
+    test_id, students = seed()
+    silent = set(random.sample(range(TAKERS), int(TAKERS * SILENT_FRACTION)))
+    print(f"Seeded {TAKERS} takers, {QUESTIONS} questions, {TIME_LIMIT}s limit; {len(silent)} never submit")
+    
+    # Count the UPDATE statements the autosave buffer issues
+    flushes = {"writes": 0, "sessions": 0}
+    
+    def counting_merge(db, patches):
+        flushes["writes"] += 1
+        flushes["sessions"] += len(patches)
+        return _merge(db, patches)
+    
+    import app.exam_sessions as module
+    module._merge = counting_merge
+    
+    settings = get_settings()
+    # ASGITransport doesn't run the lifespan, so start the flusher and sweeper by hand
+    exam_sessions.start(settings.EXAM_AUTOSAVE_FLUSH_INTERVAL, settings.EXAM_SWEEP_INTERVAL)
+    
+    timings = {"start": [], "autosave": [], "submit": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(take_test(client, test_id, token, started, timings, i in silent) for i, (_, token) in enumerate(students)),
+            return_exceptions=True
+        )
+        answered = time.perf_counter() - started
+        
+        # Wait for the sweeper to close the abandoned sessions
+        deadline = started + START_WINDOW + TIME_LIMIT + settings.EXAM_DEADLINE_GRACE_SECONDS + 30
+        while time.perf_counter() < deadline:
+            db = SessionLocal()
+            try:
+                open_sessions = db.query(TestResult.id).filter(TestResult.completed_at.is_(None)).count()
+            finally:
+                db.close()
+            if not open_sessions:
+                break
+            await asyncio.sleep(1)
+        elapsed = time.perf_counter() - started
+    await exam_sessions.stop()
+    
+    failures = [r for r in results if isinstance(r, Exception)]
+    sent = {session_id: answers for session_id, answers in (r for r in results if not isinstance(r, Exception))}
+    
+    db = SessionLocal()
+    try:
+        key = answer_keys.get_key(db, test_id, 1)
+        rows = db.query(TestResult.id, TestResult.score, TestResult.completed_at).filter(TestResult.test_id == test_id).all()
+    finally:
+        db.close()
+    graded = [row for row in rows if row.completed_at is not None]
+    wrong = [row.id for row in graded if row.id in sent and key.grade(sent[row.id])[0] != row.score]
+    
+    for name, values in timings.items():
+        if values:
+            print(
+                f"{name:>8}: {len(values)} requests, p50={statistics.median(values) * 1000:.1f}ms "
+                f"p99={percentile(values, 0.99) * 1000:.1f}ms max={max(values) * 1000:.1f}ms"
+            )
+    saves = len(timings["autosave"])
+    print(f"Autosave: {saves} saves written as {flushes['sessions']} row merges in {flushes['writes']} statements")
+    print(f"All answers sent after {answered:.1f}s, all {len(graded)}/{len(rows)} attempts graded after {elapsed:.1f}s")
+    print(f"Scores not matching the answers saved: {len(wrong)}")
+    
+    ok = not failures and len(rows) == TAKERS and len(graded) == TAKERS and not wrong
+    print("SUCCESS" if ok else "FAILURE")
+    if failures:
+        print(f"First failures: {failures[:3]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,145 @@
+"""Benchmark: a deadline rush of text submissions.
+
+SUBMISSIONS students submit the same assignment within DURATION seconds, with
+the deadline falling shortly before the end of the window so the last arrivals
+are late. MODE=queue uses the ingestion queue, MODE=sync the direct submit
+endpoint. Reports acknowledgement latency and checks that every submission was
+stored with the is_late verdict given at receipt.
+
+Runs in-process against a throwaway database:
+    python load_test_submissions.py
+    MODE=sync python load_test_submissions.py
+    SUBMISSIONS=200 DURATION=5 python load_test_submissions.py   # quick run
+"""
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+WORK_DIR = os.path.join(tempfile.gettempdir(), "rvsync_loadtest_submissions")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'rvsync.db')}"
+os.environ["STORAGE_DIR"] = os.path.join(WORK_DIR, "storage")
+os.environ["SUBMISSION_QUEUE_PATH"] = os.path.join(WORK_DIR, "storage", "submissions.queue")
+
+import httpx
+
+from app.main import app
+from app.config import get_settings
+from app.database import SessionLocal, init_db
+from app.models.user import User
+from app.models.classroom import Classroom, ClassroomEnrollment
+from app.models.course import Course
+from app.models.assignment import Assignment, Submission
+from app.routers.auth import create_access_token
+from app.submission_queue import submission_queue
+
+SUBMISSIONS = int(os.environ.get("SUBMISSIONS", 2000))
+DURATION = float(os.environ.get("DURATION", 60))
+MODE = os.environ.get("MODE", "queue")
+LATE_FRACTION = 0.05  # share of the window after the deadline
+
+
+def seed(due_date: datetime):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+    os.makedirs(WORK_DIR)
+    init_db()
+    
+    db = SessionLocal()
+    try:
+        instructor = User(email="loadtest-faculty@rvce.edu.in", password_hash="x", name="Load Test Faculty")
+        db.add(instructor)
+        db.commit()
+        classroom = Classroom(name="Load Test Section", code="LOADTEST-SUB", max_students=SUBMISSIONS, created_by=instructor.id)
+        db.add(classroom)
+        db.commit()
+        course = Course(classroom_id=classroom.id, name="Load Testing", code="LT101")
+        db.add(course)
+        db.commit()
+        assignment = Assignment(course_id=course.id, title="Deadline rush", due_date=due_date, created_by=instructor.id)
+        db.add(assignment)
+        
+        students = [
+            User(email=f"loadtest-sub-{i}@rvce.edu.in", password_hash="x", name=f"Student {i}")
+            for i in range(SUBMISSIONS)
+        ]
+        db.add_all(students)
+        db.commit()
+        db.add_all([ClassroomEnrollment(classroom_id=classroom.id, user_id=s.id, role="student") for s in students])
+        db.commit()
+        
+        return assignment.id, [(s.id, create_access_token({"sub": str(s.id)})) for s in students]
+    finally:
+        db.close()
+
+
+async def submit(client, assignment_id, student_id, token, send_at):
+    await asyncio.sleep(max(send_at - time.perf_counter(), 0))
+    started = time.perf_counter()
+    endpoint = "queue" if MODE == "queue" else "submit"
+    response = await client.post(
+        f"/api/classroom/submission/{assignment_id}/{endpoint}",
+        json={"text_content": f"Answer from student {student_id}"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    response.raise_for_status()
+    return student_id, response.json()["is_late"], time.perf_counter() - started
+
+
+async def run():
+    # Deadline LATE_FRACTION before the window closes, allowing a moment for seeding
+    window_start = datetime.utcnow() + timedelta(seconds=5)
+    due_date = window_start + timedelta(seconds=DURATION * (1 - LATE_FRACTION))
+    assignment_id, students = seed(due_date)
+    print(f"Seeded {len(students)} students; mode={MODE}, arrivals spread over {DURATION:.0f}s")
+    
+    settings = get_settings()
+    if MODE == "queue":
+        # ASGITransport doesn't run the lifespan, so start the writer by hand
+        submission_queue.start(settings.SUBMISSION_QUEUE_FLUSH_INTERVAL)
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        await asyncio.sleep(max((window_start - datetime.utcnow()).total_seconds(), 0))
+        started = time.perf_counter()
+        step = DURATION / len(students)
+        results = await asyncio.gather(
+            *(submit(client, assignment_id, sid, token, started + i * step) for i, (sid, token) in enumerate(students)),
+            return_exceptions=True
+        )
+        acknowledged = time.perf_counter() - started
+        if MODE == "queue":
+            await submission_queue.stop()
+        elapsed = time.perf_counter() - started
+    
+    failures = [r for r in results if isinstance(r, Exception)]
+    completed = [r for r in results if not isinstance(r, Exception)]
+    verdicts = {sid: is_late for sid, is_late, _ in completed}
+    
+    db = SessionLocal()
+    try:
+        submissions = db.query(Submission.user_id, Submission.is_late).filter(
+            Submission.assignment_id == assignment_id
+        ).all()
+    finally:
+        db.close()
+    mismatched = [s.user_id for s in submissions if verdicts.get(s.user_id) != s.is_late]
+    
+    latencies = sorted(latency for _, _, latency in completed)
+    print(f"Acknowledged {len(completed)}/{SUBMISSIONS} in {acknowledged:.1f}s, all persisted after {elapsed:.1f}s")
+    if latencies:
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        print(f"Acknowledgement latency p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms")
+    late = sum(1 for is_late in verdicts.values() if is_late)
+    print(f"Submissions stored: {len(submissions)} ({late} late), is_late mismatches: {len(mismatched)}")
+    
+    ok = not failures and len(submissions) == SUBMISSIONS and not mismatched and elapsed <= DURATION + 5
+    print("SUCCESS" if ok else "FAILURE")
+    if failures:
+        print(f"First failures: {failures[:3]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
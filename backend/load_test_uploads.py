@@ -0,0 +1,173 @@
+"""Benchmark: deadline-minute assignment uploads.
+
+UPLOADS students each stream a FILE_MB file through the resumable upload API
+in CHUNK_MB pieces and submit it, all at once. Reports throughput and per-upload
+latency, and checks every submission points at a stored object with the right hash.
+
+Runs in-process against a throwaway database and storage directory:
+    python load_test_uploads.py
+    UPLOADS=50 FILE_MB=5 python load_test_uploads.py   # quick run
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+WORK_DIR = os.path.join(tempfile.gettempdir(), "rvsync_loadtest_uploads")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'rvsync.db')}"
+os.environ["STORAGE_DIR"] = os.path.join(WORK_DIR, "storage")
+
+import httpx
+
+from app.main import app
+from app import storage
+from app.database import SessionLocal, init_db
+from app.models.user import User
+from app.models.classroom import Classroom, ClassroomEnrollment
+from app.models.course import Course
+from app.models.assignment import Assignment, Submission
+from app.routers.auth import create_access_token
+
+UPLOADS = int(os.environ.get("UPLOADS", 500))
+FILE_SIZE = int(float(os.environ.get("FILE_MB", 50)) * 1024 * 1024)
+CHUNK_SIZE = int(float(os.environ.get("CHUNK_MB", 5)) * 1024 * 1024)
+BLOCK_SIZE = 64 * 1024
+
+# One random block reused for every file; a per-student prefix keeps the contents distinct
+BLOCK = os.urandom(BLOCK_SIZE)
+
+
+def seed():
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+    os.makedirs(WORK_DIR)
+    init_db()
+    
+    db = SessionLocal()
+    try:
+        instructor = User(email="loadtest-faculty@rvce.edu.in", password_hash="x", name="Load Test Faculty")
+        db.add(instructor)
+        db.commit()
+        classroom = Classroom(name="Load Test Section", code="LOADTEST-UP", max_students=UPLOADS, created_by=instructor.id)
+        db.add(classroom)
+        db.commit()
+        course = Course(classroom_id=classroom.id, name="Load Testing", code="LT101")
+        db.add(course)
+        db.commit()
+        assignment = Assignment(
+            course_id=course.id,
+            title="Deadline rush",
+            due_date=datetime.utcnow() + timedelta(minutes=1),
+            created_by=instructor.id
+        )
+        db.add(assignment)
+        
+        students = [
+            User(email=f"loadtest-up-{i}@rvce.edu.in", password_hash="x", name=f"Student {i}")
+            for i in range(UPLOADS)
+        ]
+        db.add_all(students)
+        db.commit()
+        db.add_all([ClassroomEnrollment(classroom_id=classroom.id, user_id=s.id, role="student") for s in students])
+        db.commit()
+        
+        return assignment.id, [(s.id, create_access_token({"sub": str(s.id)})) for s in students]
+    finally:
+        db.close()
+
+
+def file_block(student_id: int, position: int) -> bytes:
+    """Block at a byte position of a student's synthetic file"""
+    if position == 0:
+        prefix = f"student-{student_id}|".encode()
+        return prefix + BLOCK[len(prefix):]
+    return BLOCK
+
+
+async def chunk_body(student_id: int, start: int, end: int, hasher):
+    position = start
+    while position < end:
+        block = file_block(student_id, position)[:end - position]
+        hasher.update(block)
+        yield block
+        position += len(block)
+
+
+async def upload_and_submit(client, assignment_id, student_id, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    started = time.perf_counter()
+    
+    upload = (await client.post(
+        "/api/uploads/",
+        json={"filename": f"submission-{student_id}.bin", "size": FILE_SIZE},
+        headers=headers
+    )).json()
+    
+    hasher = hashlib.sha256()
+    offset = 0
+    while offset < FILE_SIZE:
+        end = min(offset + CHUNK_SIZE, FILE_SIZE)
+        response = await client.patch(
+            f"/api/uploads/{upload['id']}",
+            content=chunk_body(student_id, offset, end, hasher),
+            headers={**headers, "Upload-Offset": str(offset)}
+        )
+        response.raise_for_status()
+        offset = response.json()["offset"]
+    
+    response = await client.post(
+        f"/api/classroom/submission/{assignment_id}/submit",
+        json={"upload_id": upload["id"]},
+        headers=headers
+    )
+    response.raise_for_status()
+    return student_id, hasher.hexdigest(), time.perf_counter() - started
+
+
+async def run():
+    assignment_id, students = seed()
+    print(f"Seeded {len(students)} students; {UPLOADS} x {FILE_SIZE / 1024 / 1024:.1f} MB in {CHUNK_SIZE / 1024 / 1024:.1f} MB chunks")
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(upload_and_submit(client, assignment_id, sid, token) for sid, token in students),
+            return_exceptions=True
+        )
+        elapsed = time.perf_counter() - started
+    
+    failures = [r for r in results if isinstance(r, Exception)]
+    completed = [r for r in results if not isinstance(r, Exception)]
+    expected_hash = {sid: digest for sid, digest, _ in completed}
+    
+    db = SessionLocal()
+    try:
+        submissions = db.query(Submission).filter(Submission.assignment_id == assignment_id).all()
+    finally:
+        db.close()
+    mismatched = [
+        s.user_id for s in submissions
+        if not s.file_path or s.file_path != storage.object_key(expected_hash.get(s.user_id, ""))
+        or not os.path.exists(storage.absolute_path(s.file_path))
+    ]
+    
+    latencies = sorted(latency for _, _, latency in completed)
+    total_mb = len(completed) * FILE_SIZE / 1024 / 1024
+    print(f"Completed {len(completed)}/{UPLOADS} uploads in {elapsed:.1f}s ({total_mb / elapsed:.0f} MB/s)")
+    if latencies:
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        print(f"Per-upload latency p50={statistics.median(latencies):.2f}s p99={p99:.2f}s max={latencies[-1]:.2f}s")
+    print(f"Submissions stored: {len(submissions)}, hash/path mismatches: {len(mismatched)}")
+    
+    ok = not failures and len(submissions) == UPLOADS and not mismatched and elapsed <= 60
+    print("SUCCESS" if ok else "FAILURE")
+    if failures:
+        print(f"First failures: {failures[:3]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,160 @@
+"""Benchmark: classmate typeahead over a large user base.
+
+Seeds USERS students in classrooms of CLASS_SIZE, with one instructor teaching
+CLASSES_PER_INSTRUCTOR of them, then times LOOKUPS typeahead queries of one to
+five characters typed by random students and instructors. Reports latency of
+the in-memory lookup alone and through the HTTP endpoint, the time to rebuild
+the index, and checks a sample of answers against a brute-force scan.
+
+Runs in-process against a throwaway database:
+    python load_test_user_lookup.py
+    USERS=5000 python load_test_user_lookup.py   # quick run
+"""
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import string
+import tempfile
+import time
+
+WORK_DIR = os.path.join(tempfile.gettempdir(), "rvsync_loadtest_lookup")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'rvsync.db')}"
+os.environ["STORAGE_DIR"] = os.path.join(WORK_DIR, "storage")
+
+import httpx
+from sqlalchemy import insert
+
+from app.main import app
+from app.database import SessionLocal, init_db
+from app.models.user import User
+from app.models.classroom import Classroom, ClassroomEnrollment
+from app.routers.auth import create_access_token
+from app.user_directory import user_directory
+
+USERS = int(os.environ.get("USERS", 50000))
+CLASS_SIZE = int(os.environ.get("CLASS_SIZE", 60))
+CLASSES_PER_INSTRUCTOR = 5
+LOOKUPS = int(os.environ.get("LOOKUPS", 5000))
+FIRST_NAMES = ["Aarav", "Aditi", "Akash", "Ananya", "Arjun", "Divya", "Ishaan", "Kavya", "Meera", "Nikhil",
+               "Priya", "Rahul", "Riya", "Rohan", "Sanjana", "Shreya", "Siddharth", "Sneha", "Varun", "Vikram"]
+LAST_NAMES = ["Bhat", "Gowda", "Hegde", "Iyer", "Joshi", "Kamath", "Kulkarni", "Menon", "Nair", "Patil",
+              "Rao", "Reddy", "Shetty", "Sharma", "Shenoy"]
+
+
+def seed():
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+    os.makedirs(WORK_DIR)
+    init_db()
+    
+    classes = -(-USERS // CLASS_SIZE)
+    instructors = -(-classes // CLASSES_PER_INSTRUCTOR)
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"email": f"faculty{i}@rvce.edu.in", "password_hash": "x", "name": f"Faculty {random.choice(LAST_NAMES)} {i}"}
+            for i in range(instructors)
+        ])
+        db.execute(insert(User), [
+            {
+                "email": f"student{i}@rvce.edu.in", "password_hash": "x", "student_id": f"1RV23CS{i:05d}",
+                "name": f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
+            }
+            for i in range(USERS)
+        ])
+        db.execute(insert(Classroom), [
+            {"name": f"Section {i}", "code": f"LOOKUP-{i}", "max_students": CLASS_SIZE, "created_by": 1 + i // CLASSES_PER_INSTRUCTOR}
+            for i in range(classes)
+        ])
+        db.execute(insert(ClassroomEnrollment), [
+            {"classroom_id": 1 + i, "user_id": 1 + i // CLASSES_PER_INSTRUCTOR, "role": "instructor"}
+            for i in range(classes)
+        ] + [
+            {"classroom_id": 1 + i // CLASS_SIZE, "user_id": instructors + 1 + i, "role": "student"}
+            for i in range(USERS)
+        ])
+        db.commit()
+        return instructors, classes
+    finally:
+        db.close()
+
+
+def brute_force(db, user_id, query, limit):
+    """The same answer straight from the tables"""
+    classrooms = {c for c, in db.query(ClassroomEnrollment.classroom_id).filter(ClassroomEnrollment.user_id == user_id)}
+    classmates = {u for u, in db.query(ClassroomEnrollment.user_id).filter(ClassroomEnrollment.classroom_id.in_(classrooms))}
+    classmates.discard(user_id)
+    prefix = query.lower()
+    matches = []
+    for row in db.query(User.id, User.name, User.email, User.student_id).filter(User.id.in_(classmates)):
+        name = row.name.lower()
+        keys = [k for k in [name, *name.split(), row.email.lower(), (row.student_id or "").lower()] if k.startswith(prefix)]
+        if keys:
+            matches.append((min(keys), row.id))
+    return [user_id for _, user_id in sorted(matches)[:limit]]
+
+
+def random_query():
+    source = random.choice([random.choice(FIRST_NAMES), random.choice(LAST_NAMES), "student", "1rv23cs0", "faculty"])
+    return source[:random.randint(1, 5)].lower() if random.random() > 0.05 else random.choice(string.ascii_lowercase)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)] if values else 0.0
+
+
+def report(name, values):
+    print(
+        f"{name:>8}: {len(values)} lookups, p50={statistics.median(values) * 1000:.3f}ms "
+        f"p99={percentile(values, 0.99) * 1000:.3f}ms max={max(values) * 1000:.3f}ms"
+    )
+
+
+async def run():
+    instructors, classes = seed()
+    total = instructors + USERS
+    print(f"Seeded {USERS} students in {classes} classrooms of {CLASS_SIZE}, {instructors} instructors")
+    
+    began = time.perf_counter()
+    user_directory.load()
+    print(f"Index built in {time.perf_counter() - began:.2f}s")
+    
+    callers = [random.randint(1, total) for _ in range(LOOKUPS)]
+    queries = [random_query() for _ in range(LOOKUPS)]
+    
+    index_timings = []
+    for caller, query in zip(callers, queries):
+        began = time.perf_counter()
+        user_directory.lookup(caller, query, 10)
+        index_timings.append(time.perf_counter() - began)
+    report("index", index_timings)
+    
+    wrong = 0
+    db = SessionLocal()
+    try:
+        for caller, query in list(zip(callers, queries))[:200]:
+            if [entry.id for entry in user_directory.lookup(caller, query, 10)] != brute_force(db, caller, query, 10):
+                wrong += 1
+    finally:
+        db.close()
+    
+    timings = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        tokens = {}
+        for caller, query in list(zip(callers, queries))[:1000]:
+            headers = {"Authorization": f"Bearer {tokens.setdefault(caller, create_access_token({'sub': str(caller)}))}"}
+            began = time.perf_counter()
+            response = await client.get("/api/users/lookup", params={"q": query}, headers=headers)
+            response.raise_for_status()
+            timings.append(time.perf_counter() - began)
+    report("http", timings)
+    
+    print(f"Answers differing from a brute-force scan: {wrong}/200")
+    print("SUCCESS" if not wrong and percentile(index_timings, 0.99) < 0.005 else "FAILURE")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
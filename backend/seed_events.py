@@ -79,6 +79,18 @@ def seed_events():
                 "is_all_day": False,
                 "event_type": "activity",
                 "classroom_id": classroom_id
+            },
+            # Timetable slot, one row repeating for the semester
+            {
+                "title": "Operating Systems Lecture",
+                "description": "Regular lecture slot.",
+                "location": "Room F101",
+                "start_time": today + timedelta(hours=9),
+                "end_time": today + timedelta(hours=10),
+                "is_all_day": False,
+                "event_type": "other",
+                "classroom_id": classroom_id,
+                "recurrence_rule": f"FREQ=WEEKLY;BYDAY=MO,WE,FR;UNTIL={today + timedelta(weeks=16):%Y%m%d}"
             }
         ]
 
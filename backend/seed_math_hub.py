@@ -97,37 +97,51 @@ def seed_math_content():
         print("Added CS241AT.")
     else:
         cursor.execute("UPDATE courses SET description = ? WHERE code = 'CS241AT'", (json.dumps(cs_syllabus),))
-
+    
     # 3. Add Sample Tests for MAT231TC (ID needed)
     cursor.execute("SELECT id FROM courses WHERE code = 'MAT231TC'")
     mat_id = cursor.fetchone()[0]
     
-    # Clear old tests to avoid duplicates
+    # Clear old tests (and their question rows) to avoid duplicates
+    cursor.execute("DELETE FROM test_questions WHERE test_id IN (SELECT id FROM tests WHERE course_id = ?)", (mat_id,))
     cursor.execute("DELETE FROM tests WHERE course_id = ?", (mat_id,))
     
     test_questions = [
         {
             "question": "What is the dimension of the subspace spanned by (1,0,0) and (0,1,0)?",
             "options": ["1", "2", "3", "0"],
-            "answer": "2"
+            "correct_answer": "2"
         },
         {
             "question": "The kernel of a linear transformation T: V -> W is a subspace of:",
             "options": ["V", "W", "Both", "Neither"],
-            "answer": "V"
+            "correct_answer": "V"
         },
         {
             "question": "A matrix is diagonalizable if it has:",
             "options": ["Distict eigenvalues", "n linearly independent eigenvectors", "Positive determinant", "No zero rows"],
-            "answer": "n linearly independent eigenvectors"
+            "correct_answer": "n linearly independent eigenvectors"
         }
     ]
     
     cursor.execute("""
         INSERT INTO tests (course_id, title, description, total_points, time_limit, questions, is_published, created_by, created_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
-    """, (mat_id, "Linear Algebra Quiz 1", "Basics of Vector Spaces and Transformations", 30.0, 15, json.dumps(test_questions), 1, 1))
-
+    """, (mat_id, "Linear Algebra Quiz 1", "Basics of Vector Spaces and Transformations", 30.0, 15, "[]", 1, 1))
+    test_id = cursor.lastrowid
+    
+    # The app reads questions from test_questions only
+    cursor.executemany("""
+        INSERT INTO test_questions (
+            test_id, position, question, type, options, correct_answer, points,
+            attempt_count, correct_count, score_sum, score_sq_sum, correct_score_sum
+        )
+        VALUES (?, ?, ?, 'mcq', ?, ?, 10.0, 0, 0, 0.0, 0.0, 0.0)
+    """, [
+        (test_id, position, q["question"], json.dumps(q["options"]), q["correct_answer"])
+        for position, q in enumerate(test_questions)
+    ])
+    
     conn.commit()
     conn.close()
     print("Math content seeded successfully!")
@@ -0,0 +1,31 @@
+"""Run the content store garbage collector and print the bytes-saved report
+
+    python storage_gc.py            # reconcile counts and delete unreferenced files
+    python storage_gc.py --dry-run  # only show what would be removed
+"""
+import sys
+
+from app import storage
+from app.database import SessionLocal, init_db
+
+
+def run_gc(dry_run: bool):
+    init_db()
+    db = SessionLocal()
+    try:
+        result = storage.collect_garbage(db, dry_run=dry_run)
+        report = storage.storage_report(db)
+    finally:
+        db.close()
+    
+    print("Dry run - nothing removed" if dry_run else "Garbage collection finished")
+    for key, value in result.items():
+        if key != "dry_run":
+            print(f"  {key}: {value}")
+    print("Store:")
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    run_gc("--dry-run" in sys.argv)
@@ -0,0 +1,105 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+FANOUT_MAX_MEMBERS = 500  # keep in step with ACTIVITY_FANOUT_MAX_MEMBERS in app/config.py
+
+COLUMNS = "source_id, classroom_id, course_id, actor_id, title, summary, created_at"
+
+# kind -> SELECT of the existing rows as COLUMNS
+SOURCES = {
+    "announcement": """
+        SELECT id, classroom_id, NULL, user_id, title, substr(content, 1, 280), created_at FROM announcements
+    """,
+    "course_update": """
+        SELECT u.id, c.classroom_id, u.course_id, u.user_id, coalesce(u.title, 'Course update'),
+               substr(u.content, 1, 280), u.created_at
+        FROM course_updates u JOIN courses c ON c.id = u.course_id
+    """,
+    "assignment": """
+        SELECT a.id, c.classroom_id, a.course_id, a.created_by, a.title, substr(a.description, 1, 280), a.created_at
+        FROM assignments a JOIN courses c ON c.id = a.course_id
+    """,
+    "test": """
+        SELECT t.id, c.classroom_id, t.course_id, t.created_by, t.title, substr(t.description, 1, 280), t.created_at
+        FROM tests t JOIN courses c ON c.id = t.course_id WHERE t.is_published = 1
+    """,
+    "event": """
+        SELECT id, classroom_id, NULL, created_by, title, substr(description, 1, 280), created_at FROM events
+    """,
+}
+
+def add_activity_feed():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+    
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS activity_items (
+                id INTEGER NOT NULL PRIMARY KEY,
+                kind VARCHAR(20) NOT NULL,
+                source_id INTEGER NOT NULL,
+                classroom_id INTEGER REFERENCES classrooms (id),
+                course_id INTEGER REFERENCES courses (id),
+                actor_id INTEGER REFERENCES users (id),
+                title VARCHAR(255) NOT NULL,
+                summary VARCHAR(280),
+                fanned_out BOOLEAN NOT NULL,
+                created_at DATETIME NOT NULL,
+                CONSTRAINT uq_activity_source UNIQUE (kind, source_id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_activity_items_id ON activity_items (id)")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_activity_unfanned "
+            "ON activity_items (fanned_out, classroom_id, created_at, id)"
+        )
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS timeline_entries (
+                user_id INTEGER NOT NULL REFERENCES users (id),
+                activity_id INTEGER NOT NULL REFERENCES activity_items (id),
+                created_at DATETIME NOT NULL,
+                PRIMARY KEY (user_id, activity_id)
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_timeline_user_recent "
+            "ON timeline_entries (user_id, created_at, activity_id)"
+        )
+        
+        # Record what already exists, fanning out to classrooms small enough
+        for kind, rows in SOURCES.items():
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO activity_items
+                    (kind, source_id, classroom_id, course_id, actor_id, title, summary, fanned_out, created_at)
+                WITH s ({COLUMNS}) AS ({rows})
+                SELECT ?, s.source_id, s.classroom_id, s.course_id, s.actor_id, s.title, s.summary,
+                       s.classroom_id IS NOT NULL AND (
+                           SELECT count(*) FROM classroom_enrollments e WHERE e.classroom_id = s.classroom_id
+                       ) <= ?,
+                       coalesce(s.created_at, CURRENT_TIMESTAMP)
+                FROM s
+            """, (kind, FANOUT_MAX_MEMBERS))
+            print(f"Recorded {cursor.rowcount} {kind} items.")
+        cursor.execute("""
+            INSERT OR IGNORE INTO timeline_entries (user_id, activity_id, created_at)
+            SELECT e.user_id, a.id, a.created_at
+            FROM activity_items a JOIN classroom_enrollments e ON e.classroom_id = a.classroom_id
+            WHERE a.fanned_out = 1
+        """)
+        print(f"Fanned out {cursor.rowcount} timeline entries.")
+        conn.commit()
+        print("Database schema updated successfully.")
+    
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_activity_feed()
@@ -0,0 +1,44 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_announcement_indexes():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        # Drop duplicate read receipts so the unique index can be built
+        cursor.execute(
+            "DELETE FROM announcement_reads WHERE id NOT IN ("
+            "SELECT MIN(id) FROM announcement_reads GROUP BY announcement_id, user_id)"
+        )
+        print(f"Removed {cursor.rowcount} duplicate read receipts.")
+        
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_announcement_read "
+            "ON announcement_reads (announcement_id, user_id)"
+        )
+        print("Ensured index: uq_announcement_read")
+        
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_announcement_listing "
+            "ON announcements (classroom_id, is_pinned, created_at)"
+        )
+        print("Ensured index: ix_announcement_listing")
+                
+        conn.commit()
+        print("Database schema updated successfully.")
+        
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_announcement_indexes()
@@ -0,0 +1,27 @@
+"""Create the assignment stats tables and build them from existing submissions
+
+Safe to re-run: every assignment's row and histogram are recomputed from scratch.
+"""
+from app import assignment_stats
+from app.database import SessionLocal, init_db
+from app.models.assignment import Assignment
+
+
+def build_assignment_stats():
+    init_db()
+    db = SessionLocal()
+    try:
+        assignment_ids = [row.id for row in db.query(Assignment.id)]
+        for assignment_id in assignment_ids:
+            assignment_stats.rebuild(db, assignment_id)
+        db.commit()
+        print(f"Built stats for {len(assignment_ids)} assignments.")
+    except Exception as e:
+        print(f"Error building stats: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    build_assignment_stats()
@@ -0,0 +1,50 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_calendar_feed():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+    
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        try:
+            cursor.execute("ALTER TABLE users ADD COLUMN calendar_token VARCHAR(64)")
+            print("Added column: calendar_token")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("Column calendar_token already exists.")
+            else:
+                raise e
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_calendar_token ON users (calendar_token)")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS calendar_versions (
+                scope_id INTEGER NOT NULL PRIMARY KEY,
+                version INTEGER NOT NULL,
+                updated_at DATETIME NOT NULL
+            )
+        """)
+        # One version row per classroom plus scope 0 for global events
+        cursor.execute("""
+            INSERT OR IGNORE INTO calendar_versions (scope_id, version, updated_at)
+            SELECT 0, 1, CURRENT_TIMESTAMP
+            UNION ALL
+            SELECT id, 1, CURRENT_TIMESTAMP FROM classrooms
+        """)
+        print(f"Seeded {cursor.rowcount} calendar versions.")
+        conn.commit()
+        print("Database schema updated successfully.")
+    
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_calendar_feed()
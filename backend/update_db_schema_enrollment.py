@@ -0,0 +1,53 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_enrollment_constraints():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        # Report duplicates first; the unique indexes cannot be built while they exist
+        duplicates = cursor.execute(
+            "SELECT user_id, COUNT(*) FROM classroom_enrollments "
+            "WHERE role = 'student' GROUP BY user_id HAVING COUNT(*) > 1"
+        ).fetchall()
+        if duplicates:
+            for user_id, count in duplicates:
+                print(f"User {user_id} has {count} student enrollments - fix before migrating.")
+            return
+        
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_enrollment_classroom_user "
+            "ON classroom_enrollments (classroom_id, user_id)"
+        )
+        print("Ensured index: uq_enrollment_classroom_user")
+        
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_enrollment_student "
+            "ON classroom_enrollments (user_id) WHERE role = 'student'"
+        )
+        print("Ensured index: uq_enrollment_student")
+        
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_enrollment_classroom_role "
+            "ON classroom_enrollments (classroom_id, role)"
+        )
+        print("Ensured index: ix_enrollment_classroom_role")
+                
+        conn.commit()
+        print("Database schema updated successfully.")
+        
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_enrollment_constraints()
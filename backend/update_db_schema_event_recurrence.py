@@ -0,0 +1,46 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_event_recurrence():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    columns = [
+        ("recurrence_rule", "VARCHAR(255)"),
+        ("series_end", "DATETIME")
+    ]
+    
+    try:
+        for col_name, col_type in columns:
+            try:
+                cursor.execute(f"ALTER TABLE events ADD COLUMN {col_name} {col_type}")
+                print(f"Added column: {col_name}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" in str(e):
+                    print(f"Column {col_name} already exists.")
+                else:
+                    raise e
+        
+        # Existing events are all one-off
+        cursor.execute("UPDATE events SET series_end = end_time WHERE recurrence_rule IS NULL")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_events_classroom_range "
+            "ON events (classroom_id, start_time, series_end)"
+        )
+        conn.commit()
+        print("Database schema updated successfully.")
+        
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_event_recurrence()
@@ -0,0 +1,39 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_exam_sessions():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        try:
+            cursor.execute("ALTER TABLE test_results ADD COLUMN expires_at DATETIME")
+            print("Added column: expires_at")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("Column expires_at already exists.")
+            else:
+                raise e
+        
+        # Results from before sessions were always submitted in one go
+        cursor.execute("UPDATE test_results SET completed_at = started_at WHERE completed_at IS NULL")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_test_results_open ON test_results (completed_at, expires_at)"
+        )
+        conn.commit()
+        print("Database schema updated successfully.")
+        
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_exam_sessions()
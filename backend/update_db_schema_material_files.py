@@ -0,0 +1,50 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_material_file_columns():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        for column, definition in [("file_name", "VARCHAR(255)"), ("content_type", "VARCHAR(100)")]:
+            try:
+                cursor.execute(f"ALTER TABLE course_materials ADD COLUMN {column} {definition}")
+                print(f"Added column: {column}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" in str(e):
+                    print(f"Column {column} already exists.")
+                else:
+                    raise e
+        
+        # Backfill from the uploads the files came from, where they haven't been cleaned up yet
+        cursor.execute("""
+            UPDATE course_materials SET
+                file_name = (
+                    SELECT filename FROM uploads WHERE uploads.file_path = course_materials.file_path
+                    ORDER BY completed_at DESC LIMIT 1
+                ),
+                content_type = (
+                    SELECT content_type FROM uploads WHERE uploads.file_path = course_materials.file_path
+                    ORDER BY completed_at DESC LIMIT 1
+                )
+            WHERE file_path IS NOT NULL AND file_name IS NULL
+        """)
+        print(f"Checked {cursor.rowcount} file materials against their uploads")
+        
+        conn.commit()
+        print("Database schema updated successfully.")
+        
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_material_file_columns()
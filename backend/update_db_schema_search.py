@@ -0,0 +1,68 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+# Document ids are (source id << 3) | kind code, as in app/models/search.py
+SOURCES = [
+    ("course", 1, """
+        SELECT id, code || ' ' || name, trim(coalesce(description, '') || ' ' || coalesce(instructor, '')),
+               classroom_id, id, NULL, NULL
+        FROM courses
+    """),
+    ("material", 2, """
+        SELECT m.id, m.title, coalesce(m.description, ''), c.classroom_id, m.course_id, NULL, NULL
+        FROM course_materials m JOIN courses c ON c.id = m.course_id
+    """),
+    ("course_update", 3, """
+        SELECT u.id, coalesce(u.title, ''), u.content, c.classroom_id, u.course_id, NULL, NULL
+        FROM course_updates u JOIN courses c ON c.id = u.course_id
+    """),
+    ("announcement", 4, """
+        SELECT id, title, content, classroom_id, NULL, NULL, NULL FROM announcements
+    """),
+    ("message", 5, """
+        SELECT id, '', message, NULL, NULL, from_user_id, to_user_id FROM chat_messages
+    """),
+]
+
+def add_search_index():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+    
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                title, body,
+                kind UNINDEXED, source_id UNINDEXED, classroom_id UNINDEXED, course_id UNINDEXED,
+                user_a UNINDEXED, user_b UNINDEXED,
+                tokenize = 'porter unicode61 remove_diacritics 2'
+            )
+        """)
+        
+        # Rebuild from scratch, so running this again is harmless
+        cursor.execute("DELETE FROM search_index")
+        for kind, code, rows in SOURCES:
+            cursor.execute(f"""
+                WITH s (source_id, title, body, classroom_id, course_id, user_a, user_b) AS ({rows})
+                INSERT INTO search_index (rowid, title, body, kind, source_id, classroom_id, course_id, user_a, user_b)
+                SELECT (source_id << 3) | ?, title, body, ?, source_id, classroom_id, course_id, user_a, user_b FROM s
+            """, (code, kind))
+        for kind, count in cursor.execute("SELECT kind, count(*) FROM search_index GROUP BY kind").fetchall():
+            print(f"Indexed {count} {kind} documents.")
+        cursor.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+        conn.commit()
+        print("Database schema updated successfully.")
+    
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_search_index()
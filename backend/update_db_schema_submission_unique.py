@@ -0,0 +1,41 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_submission_constraint():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        # Report duplicates first; the unique index cannot be built while they exist
+        duplicates = cursor.execute(
+            "SELECT assignment_id, user_id, COUNT(*) FROM submissions "
+            "GROUP BY assignment_id, user_id HAVING COUNT(*) > 1"
+        ).fetchall()
+        if duplicates:
+            for assignment_id, user_id, count in duplicates:
+                print(f"User {user_id} has {count} submissions for assignment {assignment_id} - fix before migrating.")
+            return
+        
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_submission_assignment_user "
+            "ON submissions (assignment_id, user_id)"
+        )
+        print("Ensured index: uq_submission_assignment_user")
+                
+        conn.commit()
+        print("Database schema updated successfully.")
+        
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_submission_constraint()
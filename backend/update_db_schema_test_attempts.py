@@ -0,0 +1,54 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_test_attempts():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        # Simultaneous submits could store two results with the same attempt number;
+        # number each student's results by the order they were stored
+        cursor.execute("""
+            UPDATE test_results SET attempt_number = (
+                SELECT COUNT(*) FROM test_results AS earlier
+                WHERE earlier.test_id = test_results.test_id
+                  AND earlier.user_id = test_results.user_id
+                  AND earlier.id <= test_results.id
+            )
+        """)
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_test_result_attempt "
+            "ON test_results (test_id, user_id, attempt_number)"
+        )
+        print("Added unique index: uq_test_result_attempt")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS test_attempts (
+                test_id INTEGER NOT NULL REFERENCES tests(id),
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                used INTEGER NOT NULL,
+                PRIMARY KEY (test_id, user_id)
+            )
+        """)
+        cursor.execute("""
+            INSERT OR REPLACE INTO test_attempts (test_id, user_id, used)
+            SELECT test_id, user_id, MAX(attempt_number) FROM test_results GROUP BY test_id, user_id
+        """)
+        print(f"Seeded attempt counters for {cursor.rowcount} students")
+        conn.commit()
+        print("Database schema updated successfully.")
+        
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_test_attempts()
@@ -0,0 +1,35 @@
+import sqlite3
+import os
+
+DB_FILE = "rvsync.db"
+
+def add_key_version():
+    if not os.path.exists(DB_FILE):
+        print("Database file not found.")
+        return
+
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    try:
+        try:
+            cursor.execute("ALTER TABLE tests ADD COLUMN key_version INTEGER DEFAULT 1")
+            print("Added column: key_version")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("Column key_version already exists.")
+            else:
+                raise e
+        
+        cursor.execute("UPDATE tests SET key_version = 1 WHERE key_version IS NULL")
+        conn.commit()
+        print("Database schema updated successfully.")
+        
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    add_key_version()
@@ -0,0 +1,40 @@
+"""Move test questions out of the tests.questions JSON blob into test_questions
+
+Creates the table, copies every test's questions into rows and seeds their item
+analysis from existing results. Tests already migrated are skipped, so it is safe
+to re-run. The app only reads test_questions, so run this before deploying.
+"""
+import json
+
+from app import answer_keys
+from app.database import SessionLocal, init_db
+from app.models.assignment import Test, TestResult
+
+
+def migrate_test_questions():
+    init_db()
+    db = SessionLocal()
+    try:
+        tests = db.query(Test).all()
+        migrated = 0
+        for test in tests:
+            if answer_keys.load_questions(db, test) or not test.questions or test.questions == "[]":
+                continue
+            answer_keys.replace_questions(db, test, json.loads(test.questions))
+            # Seed item analysis from the results the test already has
+            rows = db.query(
+                TestResult.id, TestResult.answers, TestResult.score, TestResult.percentage, TestResult.passed
+            ).filter(TestResult.test_id == test.id, TestResult.completed_at.isnot(None)).all()
+            answer_keys.regrade(db, answer_keys.compile_key(db, test), rows, write_scores=False)
+            migrated += 1
+        db.commit()
+        print(f"Checked {len(tests)} tests, migrated {migrated}; questions are in test_questions.")
+    except Exception as e:
+        print(f"Error migrating questions: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate_test_questions()
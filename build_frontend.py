@@ -0,0 +1,81 @@
+"""Build the static frontend for deployment.
+
+Copies frontend/ to frontend/dist/ with:
+  - every stylesheet and script renamed after a hash of its contents
+    (css/styles.css -> css/styles.3f2a9c1b7e.css) and the pages' references
+    rewritten, so nginx can tell browsers to cache them for a year
+  - a .gz copy next to every text file of at least MIN_SIZE bytes, served by
+    nginx's gzip_static instead of compressing on each request
+
+Pages keep their names and are revalidated on every load, so a deploy reaches
+users as soon as it is live. frontend/nginx.conf sets the cache headers.
+
+    python build_frontend.py
+"""
+import gzip
+import hashlib
+import os
+import re
+import shutil
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(ROOT, "frontend")
+OUTPUT = os.path.join(SOURCE, "dist")
+HASHED_DIRS = ("css", "js")
+TEXT_TYPES = (".html", ".css", ".js", ".svg", ".json", ".txt")
+SKIP = ("dist", "nginx.conf")
+MIN_SIZE = 1024  # bytes; matches COMPRESSION_MIN_SIZE on the API
+REFERENCE = re.compile(r'''((?:src|href)=["'])((?:css|js)/[^"'?#]+)''')
+
+
+def _files():
+    for directory, subdirs, names in os.walk(SOURCE):
+        subdirs[:] = [d for d in subdirs if os.path.relpath(os.path.join(directory, d), SOURCE) not in SKIP]
+        for name in names:
+            path = os.path.relpath(os.path.join(directory, name), SOURCE).replace(os.sep, "/")
+            if path not in SKIP:
+                yield path
+
+
+def _hashed_name(path: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def build():
+    shutil.rmtree(OUTPUT, ignore_errors=True)
+    contents = {}
+    for path in _files():
+        with open(os.path.join(SOURCE, path), "rb") as f:
+            contents[path] = f.read()
+    
+    renamed = {
+        path: _hashed_name(path, data) for path, data in contents.items()
+        if path.split("/")[0] in HASHED_DIRS
+    }
+    for path, data in list(contents.items()):
+        if path.endswith(".html"):
+            text = REFERENCE.sub(lambda m: m.group(1) + renamed.get(m.group(2), m.group(2)), data.decode())
+            contents[path] = text.encode()
+    
+    raw = compressed = 0
+    for path, data in contents.items():
+        target = os.path.join(OUTPUT, renamed.get(path, path))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        if path.endswith(TEXT_TYPES) and len(data) >= MIN_SIZE:
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(packed) < len(data):
+                with open(target + ".gz", "wb") as f:
+                    f.write(packed)
+                raw += len(data)
+                compressed += len(packed)
+    
+    print(f"Built {len(contents)} files into {os.path.relpath(OUTPUT, ROOT)}, {len(renamed)} content-hashed")
+    if raw:
+        print(f"Pre-compressed {raw // 1024} KB of text to {compressed // 1024} KB ({compressed / raw:.0%})")
+
+
+if __name__ == "__main__":
+    build()
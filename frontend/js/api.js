@@ -147,6 +147,26 @@ const api = {
         });
     },
 
+    async startTestSession(testId) {
+        return this.request(`/api/test/${testId}/start`, {
+            method: 'POST'
+        });
+    },
+
+    async saveTestAnswers(sessionId, answers) {
+        return this.request(`/api/test-session/${sessionId}/answers`, {
+            method: 'PATCH',
+            body: JSON.stringify({ answers })
+        });
+    },
+
+    async submitTestSession(sessionId, answers) {
+        return this.request(`/api/test-session/${sessionId}/submit`, {
+            method: 'POST',
+            body: JSON.stringify({ answers })
+        });
+    },
+
     async getTestResults(userId) {
         return this.request(`/api/test-result/${userId}/all`);
     },
@@ -163,6 +183,10 @@ const api = {
         });
     },
 
+    async lookupUsers(q, limit = 10) {
+        return this.request(`/api/users/lookup?${new URLSearchParams({ q, limit })}`);
+    },
+
     async getInbox(userId) {
         return this.request(`/api/messages/inbox/${userId}`);
     },
@@ -229,6 +253,28 @@ const api = {
         return this.request(`/api/events/upcoming?limit=${limit}`);
     },
 
+    async getEventsInRange(from, to, classroomId = null) {
+        const params = new URLSearchParams({ from: from.toISOString(), to: to.toISOString() });
+        if (classroomId) params.set('classroom_id', classroomId);
+        return this.request(`/api/events/range?${params}`);
+    },
+
+    async search(q, kinds = null, limit = 20) {
+        const params = new URLSearchParams({ q, limit });
+        if (kinds) params.set('kinds', kinds);
+        return this.request(`/api/search?${params}`);
+    },
+
+    async getActivityFeed(limit = 20, cursor = null) {
+        const params = new URLSearchParams({ limit });
+        if (cursor) params.set('cursor', cursor);
+        return this.request(`/api/activity/feed?${params}`);
+    },
+
+    async getCalendarFeed() {
+        return this.request('/api/calendar/feed');
+    },
+
     async getClassroomEvents(classroomId) {
         return this.request(`/api/events/classroom/${classroomId}`);
     },
@@ -258,3 +304,21 @@ function createChatWebSocket(fromUserId, toUserId, onMessage) {
         close: () => ws.close()
     };
 }
+
+// WebSocket helper for classroom push events (announcements, course updates)
+function createClassroomChannel(classroomId, onEvent) {
+    const token = localStorage.getItem('rvsync_token');
+    const ws = new WebSocket(`ws://localhost:8080/api/messages/ws/classroom/${classroomId}?token=${encodeURIComponent(token)}`);
+    
+    ws.onopen = () => console.log('Classroom channel connected');
+    ws.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        onEvent(data);
+    };
+    ws.onerror = (error) => console.error('WebSocket error:', error);
+    ws.onclose = () => console.log('Classroom channel disconnected');
+    
+    return {
+        close: () => ws.close()
+    };
+}